@@ -1,12 +1,47 @@
 from flask import Flask
 from flask_cors import CORS
+from utils.import_utils import timed_import, print_import_report
+
+# Imaging stack shared by every engine; timed here so the startup report
+# shows its cost next to the engine imports.
+for _module in ('numpy', 'cv2', 'PIL.Image'):
+    timed_import(_module)
+
+from config import Config
 from routes.ocr_routes import ocr_bp
 from routes.img_preprocessing_routes import img_preprocess_bp
+from routes.health_routes import health_bp
+from routes.llm_routes import llm_bp
+from services.warmup_service import start_warmup
+from services.llm_engine import get_llm_engine
 
 app = Flask(__name__)
 CORS(app)
+# Base64 and multipart bodies are larger than the image they carry
+app.config['MAX_CONTENT_LENGTH'] = Config.OCR_MAX_UPLOAD_BYTES * 4 // 3 + 1024 * 1024
 app.register_blueprint(ocr_bp)
 app.register_blueprint(img_preprocess_bp)
+app.register_blueprint(health_bp)
+app.register_blueprint(llm_bp)
 
-if __name__ == '__main__':
+
+def start_services():
+    """
+    Preloads and warms engines so /readyz only passes on a warm worker.
+    Called once by the serving process (under a WSGI server, from its
+    startup hook), never at import: OCR pool workers are spawned processes
+    that import this module again.
+    """
+    print_import_report("Startup import cost")
+    start_warmup(Config.OCR_PRELOAD_ENGINES)
+    if Config.LLM_PRELOAD:
+        get_llm_engine().start()
+
+
+def main():
+    start_services()
     app.run(host='0.0.0.0', port=5000)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+class Config:
+    # --- OCR engines ---
+    # Engines this deployment serves; others are never imported
+    OCR_ENABLED_ENGINES = [m.strip() for m in os.environ.get(
+        'OCR_ENABLED_ENGINES', 'tesseract,easy,paddle,doctr').split(',') if m.strip()]
+    # Per-engine cap on concurrent calls, e.g. "tesseract=8,easy=1"
+    OCR_ENGINE_CONCURRENCY = {
+        k.strip(): int(v) for k, v in (
+            item.split('=', 1) for item in os.environ.get(
+                'OCR_ENGINE_CONCURRENCY', '').split(',') if '=' in item)}
+    # Threads each engine may use (0 keeps the library default)
+    OCR_ENGINE_THREADS = _env_int('OCR_ENGINE_THREADS', 0)
+
+    # --- OCR micro-batching ---
+    # Pages arriving within this window are grouped into one engine call.
+    OCR_BATCH_WINDOW_MS = _env_float('OCR_BATCH_WINDOW_MS', 15)
+    OCR_MAX_BATCH_SIZE = _env_int('OCR_MAX_BATCH_SIZE', 8)
+
+    # --- Async OCR jobs ---
+    OCR_JOB_WORKERS = _env_int('OCR_JOB_WORKERS', 4)
+    # Submissions beyond this many queued/running jobs are rejected with 503
+    OCR_JOB_MAX_PENDING = _env_int('OCR_JOB_MAX_PENDING', 64)
+    # Finished jobs are kept this long for polling
+    OCR_JOB_TTL_S = _env_float('OCR_JOB_TTL_S', 600)
+
+    # --- OCR result cache ---
+    OCR_CACHE_ENABLED = os.environ.get('OCR_CACHE_ENABLED', '1') == '1'
+    OCR_CACHE_MAX_ENTRIES = _env_int('OCR_CACHE_MAX_ENTRIES', 2048)
+    OCR_CACHE_MAX_BYTES = _env_int('OCR_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+    # Set to a directory to keep results across restarts
+    OCR_CACHE_DIR = os.environ.get('OCR_CACHE_DIR', '')
+
+    # --- OCR worker processes ---
+    # 0 runs OCR inside the API process; N > 0 starts N engine worker processes
+    OCR_WORKER_PROCESSES = _env_int('OCR_WORKER_PROCESSES', 0)
+    # Engines each worker loads before accepting work (disabled ones skipped)
+    OCR_WORKER_PRELOAD = [m.strip() for m in os.environ.get(
+        'OCR_WORKER_PRELOAD', 'easy,paddle,doctr').split(',') if m.strip()]
+    # Seconds to wait for every worker's warm-up before /readyz reports failed
+    OCR_WORKER_READY_TIMEOUT_S = _env_int('OCR_WORKER_READY_TIMEOUT_S', 600)
+
+    # --- Startup warm-up ---
+    # Engines loaded and warmed with a dummy page before /readyz reports ready
+    OCR_PRELOAD_ENGINES = [m.strip() for m in os.environ.get(
+        'OCR_PRELOAD_ENGINES', '').split(',') if m.strip()]
+
+    # --- Uploads ---
+    # Largest accepted image upload (raw bytes or decoded base64)
+    OCR_MAX_UPLOAD_BYTES = _env_int('OCR_MAX_UPLOAD_BYTES', 25 * 1024 * 1024)
+
+    # --- Multi-page documents ---
+    # Resolution PDF pages are rasterized at
+    OCR_DOCUMENT_DPI = _env_int('OCR_DOCUMENT_DPI', 200)
+    # Highest dpi a request may ask for; pixels per page grow with its square
+    OCR_DOCUMENT_MAX_DPI = _env_int('OCR_DOCUMENT_MAX_DPI', 600)
+    # Pages of one document being rendered/OCRed at the same time
+    OCR_DOCUMENT_MAX_IN_FLIGHT = _env_int('OCR_DOCUMENT_MAX_IN_FLIGHT', 4)
+    OCR_DOCUMENT_WORKERS = _env_int('OCR_DOCUMENT_WORKERS', 8)
+
+    # --- Large pages ---
+    # Pages with a longer side than this are downscaled before OCR (0: never)
+    OCR_MAX_IMAGE_SIDE = _env_int('OCR_MAX_IMAGE_SIDE', 4096)
+    # Overlap in pixels between neighbouring tiles in tiling mode
+    OCR_TILE_OVERLAP = _env_int('OCR_TILE_OVERLAP', 96)
+    # Threads OCRing the tiles of one page on engines without a batch path
+    # when the worker pool is off (bounded by the engine's max_concurrency)
+    OCR_TILE_WORKERS = _env_int('OCR_TILE_WORKERS', 8)
+
+    # --- Ensemble OCR ---
+    OCR_ENSEMBLE_WORKERS = _env_int('OCR_ENSEMBLE_WORKERS', 8)
+    # Return the first engine whose mean word confidence reaches this (0: off)
+    OCR_ENSEMBLE_EARLY_EXIT = _env_float('OCR_ENSEMBLE_EARLY_EXIT', 0.95)
+
+    # --- Cascade OCR ---
+    OCR_CASCADE_FAST_ENGINE = os.environ.get('OCR_CASCADE_FAST_ENGINE', 'tesseract')
+    OCR_CASCADE_HEAVY_ENGINE = os.environ.get('OCR_CASCADE_HEAVY_ENGINE', 'doctr')
+    # Lines the fast engine reads with a lower mean confidence are re-OCRed
+    OCR_CASCADE_THRESHOLD = _env_float('OCR_CASCADE_THRESHOLD', 0.8)
+    # Margin around an escalated line, as a fraction of its height
+    OCR_CASCADE_PADDING = _env_float('OCR_CASCADE_PADDING', 0.3)
+
+    # --- LLM extraction ---
+    # Full-precision counterpart of the 4-bit base the adapter was trained on
+    LLM_BASE_MODEL = os.environ.get('LLM_BASE_MODEL', 'unsloth/mistral-7b-v0.3')
+    # LoRA adapter: a model store reference (name or name@version) or a
+    # directory with adapter_config.json + adapter_model.safetensors
+    LLM_ADAPTER = os.environ.get('LLM_ADAPTER', '')
+    # Adapters kept loaded (with their prefix caches); least recently used
+    # ones are dropped and reloaded from disk when requested again
+    LLM_MAX_ADAPTERS = _env_int('LLM_MAX_ADAPTERS', 8)
+    # Versioned base models and adapters (see services/model_store_service.py)
+    LLM_STORE_DIR = os.environ.get('LLM_STORE_DIR', 'model_store')
+    # Never contact the Hugging Face hub; models must be in the store or on disk
+    LLM_OFFLINE = os.environ.get('LLM_OFFLINE', '0') == '1'
+    # Hash the base model files against the manifest on every load
+    # (adapters are always hashed; base models only have sizes checked)
+    LLM_STORE_VERIFY = os.environ.get('LLM_STORE_VERIFY', '0') == '1'
+    # 'auto', 'cpu' or 'cuda'
+    LLM_DEVICE = os.environ.get('LLM_DEVICE', 'auto')
+    # 'auto' (int8 dynamic on CPU, none on GPU), 'int8-dynamic' or 'none'.
+    # int8-dynamic scales activations per batch, so outputs can differ
+    # slightly depending on which requests share a batch.
+    LLM_QUANTIZE = os.environ.get('LLM_QUANTIZE', 'auto')
+    LLM_MAX_NEW_TOKENS = _env_int('LLM_MAX_NEW_TOKENS', 512)
+    # Longer OCR text is split into chunks for invoice extraction (and
+    # truncated for other instructions)
+    LLM_MAX_INPUT_TOKENS = _env_int('LLM_MAX_INPUT_TOKENS', 1536)
+    # Strip layout noise and repeated headers/footers before prompting
+    LLM_COMPACT_TEXT = os.environ.get('LLM_COMPACT_TEXT', '1') == '1'
+    # Sequences decoded together; new requests join as others finish
+    LLM_MAX_BATCH_SIZE = _env_int('LLM_MAX_BATCH_SIZE', 4)
+    LLM_BATCH_WINDOW_MS = _env_float('LLM_BATCH_WINDOW_MS', 20)
+    # Constrain invoice extraction to INVOICE_SCHEMA while decoding
+    LLM_CONSTRAINED = os.environ.get('LLM_CONSTRAINED', '1') == '1'
+    # Longest string value and most line items in constrained output
+    LLM_MAX_VALUE_TOKENS = _env_int('LLM_MAX_VALUE_TOKENS', 64)
+    LLM_MAX_ITEMS = _env_int('LLM_MAX_ITEMS', 50)
+    # Load the model at startup instead of on the first request
+    LLM_PRELOAD = os.environ.get('LLM_PRELOAD', '0') == '1'
+    # Bearer token required by POST /llmops/adapter; unset disables it
+    LLM_ADMIN_TOKEN = os.environ.get('LLM_ADMIN_TOKEN', '')
+
+    # --- Evaluation ---
+    # Processes for batch evaluation (0 = one per CPU)
+    EVAL_WORKERS = _env_int('EVAL_WORKERS', 0)
@@ -0,0 +1,16 @@
+from flask import Blueprint, jsonify
+from services.warmup_service import get_readiness
+
+health_bp = Blueprint('health', __name__)
+
+
+@health_bp.route('/healthz', methods=['GET'])
+def healthz_endpoint():
+    return jsonify({'status': 'ok'})
+
+
+@health_bp.route('/readyz', methods=['GET'])
+def readyz_endpoint():
+    readiness = get_readiness()
+    status_code = 200 if readiness['status'] == 'ready' else 503
+    return jsonify(readiness), status_code
@@ -1,9 +1,6 @@
-from flask import Blueprint, request, send_file, jsonify
-import os
-import tempfile
-import cv2
-from services.img_preprocessing_service import preprocess_image
-from io import BytesIO
+from flask import Blueprint, request, jsonify, Response
+from services.img_preprocessing_service import preprocess_image, encode_image
+from utils.response_utils import multipart_response
 import base64
 
 img_preprocess_bp = Blueprint(
@@ -12,38 +9,33 @@ img_preprocess_bp = Blueprint(
 
 @img_preprocess_bp.route('', methods=['POST'])
 def img_preprocess_endpoint():
-    print("Request received")
     if 'image' not in request.files:
-        print("No image in request.files")
         return jsonify({'error': 'No image file provided'}), 400
     file = request.files['image']
-    print("File received:", file.filename)
     if file.filename == '':
-        print("Empty filename")
         return jsonify({'error': 'No selected file'}), 400
-    with tempfile.TemporaryDirectory() as tmpdir:
-        input_path = os.path.join(tmpdir, file.filename)
-        file.save(input_path)
-        print("File saved to", input_path)
-        output_path = os.path.join(tmpdir, 'preprocessed.png')
-        grayscale_path = os.path.join(tmpdir, 'grayscale.png')
-        try:
-            preprocess_image(input_path, save_output=True,
-                             output_path=output_path, grayscale_path=grayscale_path)
-            print("Image preprocessed, sending files")
-            # Read both images as base64
-            with open(grayscale_path, 'rb') as f:
-                grayscale_bytes = f.read()
-                grayscale_b64 = base64.b64encode(
-                    grayscale_bytes).decode('utf-8')
-            with open(output_path, 'rb') as f:
-                processed_bytes = f.read()
-                processed_b64 = base64.b64encode(
-                    processed_bytes).decode('utf-8')
-            return jsonify({
-                'grayscale': grayscale_b64,
-                'processed': processed_b64
-            })
-        except Exception as e:
-            print("Error during preprocessing:", e)
-            return jsonify({'error': str(e)}), 500
+    # json (base64, default) | multipart (both PNGs) | raw (one PNG)
+    response_format = request.values.get('format', 'json').lower()
+    try:
+        grayscale, processed = preprocess_image(
+            file.read(), pipeline=request.values.get('preprocess'))
+        grayscale_bytes = encode_image(grayscale)
+        processed_bytes = encode_image(processed)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print("Error during preprocessing:", e)
+        return jsonify({'error': str(e)}), 500
+    if response_format == 'raw':
+        output = request.values.get('output', 'processed').lower()
+        data = grayscale_bytes if output == 'grayscale' else processed_bytes
+        return Response(data, mimetype='image/png')
+    if response_format == 'multipart':
+        return multipart_response([
+            ('grayscale', 'image/png', grayscale_bytes),
+            ('processed', 'image/png', processed_bytes),
+        ])
+    return jsonify({
+        'grayscale': base64.b64encode(grayscale_bytes).decode('utf-8'),
+        'processed': base64.b64encode(processed_bytes).decode('utf-8')
+    })
@@ -1,12 +1,82 @@
+import hmac
+
 from flask import Blueprint, request, jsonify
-from backend.services.llm_service import extract_invoice_data
+from config import Config
+from services.llm_service import extract_invoice_data
+from services.llm_engine import get_llm_engine
+from services.model_store_service import is_store_ref, list_artifacts
 
 llm_bp = Blueprint('llm', __name__)
 
 
 @llm_bp.route('/llmops', methods=['POST'])
 def llmops_endpoint():
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     text = data.get('text', '')
-    result = extract_invoice_data(text)
+    if isinstance(text, list) and all(isinstance(page, str) for page in text):
+        text = '\f'.join(text)  # One string per page
+    if not text or not isinstance(text, str):
+        return jsonify({'error': 'Missing text'}), 400
+    max_new_tokens = data.get('max_new_tokens')
+    if max_new_tokens is not None:
+        try:
+            max_new_tokens = int(max_new_tokens)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'max_new_tokens must be an integer'}), 400
+        if not 1 <= max_new_tokens <= Config.LLM_MAX_NEW_TOKENS:
+            return jsonify({'error': 'max_new_tokens must be between 1 and '
+                                     f'{Config.LLM_MAX_NEW_TOKENS}'}), 400
+    constrained = data.get('constrained')
+    if constrained is not None and not isinstance(constrained, bool):
+        return jsonify({'error': 'constrained must be a boolean'}), 400
+    adapter = data.get('adapter')
+    if adapter is not None and not isinstance(adapter, str):
+        return jsonify({'error': 'adapter must be a string'}), 400
+    if adapter and not is_store_ref(adapter):
+        return jsonify({'error': 'adapter must be a model store reference '
+                                 '(name or name@version)'}), 400
+    compact = data.get('compact')
+    if compact is not None and not isinstance(compact, bool):
+        return jsonify({'error': 'compact must be a boolean'}), 400
+    try:
+        result = extract_invoice_data(
+            text, max_new_tokens, constrained, adapter, compact)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except (ImportError, OSError) as e:
+        # Missing inference packages or model files
+        return jsonify({'error': f'LLM unavailable: {e}'}), 503
     return jsonify(result)
+
+
+@llm_bp.route('/llmops/stats', methods=['GET'])
+def llmops_stats_endpoint():
+    return jsonify(get_llm_engine().stats())
+
+
+@llm_bp.route('/llmops/models', methods=['GET'])
+def llmops_models_endpoint():
+    return jsonify({'artifacts': list_artifacts()})
+
+
+@llm_bp.route('/llmops/adapter', methods=['POST'])
+def llmops_adapter_endpoint():
+    if not Config.LLM_ADMIN_TOKEN:
+        return jsonify({'error': 'Changing the default adapter is disabled '
+                                 '(LLM_ADMIN_TOKEN is not set)'}), 403
+    expected = f"Bearer {Config.LLM_ADMIN_TOKEN}".encode('utf-8')
+    supplied = request.headers.get('Authorization', '').encode('utf-8')
+    if not hmac.compare_digest(supplied, expected):
+        return jsonify({'error': 'Unauthorized'}), 401
+    data = request.get_json(silent=True) or {}
+    adapter = data.get('adapter')
+    if not isinstance(adapter, str):
+        return jsonify({'error': "adapter must be a string ('' for none)"}), 400
+    if adapter and not is_store_ref(adapter):
+        return jsonify({'error': 'adapter must be a model store reference '
+                                 '(name or name@version)'}), 400
+    try:
+        stats = get_llm_engine().swap_adapter(adapter)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(stats)
@@ -1,31 +1,419 @@
-from flask import Blueprint, request, jsonify
-from services.ocr_service import (
-    decode_image,
-    tesseract_ocr_process,
-    easy_ocr_process,
-    paddle_ocr_process,
-    doctr_ocr_process
+import json
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from config import Config
+from services.ocr_service import decode_base64, prepare_image, ImageDecodeError
+from services.img_preprocessing_service import build_pipeline
+from services.ocr_engine_registry import get_engine, has_engine, list_engines
+from services.ocr_cache_service import (
+    cached_ocr, cached_batch_ocr, ocr_cache, engine_fingerprint, cache_params
 )
+from services.ocr_batch_service import (
+    run_ocr, batch_ocr, run_ocr_layout, batch_ocr_layout
+)
+from services.document_service import iter_document_pages, ocr_pages
+from services.ocr_job_service import submit_job, get_job, JobQueueFullError
+from services.ocr_ensemble_service import resolve_ensemble_engines, ensemble_words
+from services.ocr_cascade_service import resolve_cascade_engines, cascade_words
+from services.ocr_tiling_service import resolve_tiling
+from utils.layout_utils import OCRLayout
+from utils.response_utils import stream_json
 
 ocr_bp = Blueprint('ocr', __name__, url_prefix='/ocr')
 
+# Models that combine several engines; only served by POST /ocr
+COMPOSITE_MODELS = ('ensemble', 'cascade')
+# Lowest dpi /ocr/document renders PDFs at; text is unreadable below it
+_MIN_DPI = 36
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _check_size(size):
+    if size > Config.OCR_MAX_UPLOAD_BYTES:
+        raise UploadError(
+            f"Image exceeds {Config.OCR_MAX_UPLOAD_BYTES} bytes", 413)
+
+
+def _read_stream(stream):
+    # Read one byte past the limit so oversized bodies are detected without
+    # buffering all of them.
+    image_bytes = stream.read(Config.OCR_MAX_UPLOAD_BYTES + 1)
+    _check_size(len(image_bytes))
+    return image_bytes
+
+
+def _read_json():
+    options = request.get_json() or {}
+    if not isinstance(options, dict):
+        raise UploadError('JSON body must be an object')
+    return options
+
+
+def _read_upload():
+    """
+    Returns (image_bytes, options) from one of:
+    - JSON with a base64 "image" field,
+    - multipart/form-data with an "image" file (options in form/query),
+    - a raw body (application/octet-stream or image/*, options in query).
+    """
+    if request.is_json:
+        options = _read_json()
+        image_b64 = options.get('image')
+        if not image_b64:
+            raise UploadError('Missing image or model')
+        if not isinstance(image_b64, str):
+            raise UploadError('image must be a base64 string')
+        _check_size(len(image_b64) * 3 // 4)
+        return decode_base64(image_b64), options
+    options = request.args.to_dict()
+    if request.mimetype == 'multipart/form-data':
+        options.update(request.form.to_dict())
+        file = request.files.get('image')
+        if file is None:
+            raise UploadError('Missing image or model')
+        image_bytes = _read_stream(file.stream)
+    else:
+        image_bytes = _read_stream(request.stream)
+    if not image_bytes:
+        raise UploadError('Missing image or model')
+    return image_bytes, options
+
+
+def _read_model(options, allow_composite=False):
+    model = str(options.get('model', '')).strip().lower()
+    if not model:
+        raise UploadError('Missing image or model')
+    if model in COMPOSITE_MODELS and allow_composite:
+        return model
+    if not has_engine(model):
+        raise UploadError('Unknown model')
+    return model
+
+
+def _read_ensemble(options):
+    """
+    Ensemble settings: "engines" (a list, or comma-separated in form/query
+    fields) and "early_exit_confidence" (0 disables early exit).
+    """
+    engines = options.get('engines') or None
+    if isinstance(engines, str):
+        engines = [e.strip().lower() for e in engines.split(',') if e.strip()]
+    threshold = options.get('early_exit_confidence')
+    try:
+        engines = resolve_ensemble_engines(engines)
+        threshold = (Config.OCR_ENSEMBLE_EARLY_EXIT if threshold in (None, '')
+                     else float(threshold))
+    except ValueError as e:
+        raise UploadError(str(e))
+    return engines, threshold
+
+
+def _read_cascade(options):
+    """
+    Cascade settings: "fast_engine", "heavy_engine" and
+    "cascade_threshold" (lines below this confidence are re-OCRed).
+    """
+    threshold = options.get('cascade_threshold')
+    try:
+        fast, heavy = resolve_cascade_engines(
+            options.get('fast_engine'), options.get('heavy_engine'))
+        threshold = (Config.OCR_CASCADE_THRESHOLD if threshold in (None, '')
+                     else float(threshold))
+    except ValueError as e:
+        raise UploadError(str(e))
+    return fast, heavy, threshold
+
+
+def _read_pipeline(options):
+    try:
+        return build_pipeline(options.get('preprocess'))
+    except ValueError as e:
+        raise UploadError(str(e))
+
+
+def _read_tiling(options, model):
+    """
+    Tiling is requested with "tiling": true or {"tile_size": .., "overlap": ..}
+    in JSON, or tiling=1 with optional tile_size/tile_overlap fields. Returns
+    the settings resolved for the model's engine, so defaults are part of the
+    cache key.
+    """
+    tiling = options.get('tiling')
+    if isinstance(tiling, dict):
+        params = tiling
+    elif str(tiling).lower() in ('1', 'true'):
+        params = {'tile_size': options.get('tile_size'),
+                  'overlap': options.get('tile_overlap')}
+    else:
+        return None
+    try:
+        params = {key: int(value) for key, value in params.items()
+                  if key in ('tile_size', 'overlap') and value is not None}
+    except (TypeError, ValueError):
+        raise UploadError('tile_size and overlap must be integers')
+    try:
+        return resolve_tiling(get_engine(model), **params)
+    except ValueError as e:
+        raise UploadError(str(e))
+
+
+def _read_structured(options, model):
+    """
+    "structured": true adds a columnar word layout (boxes, confidences,
+    line ids, text offsets) to each page; it needs word boxes.
+    """
+    structured = str(options.get('structured', '')).lower() in ('1', 'true')
+    if structured and model not in COMPOSITE_MODELS \
+            and not get_engine(model).reports_boxes:
+        raise UploadError(f"{model} does not report word boxes")
+    return structured
+
+
+def _page_result(cached):
+    # Cached values are (text, confidence) or, for structured requests,
+    # (text, confidence, layout dict).
+    page = {'text': cached[0], 'confidence': cached[1]}
+    if len(cached) > 2:
+        page['layout'] = cached[2]
+    return page
+
+
+def _layout_value(layout):
+    return layout.text, layout.confidence(), layout.to_dict()
+
+
+def _wants_stream(options):
+    return str(options.get('stream', '')).lower() in ('1', 'true')
+
+
+@ocr_bp.errorhandler(UploadError)
+def handle_upload_error(e):
+    return jsonify({'error': str(e)}), e.status
+
+
+@ocr_bp.errorhandler(ImageDecodeError)
+def handle_decode_error(e):
+    return jsonify({'error': str(e)}), 400
+
 
 @ocr_bp.route('', methods=['POST'])
 def ocr_endpoint():
-    data = request.get_json()
-    image_b64 = data.get('image')
-    model = data.get('model', '').strip().lower()
-    if not image_b64 or not model:
-        return jsonify({'error': 'Missing image or model'}), 400
-    image = decode_image(image_b64)
-    if model == 'tesseract':
-        text, confidence = tesseract_ocr_process(image)
-    elif model == 'easy':
-        text, confidence = easy_ocr_process(image)
-    elif model == 'paddle':
-        text, confidence = paddle_ocr_process(image)
-    elif model == 'doctr':
-        text, confidence = doctr_ocr_process(image)
+    image_bytes, options = _read_upload()
+    model = _read_model(options, allow_composite=True)
+    pipeline = _read_pipeline(options)
+    structured = _read_structured(options, model)
+    if model == 'ensemble':
+        return _ocr_ensemble(image_bytes, options, pipeline, structured)
+    if model == 'cascade':
+        return _ocr_cascade(image_bytes, options, pipeline, structured)
+    tiling = _read_tiling(options, model)
+    timings = []
+
+    def compute():
+        image, stage_timings = prepare_image(image_bytes, pipeline)
+        timings.extend(stage_timings)
+        if structured:
+            return _layout_value(run_ocr_layout(model, image, tiling))
+        return run_ocr(model, image, tiling)
+
+    result = _page_result(cached_ocr(
+        model, image_bytes, compute,
+        cache_params(pipeline, tiling, structured)))
+    if pipeline:
+        # timings stay empty when the result came from the cache
+        result['preprocessing'] = {'pipeline': pipeline, 'timings': timings}
+    if _wants_stream(options):
+        return stream_json(result)
+    return jsonify(result)
+
+
+def _ocr_ensemble(image_bytes, options, pipeline, structured):
+    engines, threshold = _read_ensemble(options)
+    params = cache_params(pipeline, structured=structured) or {}
+    params['ensemble'] = {
+        'engines': [engine_fingerprint(name) for name in engines],
+        'early_exit_confidence': threshold,
+    }
+    return _composite_response(
+        'ensemble', image_bytes, options, pipeline, structured, params,
+        lambda image: ensemble_words(image, engines, threshold),
+        # A result missing a failed engine, or taken from whichever engine
+        # finished first, is not the fused answer the cache key stands for
+        cacheable=lambda details: not (details['failed']
+                                       or details['early_exit']))
+
+
+def _ocr_cascade(image_bytes, options, pipeline, structured):
+    fast, heavy, threshold = _read_cascade(options)
+    params = cache_params(pipeline, structured=structured) or {}
+    params['cascade'] = {
+        'fast': engine_fingerprint(fast),
+        'heavy': engine_fingerprint(heavy),
+        'threshold': threshold,
+        'padding': Config.OCR_CASCADE_PADDING,
+    }
+    return _composite_response(
+        'cascade', image_bytes, options, pipeline, structured, params,
+        lambda image: cascade_words(image, fast, heavy, threshold))
+
+
+def _composite_response(model, image_bytes, options, pipeline, structured,
+                        params, run, cacheable=None):
+    timings = []
+    details = {}
+
+    def compute():
+        # One decode and one preprocessing pass shared by all engines
+        image, stage_timings = prepare_image(image_bytes, pipeline)
+        timings.extend(stage_timings)
+        words, run_details = run(image)
+        details.update(run_details)
+        height, width = image.shape[:2]
+        value = _layout_value(OCRLayout.from_words(words, width, height))
+        return value if structured else value[:2]
+
+    def store():
+        return cacheable is None or cacheable(details)
+
+    result = _page_result(cached_ocr(model, image_bytes, compute, params,
+                                     cacheable=store))
+    # details stay empty when the result came from the cache
+    result[model] = details
+    if pipeline:
+        result['preprocessing'] = {'pipeline': pipeline, 'timings': timings}
+    if _wants_stream(options):
+        return stream_json(result)
+    return jsonify(result)
+
+
+@ocr_bp.route('/batch', methods=['POST'])
+def ocr_batch_endpoint():
+    if request.is_json:
+        options = _read_json()
+        images_b64 = options.get('images')
+        if not images_b64 or not isinstance(images_b64, list):
+            raise UploadError('Missing images or model')
+        for image_b64 in images_b64:
+            if not isinstance(image_b64, str):
+                raise UploadError('images must be base64 strings')
+            _check_size(len(image_b64) * 3 // 4)
+        images_bytes = [decode_base64(image_b64) for image_b64 in images_b64]
     else:
-        return jsonify({'error': 'Unknown model'}), 400
-    return jsonify({'text': text, 'confidence': confidence})
+        options = {**request.args.to_dict(), **request.form.to_dict()}
+        files = request.files.getlist('images')
+        if not files:
+            raise UploadError('Missing images or model')
+        images_bytes = [_read_stream(file.stream) for file in files]
+    model = _read_model(options)
+    pipeline = _read_pipeline(options)
+    tiling = _read_tiling(options, model)
+    structured = _read_structured(options, model)
+    timings = {}
+
+    def compute(indices):
+        images = []
+        for i in indices:
+            image, timings[i] = prepare_image(images_bytes[i], pipeline)
+            images.append(image)
+        if structured:
+            return [_layout_value(layout) for layout in
+                    batch_ocr_layout(model, images, tiling)]
+        return batch_ocr(model, images, tiling)
+
+    results = cached_batch_ocr(
+        model, images_bytes, compute,
+        cache_params(pipeline, tiling, structured))
+    pages = []
+    for i, cached in enumerate(results):
+        page = _page_result(cached)
+        if pipeline:
+            page['preprocessing'] = {'timings': timings.get(i, [])}
+        pages.append(page)
+    result = {'results': pages}
+    if pipeline:
+        result['preprocessing'] = {'pipeline': pipeline}
+    if _wants_stream(options):
+        return stream_json(result)
+    return jsonify(result)
+
+
+@ocr_bp.route('/document', methods=['POST'])
+def ocr_document_endpoint():
+    document_bytes, options = _read_upload()
+    model = _read_model(options)
+    pipeline = _read_pipeline(options)
+    tiling = _read_tiling(options, model)
+    structured = _read_structured(options, model)
+    try:
+        dpi = int(options.get('dpi') or Config.OCR_DOCUMENT_DPI)
+    except (TypeError, ValueError):
+        raise UploadError('dpi must be an integer')
+    if not _MIN_DPI <= dpi <= Config.OCR_DOCUMENT_MAX_DPI:
+        raise UploadError(
+            f"dpi must be between {_MIN_DPI} and {Config.OCR_DOCUMENT_MAX_DPI}")
+    use_sse = str(options.get('format', 'ndjson')).lower() == 'sse'
+    # Opened before the response starts so a corrupt upload is a 400
+    try:
+        pages = iter_document_pages(document_bytes, dpi)
+    except ValueError as e:
+        raise UploadError(str(e))
+
+    def generate():
+        count = 0
+        try:
+            for page in ocr_pages(pages, model, pipeline, tiling=tiling,
+                                  structured=structured):
+                count += 1
+                yield _format_event(page, use_sse)
+        except Exception as e:
+            # The 200 is already sent: end the stream with an error event
+            yield _format_event({'error': str(e)}, use_sse)
+            return
+        yield _format_event({'done': True, 'pages': count}, use_sse)
+
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'X-Accel-Buffering': 'no'})
+
+
+def _format_event(payload, use_sse):
+    line = json.dumps(payload, ensure_ascii=False)
+    return f"data: {line}\n\n" if use_sse else line + "\n"
+
+
+@ocr_bp.route('/jobs', methods=['POST'])
+def ocr_job_submit_endpoint():
+    image_bytes, options = _read_upload()
+    model = _read_model(options, allow_composite=True)
+    if model in COMPOSITE_MODELS:
+        raise UploadError(f"{model} is only served by POST /ocr")
+    pipeline = _read_pipeline(options)
+    structured = _read_structured(options, model)
+    tiling = _read_tiling(options, model)
+    try:
+        job = submit_job(model, image_bytes, pipeline, tiling, structured)
+    except JobQueueFullError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    return jsonify(job), 202
+
+
+@ocr_bp.route('/jobs/<job_id>', methods=['GET'])
+def ocr_job_status_endpoint(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+
+@ocr_bp.route('/cache/stats', methods=['GET'])
+def ocr_cache_stats_endpoint():
+    return jsonify(ocr_cache.stats())
+
+
+@ocr_bp.route('/engines', methods=['GET'])
+def ocr_engines_endpoint():
+    return jsonify(list_engines())
@@ -0,0 +1,85 @@
+"""
+Compares the Levenshtein metric backends on synthetic invoices:
+difflib.SequenceMatcher (the previous implementation, a similarity ratio
+rather than an edit distance) against the bit-parallel edit distance in
+utils/metrics_utils.py, with and without a cutoff.
+
+    python scripts/bench_edit_distance.py [--pairs 20] [--items 5 20 80 200]
+
+Near pairs are a document and a copy with 2% of its characters changed (a
+typical prediction); far pairs are two unrelated documents, where the
+cutoff lets the edit distance stop early.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.metrics_utils import normalized_edit_distance  # noqa: E402
+
+
+def _invoice(rng, n_items):
+    return {
+        'invoice': {'invoice_number': f"INV-{rng.randint(1000, 9999)}",
+                    'seller_name': 'ACME Industrial Supplies Ltd',
+                    'invoice_date': '2024-03-01'},
+        'items': [{'description': f"Item {i} {rng.choice(['bolt', 'nut', 'gear'])}",
+                   'quantity': str(rng.randint(1, 50)),
+                   'total_price': f"{rng.uniform(1, 500):.2f}"}
+                  for i in range(n_items)],
+        'subtotal': {'tax': '19.00', 'total': '119.00'},
+    }
+
+
+def _perturb(rng, text, rate=0.02):
+    chars = list(text)
+    for _ in range(max(1, int(len(chars) * rate))):
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice('0123456789abcdef')
+    return ''.join(chars)
+
+
+def _time(fn, pairs, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for a, b in pairs:
+            fn(a, b)
+        best = min(best, time.perf_counter() - started)
+    return best / len(pairs) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pairs', type=int, default=20)
+    parser.add_argument('--items', type=int, nargs='+', default=[5, 20, 80, 200])
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    backends = [
+        ('SequenceMatcher', lambda a, b: 1 - SequenceMatcher(None, a, b).ratio()),
+        ('bit-parallel', normalized_edit_distance),
+        ('cutoff=0.05', lambda a, b: normalized_edit_distance(a, b, 0.05)),
+    ]
+    print(f"{'items':>6} {'chars':>7} {'pairs':>5}  "
+          + '  '.join(f"{name:>16}" for name, _ in backends))
+    for n_items in args.items:
+        near, far = [], []
+        for _ in range(args.pairs):
+            truth = json.dumps(_invoice(rng, n_items), sort_keys=True)
+            near.append((_perturb(rng, truth), truth))
+            far.append((json.dumps(_invoice(rng, n_items), sort_keys=True), truth))
+        chars = sum(len(b) for _, b in near) // len(near)
+        for label, pairs in (('near', near), ('far', far)):
+            times = [_time(fn, pairs) for _, fn in backends]
+            print(f"{n_items:>6} {chars:>7} {label:>5}  "
+                  + '  '.join(f"{t:>13.2f} ms" for t in times))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import Config
+from services.evaluation_service import (
+    PreparedRecord, evaluate_prepared, extract_valid_json, parse_json_safe
+)
+
+METRICS = ('exact_match', 'field_level_accuracy', 'levenshtein', 'bleu', 'f1', 'mse')
+
+
+def _parse_value(value):
+    """Record field as an object: JSON text, raw model output or already parsed."""
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    try:
+        return parse_json_safe(extract_valid_json(value))
+    except ValueError:
+        return None
+
+
+def load_evaluation_records(path, truth_field='ground_truth',
+                            prediction_field='prediction'):
+    """
+    Reads (ground_truth, prediction) pairs from a CSV file (one JSON column
+    each) or a JSONL file (one object per line). Predictions may be raw
+    model output; ones that cannot be parsed become None.
+    """
+    records = []
+    if path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    for i, row in enumerate(rows):
+        if truth_field not in row or prediction_field not in row:
+            raise ValueError(
+                f"Record {i} lacks '{truth_field}' or '{prediction_field}'")
+        records.append((_parse_value(row[truth_field]),
+                        _parse_value(row[prediction_field])))
+    return records
+
+
+def _batch_mse(pairs):
+    """
+    MSE between the code points of each (prediction, truth) pair of
+    PreparedRecords, over the shorter length, in one vectorized pass.
+    """
+    pred_codes = [pred.codes() for pred, _ in pairs]
+    truth_codes = [truth.codes() for _, truth in pairs]
+    lengths = np.array([min(len(a), len(b)) for a, b in zip(pred_codes, truth_codes)])
+    pred_starts = np.cumsum([0] + [len(a) for a in pred_codes[:-1]])
+    truth_starts = np.cumsum([0] + [len(b) for b in truth_codes[:-1]])
+    # Record and offset of every compared character
+    rows = np.repeat(np.arange(len(pairs)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    a = np.concatenate(pred_codes)[pred_starts[rows] + offsets].astype(np.float64)
+    b = np.concatenate(truth_codes)[truth_starts[rows] + offsets]
+    sums = np.bincount(rows, weights=(a - b) ** 2, minlength=len(pairs))
+    return np.where(lengths > 0, sums / np.maximum(lengths, 1), 0.0)
+
+
+def _evaluate_chunk(records):
+    """Worker: metrics and field comparison of a list of (truth, prediction)."""
+    pairs = [(PreparedRecord(pred), PreparedRecord(truth)) for truth, pred in records]
+    results = []
+    for (pred, truth), mse in zip(pairs, _batch_mse(pairs) if pairs else []):
+        metrics = evaluate_prepared(pred, truth, mse=False)
+        metrics['exact_match'] = float(metrics['exact_match'])
+        metrics['mse'] = float(mse)
+        results.append({'metrics': metrics,
+                        'fields': pred.field_scores(truth),
+                        'parsed': pred.obj is not None})
+    return results
+
+
+def _summary(values):
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {'mean': None, 'min': None, 'max': None}
+    return {'mean': float(values.mean()), 'min': float(values.min()),
+            'max': float(values.max())}
+
+
+def build_report(results):
+    """Aggregate and per-field report from the per-record results."""
+    table = np.array([[r['metrics'][m] for m in METRICS] for r in results],
+                     dtype=np.float64).reshape(-1, len(METRICS))
+    # path -> [count, missing, exact, similarity sum, extra]
+    fields = {}
+    for r in results:
+        for path, exact, similarity, missing in r['fields']['leaves']:
+            stats = fields.setdefault(path, [0, 0, 0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += missing
+            stats[2] += exact
+            stats[3] += similarity
+        for path in r['fields']['extra']:
+            fields.setdefault(path, [0, 0, 0, 0.0, 0])[4] += 1
+    return {
+        'records': len(results),
+        'parse_failures': sum(not r['parsed'] for r in results),
+        'metrics': {m: _summary(table[:, i]) for i, m in enumerate(METRICS)},
+        'fields': {path: {'count': count,
+                          'missing': missing / count if count else None,
+                          'accuracy': exact / count if count else None,
+                          'similarity': similarity / count if count else None,
+                          'extra': extra}
+                   for path, (count, missing, exact, similarity, extra)
+                   in sorted(fields.items())},
+    }
+
+
+def evaluate_dataset(records, workers=None, chunk_size=64, per_record=False):
+    """
+    Scores (ground_truth, prediction) pairs in chunks across a process pool
+    (workers <= 1 runs in this process) and returns the report; with
+    per_record, also each record's metrics in input order.
+    """
+    workers = workers if workers is not None else (Config.EVAL_WORKERS or os.cpu_count())
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        chunk_results = [_evaluate_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            chunk_results = list(pool.map(_evaluate_chunk, chunks))
+    results = [r for chunk in chunk_results for r in chunk]
+    report = build_report(results)
+    if per_record:
+        report['per_record'] = [r['metrics'] for r in results]
+    return report
+
+
+def _print_report(report):
+    print(f"Records: {report['records']}  "
+          f"unparsed predictions: {report['parse_failures']}")
+    for name, summary in report['metrics'].items():
+        if summary['mean'] is not None:
+            print(f"  {name:<22} mean {summary['mean']:.4f}  "
+                  f"min {summary['min']:.4f}  max {summary['max']:.4f}")
+    print("Fields:")
+    for path, stats in report['fields'].items():
+        if not stats['count']:
+            print(f"  {path:<22} not in ground truth  extra {stats['extra']}")
+            continue
+        print(f"  {path:<22} accuracy {stats['accuracy']:.3f}  "
+              f"similarity {stats['similarity']:.3f}  "
+              f"missing {stats['missing']:.3f}  extra {stats['extra']}  "
+              f"({stats['count']})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Score extraction predictions against ground truth")
+    parser.add_argument('path', help="CSV or JSONL file")
+    parser.add_argument('--truth-field', default='ground_truth')
+    parser.add_argument('--prediction-field', default='prediction')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    parser.add_argument('--output', help="write the JSON report here")
+    parser.add_argument('--per-record', action='store_true',
+                        help="include each record's metrics in the report")
+    args = parser.parse_args(argv)
+
+    records = load_evaluation_records(
+        args.path, args.truth_field, args.prediction_field)
+    report = evaluate_dataset(records, args.workers, args.chunk_size,
+                              args.per_record)
+    _print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+from PIL import Image
+
+from config import Config
+from services.ocr_service import decode_image_bytes
+from services.ocr_batch_service import run_ocr, run_ocr_layout
+from services.img_preprocessing_service import run_pipeline
+from utils.import_utils import timed_import
+
+# Runs _ocr_page (preprocessing, then waiting on OCR); pages are rendered
+# or decoded in the thread iterating ocr_pages(), and the OCR itself runs
+# wherever run_ocr() dispatches it (scheduler batches or the worker pool).
+_executor = ThreadPoolExecutor(
+    max_workers=Config.OCR_DOCUMENT_WORKERS, thread_name_prefix='ocr-doc')
+
+
+def detect_document_type(data):
+    if data[:5] == b'%PDF-':
+        return 'pdf'
+    if data[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'tiff'
+    return 'image'
+
+
+def _open_pdf(data):
+    try:
+        pdfium = timed_import('pypdfium2')
+    except ImportError:
+        raise ValueError("PDF support requires the 'pypdfium2' package")
+    try:
+        return pdfium.PdfDocument(data)
+    except Exception as e:  # pypdfium2.PdfiumError is a RuntimeError
+        raise ValueError(f"Could not open PDF: {e}")
+
+
+def _iter_pdf_pages(pdf, dpi):
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            try:
+                bitmap = page.render(scale=dpi / 72)
+                image = np.asarray(bitmap.to_pil().convert('RGB'))
+            except Exception as e:
+                raise ValueError(f"Could not render PDF page {index}: {e}")
+            finally:
+                page.close()
+            yield index, image
+    finally:
+        pdf.close()
+
+
+def _open_tiff(data):
+    try:
+        img = Image.open(io.BytesIO(data))
+        return img, getattr(img, 'n_frames', 1)
+    except Exception as e:  # UnidentifiedImageError, OSError, ...
+        raise ValueError(f"Could not open TIFF: {e}")
+
+
+def _iter_tiff_pages(img, n_frames):
+    try:
+        for index in range(n_frames):
+            try:
+                img.seek(index)
+                image = np.asarray(img.convert('RGB'))
+            except Exception as e:
+                raise ValueError(f"Could not decode TIFF page {index}: {e}")
+            yield index, image
+    finally:
+        img.close()
+
+
+def iter_document_pages(data, dpi=None):
+    """
+    Opens a PDF, a multi-page TIFF or a single image and returns an iterator
+    of (page_index, RGB array). The document is opened (and a single image
+    decoded) right away, so a corrupt upload raises ValueError here; pages
+    are rasterized lazily, PDFs at `dpi`, and a page that cannot be
+    rendered raises ValueError when it is reached.
+    """
+    kind = detect_document_type(data)
+    if kind == 'pdf':
+        return _iter_pdf_pages(_open_pdf(data), dpi or Config.OCR_DOCUMENT_DPI)
+    if kind == 'tiff':
+        return _iter_tiff_pages(*_open_tiff(data))
+    return iter([(0, decode_image_bytes(data))])
+
+
+def _ocr_page(model, index, image, pipeline, tiling, structured):
+    started = time.perf_counter()
+    if pipeline:
+        image, _ = run_pipeline(image, pipeline, color_order='rgb')
+    layout = None
+    if structured:
+        layout = run_ocr_layout(model, image, tiling)
+        text, confidence = layout.text, layout.confidence()
+    else:
+        text, confidence = run_ocr(model, image, tiling)
+    result = {
+        'page': index,
+        'text': text,
+        'confidence': confidence,
+        'ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+    if layout is not None:
+        result['layout'] = layout.to_dict()
+    return result
+
+
+def ocr_pages(pages, model, pipeline=None, max_in_flight=None, tiling=None,
+              structured=False):
+    """
+    OCRs pages from iter_document_pages() in parallel and yields per-page
+    results in completion order. At most max_in_flight pages are rasterized
+    and held in memory at once; the next page is only rendered when one
+    finishes. A page whose OCR fails yields {"page", "error"}. With
+    structured, each page also carries its OCRLayout as a dict.
+    """
+    max_in_flight = max(1, max_in_flight or Config.OCR_DOCUMENT_MAX_IN_FLIGHT)
+    in_flight = {}
+    exhausted = False
+    while True:
+        while not exhausted and len(in_flight) < max_in_flight:
+            try:
+                index, image = next(pages)
+            except StopIteration:
+                exhausted = True
+                break
+            future = _executor.submit(
+                _ocr_page, model, index, image, pipeline, tiling, structured)
+            in_flight[future] = index
+            del image
+        if not in_flight:
+            return
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = in_flight.pop(future)
+            try:
+                yield future.result()
+            except Exception as e:
+                yield {'page': index, 'error': str(e)}
@@ -1,15 +1,12 @@
 import json
-import json5
-import torch
-import pandas as pd
-from sklearn.metrics import mean_squared_error
-from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
-from difflib import SequenceMatcher
-import nltk
-import re
-
-# Download necessary NLTK data (if not already downloaded)
-nltk.download('punkt')
+
+import numpy as np
+
+from utils.json_repair import parse_json, repair_json
+from utils.metrics_utils import (
+    bleu_from_counts, compare_fields, ngram_counts, normalized_edit_distance,
+    word_tokenize
+)
 
 # --- Metrics Functions ---
 
@@ -21,129 +18,136 @@ def exact_match_accuracy(predicted, ground_truth):
     return predicted == ground_truth
 
 
+def _field_accuracy(comparison):
+    leaves = comparison['leaves']
+    if not leaves:
+        # Nothing but empty containers: a match unless values were added
+        return 0 if comparison['extra'] else 1
+    return sum(exact for _, exact, _, _ in leaves) / len(leaves)
+
+
 def field_level_accuracy(predicted, ground_truth):
     """
-    Computes the proportion of fields in ground_truth that are exactly matched in predicted.
-    Works for flat dicts. For nested dicts, you may want to flatten first.
+    Computes the proportion of leaf fields in ground_truth that are exactly
+    matched in predicted. Nested objects are compared field by field and
+    arrays (such as items) are aligned item to item, see compare_fields.
     """
-    if isinstance(predicted, dict) and isinstance(ground_truth, dict):
-        total_fields = len(ground_truth)
-        matched = sum(
-            1 for k in ground_truth if k in predicted and predicted[k] == ground_truth[k])
-        return matched / total_fields if total_fields > 0 else 0
+    if isinstance(ground_truth, (dict, list)):
+        return _field_accuracy(compare_fields(predicted, ground_truth))
     return 0
 
 
-def levenshtein_distance(predicted, ground_truth):
-    pred_str = json.dumps(predicted, sort_keys=True)
-    truth_str = json.dumps(ground_truth, sort_keys=True)
-    return 1 - SequenceMatcher(None, pred_str, truth_str).ratio()
+def _codes(text):
+    """Code points of a string as a uint32 array."""
+    return np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
 
 
-def bleu_score(predicted, ground_truth):
-    reference = [nltk.word_tokenize(json.dumps(ground_truth))]
-    candidate = nltk.word_tokenize(json.dumps(predicted))
-    smoothie = SmoothingFunction().method4
-    return sentence_bleu(reference, candidate, smoothing_function=smoothie)
+def _mse_codes(a, b):
+    length = min(len(a), len(b))
+    if not length:
+        return 0.0
+    diff = a[:length].astype(np.float64) - b[:length]
+    return float(np.dot(diff, diff) / length)
 
 
-def f1_score_text(predicted, ground_truth):
-    pred_tokens = nltk.word_tokenize(json.dumps(predicted))
-    truth_tokens = nltk.word_tokenize(json.dumps(ground_truth))
-    if not pred_tokens or not truth_tokens:
+class PreparedRecord:
+    """
+    One object serialized and tokenized once for all text metrics: `text`
+    is json.dumps(obj), `sorted_text` the key-sorted form used for edit
+    distance, `tokens` the word tokens of `text`.
+    """
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.text = json.dumps(obj)
+        self.sorted_text = json.dumps(obj, sort_keys=True)
+        self.tokens = word_tokenize(self.text)
+        self._ngrams = None
+        self._fields = None
+
+    def codes(self):
+        return _codes(self.text)
+
+    def ngrams(self):
+        """(ngram_counts, length) of the tokens for BLEU, computed once."""
+        if self._ngrams is None:
+            self._ngrams = (ngram_counts(self.tokens), len(self.tokens))
+        return self._ngrams
+
+    def field_scores(self, truth):
+        """compare_fields of this prediction against a truth PreparedRecord, cached."""
+        if self._fields is None or self._fields[0] is not truth:
+            self._fields = (truth, compare_fields(self.obj, truth.obj))
+        return self._fields[1]
+
+
+def _levenshtein(pred, truth):
+    return normalized_edit_distance(pred.sorted_text, truth.sorted_text)
+
+
+def _bleu(pred, truth):
+    return bleu_from_counts([truth.ngrams()], pred.ngrams())
+
+
+def _f1(pred, truth):
+    if not pred.tokens or not truth.tokens:
         return 0.0
-    common = set(pred_tokens).intersection(set(truth_tokens))
-    precision = len(common) / len(pred_tokens)
-    recall = len(common) / len(truth_tokens)
+    common = set(pred.tokens).intersection(truth.tokens)
+    precision = len(common) / len(pred.tokens)
+    recall = len(common) / len(truth.tokens)
     if precision + recall == 0:
         return 0.0
     return 2 * precision * recall / (precision + recall)
 
 
-def mse_text(predicted, ground_truth):
-    pred_tokens = [ord(c) for c in json.dumps(predicted)]
-    truth_tokens = [ord(c) for c in json.dumps(ground_truth)]
-    length = min(len(pred_tokens), len(truth_tokens))
-    return mean_squared_error(truth_tokens[:length], pred_tokens[:length])
+def _mse(pred, truth):
+    return _mse_codes(pred.codes(), truth.codes())
 
-# --- JSON Extraction Helpers ---
 
+def _as_text(value):
+    return value if isinstance(value, str) else json.dumps(value, sort_keys=True)
 
-def extract_valid_json(s):
-    marker = "### Response:"
-    if marker in s:
-        s = s.split(marker, 1)[1]
-    s = s.replace("```", "").strip()
-    start = s.find("{")
-    if start == -1:
-        raise ValueError("No opening brace '{' found in the input.")
-
-    counter = 0
-    in_string = False
-    escape = False
-    end = -1
-    for i in range(start, len(s)):
-        ch = s[i]
-        if ch == '"' and not escape:
-            in_string = not in_string
-        if not in_string:
-            if ch == '{':
-                counter += 1
-            elif ch == '}':
-                counter -= 1
-                if counter == 0:
-                    end = i
-                    break
-        if ch == '\\' and not escape:
-            escape = True
-        else:
-            escape = False
 
-    if end == -1:
-        raise ValueError("No matching closing brace '}' found in the input.")
-    return s[start:end+1]
+def levenshtein_distance(predicted, ground_truth, cutoff=None):
+    """
+    Normalized edit distance (0 = identical, 1 = nothing in common) between
+    two values: strings as they are, anything else as key-sorted JSON, so
+    it works on a single field as well as on a whole document. See
+    normalized_edit_distance for `cutoff`.
+    """
+    return normalized_edit_distance(
+        _as_text(predicted), _as_text(ground_truth), cutoff)
 
 
-def fix_unquoted_keys(s):
-    pattern = r'(?<!")\b([A-Za-z_][A-Za-z0-9_\-]*)\b(?=\s*:)'
-    return re.sub(pattern, r'"\1"', s)
+def bleu_score(predicted, ground_truth):
+    return _bleu(PreparedRecord(predicted), PreparedRecord(ground_truth))
 
 
-def fix_unquoted_string_values(s):
-    pattern = r'(:\s*)([A-Za-z][A-Za-z0-9_\-\/\. ]+?)([\s,\}])'
-    return re.sub(pattern, r'\1"\2"\3', s)
+def f1_score_text(predicted, ground_truth):
+    return _f1(PreparedRecord(predicted), PreparedRecord(ground_truth))
 
 
-def fix_json_format(s):
-    s = re.sub(r'\s+', ' ', s)
-    s = fix_unquoted_keys(s)
-    s = fix_unquoted_string_values(s)
-    return s.strip()
+def mse_text(predicted, ground_truth):
+    return _mse_codes(_codes(json.dumps(predicted)), _codes(json.dumps(ground_truth)))
 
+# --- JSON Extraction Helpers ---
 
-def complete_json(s, max_attempts=5):
-    attempt = 0
-    while attempt < max_attempts:
-        try:
-            json.loads(s)
-            return s
-        except Exception:
-            s += " }"
-            attempt += 1
-    return s
+
+def extract_valid_json(s):
+    """
+    The first JSON object in model output (after the "### Response:" marker
+    if there is one), repaired and closed if it was cut off; see
+    utils.json_repair. Raises ValueError if there is no '{'.
+    """
+    marker = "### Response:"
+    if marker in s:
+        s = s.split(marker, 1)[1]
+    return repair_json(s)
 
 
 def parse_json_safe(json_str):
-    try:
-        parsed = json.loads(json_str)
-    except Exception:
-        fixed_str = fix_json_format(json_str)
-        fixed_str = complete_json(fixed_str)
-        try:
-            parsed = json5.loads(fixed_str)
-        except Exception:
-            return None
-    return parsed
+    """The JSON object in json_str, repaired if needed, or None."""
+    return parse_json(json_str)
 
 
 def normalize_json_values(obj):
@@ -162,17 +166,29 @@ def normalize_json_values(obj):
 # --- Main Evaluation Function ---
 
 
-def evaluate_model_performance(ground_truth_record: dict, llm_output: dict):
+def evaluate_prepared(pred, truth, mse=True):
     """
-    Evaluates the performance of LLM's output against a ground truth record.
-    Returns a dictionary with all metrics, including exact match and field-level accuracy.
+    Metrics for two PreparedRecords. Batch evaluation passes mse=False and
+    computes MSE for many records in one NumPy pass instead.
     """
     metrics = {
-        "exact_match": exact_match_accuracy(llm_output, ground_truth_record),
-        "field_level_accuracy": field_level_accuracy(llm_output, ground_truth_record),
-        "levenshtein": levenshtein_distance(llm_output, ground_truth_record),
-        "bleu": bleu_score(llm_output, ground_truth_record),
-        "f1": f1_score_text(llm_output, ground_truth_record),
-        "mse": mse_text(llm_output, ground_truth_record)
+        "exact_match": exact_match_accuracy(pred.obj, truth.obj),
+        "field_level_accuracy": (_field_accuracy(pred.field_scores(truth))
+                                 if isinstance(truth.obj, (dict, list)) else 0),
+        "levenshtein": _levenshtein(pred, truth),
+        "bleu": _bleu(pred, truth),
+        "f1": _f1(pred, truth),
     }
+    if mse:
+        metrics["mse"] = _mse(pred, truth)
     return metrics
+
+
+def evaluate_model_performance(ground_truth_record: dict, llm_output: dict):
+    """
+    Evaluates the performance of LLM's output against a ground truth record.
+    Returns a dictionary with all metrics, including exact match and field-level accuracy.
+    Each object is serialized and tokenized once for all metrics.
+    """
+    return evaluate_prepared(PreparedRecord(llm_output),
+                             PreparedRecord(ground_truth_record))
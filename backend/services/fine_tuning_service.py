@@ -1,3 +1,6 @@
+from utils.prompt_utils import format_training_example
+
+
 def fine_tune_model(data):
     # Fine-tuning logic here
     return {"message": "Fine-tuning not implemented yet", "input": data}
@@ -42,53 +45,6 @@ def fine_tuning():
         loftq_config=None,
     )
 
-    # --- Prompt template with escaped braces ---
-    alpaca_prompt = """Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
-
-### Instruction:
-You must output a strictly valid JSON object with no extra text, markdown formatting, or comments. Your JSON object must have exactly the following keys and nested structure:
-{{
-  "invoice": {{
-    "client_name": "<string>",
-    "client_address": "<string>",
-    "seller_name": "<string>",
-    "seller_address": "<string>",
-    "invoice_number": "<string>",
-    "invoice_date": "<string>",
-    "due_date": "<string>"
-  }},
-  "items": [
-    {{
-      "description": "<string>",
-      "quantity": "<string>",
-      "total_price": "<string>"
-    }}
-  ],
-  "subtotal": {{
-    "tax": "<string>",
-    "discount": "<string>",
-    "total": "<string>"
-  }},
-  "payment_instructions": {{
-    "due_date": "<string>",
-    "bank_name": "<string>",
-    "account_number": "<string>",
-    "payment_method": "<string>"
-  }}
-}}
-- All property names and string values must be enclosed in double quotes.
-- If a string value contains a double quote, escape it with a backslash (\").
-- Numeric values that are not strictly numeric must be in quotes.
-- Include commas between every key-value pair and array element.
-- Do not include trailing commas.
-- Output solely the JSON object as specified.
-
-### Input:
-{0}
-
-### Response:
-{1}"""
-
     EOS_TOKEN = tokenizer.eos_token
 
     # --- Formatting function ---
@@ -97,7 +53,7 @@ You must output a strictly valid JSON object with no extra text, markdown format
         outputs = examples["Json data"]
         texts = []
         for inp, out in zip(inputs, outputs):
-            prompt = alpaca_prompt.format(inp, out) + EOS_TOKEN
+            prompt = format_training_example(inp, out) + EOS_TOKEN
             texts.append(prompt)
         return {"text": texts}
 
@@ -1,41 +1,262 @@
+import time
 import cv2
 import numpy as np
-from PIL import Image
 
 
-def preprocess_image(image_path, save_output=False, output_path="preprocessed.png", grayscale_path="grayscale.png"):
-    # Load the image
-    image = cv2.imread(image_path)
-    if image is None:
-        raise ValueError(f"Could not load image at path: {image_path}")
+def load_image(image):
+    """
+    Returns a BGR array from a file path, encoded image bytes or an array
+    (arrays are passed through unchanged).
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        decoded = cv2.imdecode(np.frombuffer(image, dtype=np.uint8),
+                               cv2.IMREAD_COLOR)
+        if decoded is None:
+            raise ValueError("Could not decode image bytes")
+        return decoded
+    decoded = cv2.imread(image)
+    if decoded is None:
+        raise ValueError(f"Could not load image at path: {image}")
+    return decoded
 
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    # Save grayscale image for comparison
-    if save_output and grayscale_path:
-        cv2.imwrite(grayscale_path, gray)
+def encode_image(image, ext='.png'):
+    """Encodes an array to image bytes in memory."""
+    ok, buf = cv2.imencode(ext, image)
+    if not ok:
+        raise ValueError(f"Could not encode image as {ext}")
+    return buf.tobytes()
 
-    # Resize (optional)
-    scale_percent = 150  # Increase size by 150%
-    width = int(gray.shape[1] * scale_percent / 100)
-    height = int(gray.shape[0] * scale_percent / 100)
-    resized = cv2.resize(gray, (width, height), interpolation=cv2.INTER_LINEAR)
 
-    # Denoising (Gaussian blur)
-    blurred = cv2.GaussianBlur(resized, (5, 5), 0)
+def preprocess_image(image, save_output=False, output_path="preprocessed.png", grayscale_path="grayscale.png", pipeline=None):
+    """
+    Returns (grayscale, processed). The processed image comes from the given
+    pipeline spec, or DEFAULT_PIPELINE (grayscale, 150% resize, Gaussian
+    blur, adaptive threshold).
+    """
+    # Load the image (path, encoded bytes or BGR array)
+    image = load_image(image)
 
-    # Adaptive thresholding
-    thresh = cv2.adaptiveThreshold(blurred, 255,
-                                   cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                   cv2.THRESH_BINARY, 11, 2)
+    # Grayscale is returned for comparison and feeds the rest of the chain
+    gray, _ = run_pipeline(image, build_pipeline(['grayscale']))
+    if save_output and grayscale_path:
+        cv2.imwrite(grayscale_path, gray)
 
-    # Morphological transformations (remove small noise)
-    kernel = np.ones((1, 1), np.uint8)
-    cleaned = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
+    stages = build_pipeline(DEFAULT_PIPELINE if pipeline is None else pipeline)
+    source = gray if stages and stages[0]['name'] == 'grayscale' else image
+    cleaned, _ = run_pipeline(source, stages)
 
-    # Save or return image
     if save_output:
         cv2.imwrite(output_path, cleaned)
 
     return gray, cleaned
+
+
+# --- Configurable pipeline ---
+#
+# A pipeline is a list of stages, each a stage name or a dict with "name"
+# plus parameters, e.g.
+#   ["grayscale", {"name": "resize", "scale_percent": 200}, "adaptive_threshold"]
+# Parameters are coerced to their declared type and checked against their
+# range; stages that would not change the image with their parameters are
+# dropped when the pipeline is built.
+
+PREPROCESSING_STAGES = {}
+
+
+def _stage(name, is_noop=None, limits=None, **defaults):
+    """
+    Registers a stage. limits maps each parameter to (type, min, max); the
+    defaults must satisfy them.
+    """
+    def register(fn):
+        PREPROCESSING_STAGES[name] = {
+            'fn': fn,
+            'defaults': defaults,
+            'limits': limits or {},
+            'is_noop': is_noop or (lambda params: False),
+        }
+        return fn
+    return register
+
+
+def _coerce_param(stage, key, value, limits):
+    kind, low, high = limits
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"Parameter '{key}' of stage '{stage}' must be a number")
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"Parameter '{key}' of stage '{stage}' must be a number")
+    if kind is int:
+        if not number.is_integer():
+            raise ValueError(f"Parameter '{key}' of stage '{stage}' must be an integer")
+        number = int(number)
+    if not low <= number <= high:
+        raise ValueError(
+            f"Parameter '{key}' of stage '{stage}' must be between {low} and {high}")
+    return number
+
+
+def _odd(value):
+    value = int(value)
+    return value if value % 2 == 1 else value + 1
+
+
+@_stage('grayscale')
+def _grayscale(img, ctx):
+    if img.ndim == 2:
+        return img
+    code = cv2.COLOR_RGB2GRAY if ctx.get('color_order') == 'rgb' else cv2.COLOR_BGR2GRAY
+    return cv2.cvtColor(img, code)
+
+
+@_stage('resize', is_noop=lambda p: p['scale_percent'] == 100,
+        limits={'scale_percent': (float, 1, 1000)}, scale_percent=150)
+def _resize(img, ctx, scale_percent):
+    width = max(1, int(img.shape[1] * scale_percent / 100))
+    height = max(1, int(img.shape[0] * scale_percent / 100))
+    interpolation = cv2.INTER_LINEAR if scale_percent > 100 else cv2.INTER_AREA
+    return cv2.resize(img, (width, height), interpolation=interpolation)
+
+
+@_stage('gaussian_blur', is_noop=lambda p: p['ksize'] <= 1,
+        limits={'ksize': (int, 0, 99)}, ksize=5)
+def _gaussian_blur(img, ctx, ksize):
+    ksize = _odd(ksize)
+    return cv2.GaussianBlur(img, (ksize, ksize), 0)
+
+
+@_stage('median_blur', is_noop=lambda p: p['ksize'] <= 1,
+        limits={'ksize': (int, 0, 99)}, ksize=3)
+def _median_blur(img, ctx, ksize):
+    return cv2.medianBlur(img, _odd(ksize))
+
+
+@_stage('adaptive_threshold',
+        limits={'block_size': (int, 3, 255), 'c': (float, -255, 255)},
+        block_size=11, c=2)
+def _adaptive_threshold(img, ctx, block_size, c):
+    img = _grayscale(img, ctx)
+    return cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 cv2.THRESH_BINARY, _odd(block_size), c)
+
+
+@_stage('otsu_threshold')
+def _otsu_threshold(img, ctx):
+    img = _grayscale(img, ctx)
+    _, thresh = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return thresh
+
+
+@_stage('morph_open', is_noop=lambda p: p['ksize'] <= 1,
+        limits={'ksize': (int, 0, 99)}, ksize=1)
+def _morph_open(img, ctx, ksize):
+    kernel = np.ones((int(ksize), int(ksize)), np.uint8)
+    return cv2.morphologyEx(img, cv2.MORPH_OPEN, kernel)
+
+
+# Same chain as preprocess_image(); morph_open with a 1x1 kernel is a no-op
+# and is dropped when built.
+DEFAULT_PIPELINE = [
+    'grayscale',
+    {'name': 'resize', 'scale_percent': 150},
+    {'name': 'gaussian_blur', 'ksize': 5},
+    {'name': 'adaptive_threshold', 'block_size': 11, 'c': 2},
+    {'name': 'morph_open', 'ksize': 1},
+]
+
+PIPELINE_PRESETS = {
+    'default': DEFAULT_PIPELINE,
+    'none': [],
+}
+
+
+def parse_pipeline_spec(spec):
+    """
+    Accepts a preset name, a list of stages, or a compact string such as
+    "grayscale,resize:scale_percent=200,adaptive_threshold:block_size=15"
+    (the form used in query strings and form fields).
+    """
+    if spec is None:
+        return []
+    if isinstance(spec, str):
+        if spec in PIPELINE_PRESETS:
+            return list(PIPELINE_PRESETS[spec])
+        stages = []
+        for item in filter(None, (part.strip() for part in spec.split(','))):
+            name, _, params = item.partition(':')
+            stage = {'name': name.strip()}
+            for pair in filter(None, params.split(';')):
+                key, _, value = pair.partition('=')
+                stage[key.strip()] = float(value) if '.' in value else int(value)
+            stages.append(stage)
+        return stages
+    if isinstance(spec, list):
+        return spec
+    raise ValueError("Preprocessing pipeline must be a preset, list or string")
+
+
+def build_pipeline(spec):
+    """
+    Validates a pipeline spec and returns a normalized list of
+    {"name": ..., **params} dicts with defaults filled in, parameters
+    coerced to their types and no-op stages removed. The normalized form is
+    also what goes into the cache key. Raises ValueError for unknown stages
+    or parameters and for values of the wrong type or out of range.
+    """
+    pipeline = []
+    for stage in parse_pipeline_spec(spec):
+        if isinstance(stage, str):
+            stage = {'name': stage}
+        if not isinstance(stage, dict):
+            raise ValueError("Preprocessing stages must be names or objects")
+        name = stage.get('name')
+        if not isinstance(name, str) or name not in PREPROCESSING_STAGES:
+            raise ValueError(f"Unknown preprocessing stage: {name}")
+        definition = PREPROCESSING_STAGES[name]
+        params = dict(definition['defaults'])
+        for key, value in stage.items():
+            if key == 'name':
+                continue
+            if key not in params:
+                raise ValueError(f"Unknown parameter '{key}' for stage '{name}'")
+            params[key] = value
+        params = {key: _coerce_param(name, key, value, definition['limits'][key])
+                  for key, value in params.items()}
+        if definition['is_noop'](params):
+            continue
+        pipeline.append({'name': name, **params})
+    return pipeline
+
+
+def run_pipeline(image, pipeline, color_order='bgr'):
+    """
+    Runs a built pipeline on an array. Returns (image, timings) where
+    timings lists {"stage": name, "ms": elapsed} per stage.
+    """
+    ctx = {'color_order': color_order}
+    timings = []
+    for stage in pipeline:
+        params = {k: v for k, v in stage.items() if k != 'name'}
+        started = time.perf_counter()
+        image = PREPROCESSING_STAGES[stage['name']]['fn'](image, ctx, **params)
+        timings.append({'stage': stage['name'],
+                        'ms': round((time.perf_counter() - started) * 1000, 3)})
+    return image, timings
+
+
+def downscale_max_side(image, max_side):
+    """
+    Shrinks an array so its longest side is at most max_side. Returns
+    (image, scale) with scale <= 1; images within the limit are untouched.
+    """
+    longest = max(image.shape[:2])
+    if not max_side or longest <= max_side:
+        return image, 1.0
+    scale = max_side / longest
+    size = (max(1, round(image.shape[1] * scale)),
+            max(1, round(image.shape[0] * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale
@@ -0,0 +1,176 @@
+import json
+
+from utils.import_utils import timed_import
+from utils.json_repair import JSONRepairer
+
+# Anchors prepended when tokenizing a JSON fragment on its own, so
+# SentencePiece tokenizers do not add their leading-space marker to it
+_ANCHORS = ('a', '\n', '{')
+
+
+class TokenVocab:
+    """
+    Per-tokenizer tables for constrained decoding, built once at load time:
+    which tokens may appear inside a JSON string, which close one, and a
+    cache of tokenized structural fragments.
+    """
+
+    def __init__(self, tokenizer):
+        torch = timed_import('torch')
+        self.tokenizer = tokenizer
+        self.eos_id = tokenizer.eos_token_id
+        size = len(tokenizer)
+        texts = tokenizer.batch_decode([[i] for i in range(size)])
+        # Text of each token on its own, for tracking JSON structure
+        self.texts = texts
+        pieces = tokenizer.convert_ids_to_tokens(list(range(size)))
+        special = set(tokenizer.all_special_ids)
+        self._fragments = {}
+        self.quote_ids = [i for i, piece in enumerate(pieces) if piece == '"']
+        if not self.quote_ids:
+            self.quote_ids = self.encode('"')[:1]
+        # Inside a string: no quote, backslash or control characters, except
+        # the tokens that close it
+        self.string_ok = torch.tensor([
+            i not in special and bool(text)
+            and not any(ch in '"\\' or ord(ch) < 0x20 for ch in text)
+            for i, text in enumerate(texts)])
+        self.string_ok[self.quote_ids] = True
+
+    def encode(self, text):
+        ids = self._fragments.get(text)
+        if ids is None:
+            ids = self._encode(text)
+            self._fragments[text] = ids
+        return ids
+
+    def _encode(self, text):
+        tok = self.tokenizer
+        for anchor in _ANCHORS:
+            anchor_ids = tok(anchor, add_special_tokens=False).input_ids
+            ids = tok(anchor + text, add_special_tokens=False).input_ids
+            if ids[:len(anchor_ids)] == anchor_ids:
+                return ids[len(anchor_ids):]
+        return tok(text, add_special_tokens=False).input_ids
+
+
+class GreedyDecoder:
+    """
+    Unconstrained greedy decoding until EOS or, with stop_at_json, until
+    the first JSON object in the output is complete, so nothing the model
+    would write after the closing brace is generated.
+    """
+
+    def __init__(self, vocab, stop_at_json=False):
+        self.eos_id = vocab.eos_id
+        self.texts = vocab.texts
+        self.json = JSONRepairer() if stop_at_json else None
+
+    def advance(self, logits):
+        """Returns (tokens to emit, done) given the logits of the next position."""
+        token = int(logits.argmax())
+        if token == self.eos_id:
+            return [], True
+        if self.json is not None and self.json.feed(self.texts[token]):
+            return [token], True
+        return [token], False
+
+
+def _json_program(node, indent, level=0):
+    """
+    Yields the steps that write `node` as indented JSON:
+    ('text', s) for fixed structure, ('string',) for a free string value and
+    ('choice', [a, b]) where the decoder sends back the chosen index.
+    """
+    pad = ' ' * indent
+    if isinstance(node, dict):
+        yield ('text', '{')
+        for i, (key, value) in enumerate(node.items()):
+            yield ('text', (',' if i else '') + '\n' + pad * (level + 1)
+                   + json.dumps(key) + ': ')
+            yield from _json_program(value, indent, level + 1)
+        yield ('text', '\n' + pad * level + '}')
+    elif isinstance(node, list):
+        yield ('text', '[')
+        item_open = '\n' + pad * (level + 1)
+        close = '\n' + pad * level + ']'
+        count = 0
+        while True:
+            options = [item_open if count == 0 else ',' + item_open, close]
+            if count == 0:
+                options[1] = ']'
+            choice = yield ('choice', options)
+            if choice == 1:
+                yield ('text', options[1])
+                return
+            yield ('text', options[0])
+            yield from _json_program(node[0], indent, level + 1)
+            count += 1
+    else:
+        # The string step ends with the closing quote
+        yield ('text', '"')
+        yield ('string',)
+
+
+class SchemaDecoder:
+    """
+    Decodes JSON that follows a schema (see INVOICE_SCHEMA): keys, braces
+    and punctuation are forced, string values are generated with tokens
+    that cannot break out of the string, array length is chosen by the
+    model's preference between "next item" and "close", and decoding ends
+    as soon as the top-level object closes, without waiting for EOS.
+    """
+
+    def __init__(self, vocab, schema, max_value_tokens, max_items, indent=2):
+        self.vocab = vocab
+        self.max_value_tokens = max_value_tokens
+        self.max_items = max_items
+        self._program = _json_program(schema, indent)
+        self._step = None
+        self._value_tokens = 0
+        self._items = 0
+
+    def _run(self, send=None):
+        """
+        Runs the program up to the next step that needs the model. Returns
+        the tokens of the fixed text passed on the way and whether the JSON
+        is complete.
+        """
+        text = ''
+        done = False
+        try:
+            step = self._program.send(send)
+            while step[0] == 'text':
+                text += step[1]
+                step = next(self._program)
+            self._step = step
+            self._value_tokens = 0
+        except StopIteration:
+            done = True
+        return (self.vocab.encode(text) if text else []), done
+
+    def advance(self, logits):
+        if self._step is None:
+            return self._run()
+        if self._step[0] == 'string':
+            token = self._string_token(logits)
+            if token not in self.vocab.quote_ids:
+                self._value_tokens += 1
+                return [token], False
+            tokens, done = self._run()
+            return [token] + tokens, done
+        # ('choice', options): compare the first token of each option
+        first = [self.vocab.encode(text)[0] for text in self._step[1]]
+        if self._items >= self.max_items:
+            choice = 1
+        else:
+            choice = 0 if float(logits[first[0]]) >= float(logits[first[1]]) else 1
+        self._items += choice == 0
+        return self._run(choice)
+
+    def _string_token(self, logits):
+        torch = timed_import('torch')
+        if self._value_tokens >= self.max_value_tokens:
+            return self.vocab.quote_ids[0]
+        masked = torch.where(self.vocab.string_ok, logits, float('-inf'))
+        return int(masked.argmax())
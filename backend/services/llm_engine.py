@@ -0,0 +1,538 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from config import Config
+from utils.import_utils import timed_import
+from utils.prompt_utils import INVOICE_INSTRUCTION, RESPONSE_HEADER, prompt_prefix
+from services.llm_decoding import TokenVocab, GreedyDecoder, SchemaDecoder
+from services.llm_lora import LoRAAdapter, LoRARouter
+from services.model_store_service import (
+    locate_adapter, resolve_adapter, resolve_base_model
+)
+
+# Prompt prefix caches kept per adapter, the invoice one included
+_MAX_PREFIXES = 4
+# Most forced tokens one row feeds per decode step
+_MAX_FEED = 32
+
+
+class _Request:
+    def __init__(self, input_text, instruction, adapter, adapter_ref, schema,
+                 max_new_tokens, future, stop_at_json=False):
+        self.input_text = input_text
+        self.instruction = instruction
+        # Adapter directory ('' for the bare base model) and the reference
+        # it was requested by
+        self.adapter = adapter
+        self.adapter_ref = adapter_ref
+        self.schema = schema
+        self.stop_at_json = stop_at_json
+        self.max_new_tokens = max_new_tokens
+        self.future = future
+        self.decoder = None
+        self.input_tokens = 0
+        self.tokens = []
+        # Emitted tokens not yet fed to the model
+        self.pending = []
+        self.started = time.perf_counter()
+
+
+def _cache_to_layers(cache):
+    """Returns [(keys, values)] per layer for any past_key_values format."""
+    if isinstance(cache, (tuple, list)):
+        return [(k, v) for k, v in cache]
+    if hasattr(cache, 'layers'):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+
+class LLMEngine:
+    """
+    Resident extraction model served from one scheduler thread.
+
+    Requests are decoded together in a batch of up to max_batch_size rows
+    (continuous batching): a finished row is resolved and dropped from the
+    batch at once, and queued requests are prefilled and merged into the
+    running batch between decode steps. The prompt up to the input is the
+    same for every request with a given instruction, so its KV cache is
+    computed once (for the invoice instruction at load time) and only the
+    OCR text and response header are prefilled per request.
+
+    Each row is driven by a decoder: greedy until EOS (or the end of the
+    first JSON object), or a SchemaDecoder that writes JSON following a
+    schema. Structural text the decoder forces is fed to the model several
+    tokens per step.
+
+    LoRA adapters are applied through a LoRARouter instead of being merged,
+    so one resident base model serves any number of them: each request
+    names its adapter, rows for different adapters are decoded in the same
+    batch, and up to max_adapters adapters (with their prefix caches) stay
+    loaded, least recently used first out.
+    """
+
+    def __init__(self, base_model=None, adapter=None, device=None,
+                 quantize=None, max_batch_size=None, window_ms=None,
+                 max_new_tokens=None, max_input_tokens=None, max_adapters=None):
+        self.base_model = base_model or Config.LLM_BASE_MODEL
+        self.adapter = adapter if adapter is not None else Config.LLM_ADAPTER
+        self.device = device or Config.LLM_DEVICE
+        self.quantize = quantize or Config.LLM_QUANTIZE
+        self.max_batch_size = max(1, max_batch_size or Config.LLM_MAX_BATCH_SIZE)
+        self.window = (Config.LLM_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.max_new_tokens = max_new_tokens or Config.LLM_MAX_NEW_TOKENS
+        self.max_input_tokens = max_input_tokens or Config.LLM_MAX_INPUT_TOKENS
+        self.max_adapters = max(1, max_adapters or Config.LLM_MAX_ADAPTERS)
+        self.model = None
+        self.tokenizer = None
+        self.status = 'not loaded'
+        self.error = None
+        self._loaded = threading.Event()
+        # adapter directory -> {'ref', 'adapter', 'prefixes', 'requests'}
+        self._adapters = OrderedDict()
+        self._adapters_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    # --- Loading ---
+
+    def load(self):
+        if Config.LLM_OFFLINE:
+            # Read by huggingface_hub when it is first imported
+            os.environ['HF_HUB_OFFLINE'] = '1'
+        torch = timed_import('torch')
+        transformers = timed_import('transformers')
+        if self.device == 'auto':
+            self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        if self.quantize == 'auto':
+            self.quantize = 'int8-dynamic' if self.device == 'cpu' else 'none'
+
+        print(f"Loading LLM {self.base_model} on {self.device}...", flush=True)
+        path = resolve_base_model(self.base_model)
+        self.dtype = torch.float16 if self.device == 'cuda' else torch.float32
+        # Safetensors weights are memory-mapped and copied tensor by tensor
+        tokenizer = transformers.AutoTokenizer.from_pretrained(
+            path, local_files_only=Config.LLM_OFFLINE)
+        model = transformers.AutoModelForCausalLM.from_pretrained(
+            path,
+            torch_dtype=self.dtype,
+            low_cpu_mem_usage=True,
+            local_files_only=Config.LLM_OFFLINE,
+        )
+        model.eval()
+        if self.quantize == 'int8-dynamic':
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.to(self.device)
+        self.lora = LoRARouter(self.model, self.device)
+        self.tokenizer = tokenizer
+        self.pad_id = (tokenizer.pad_token_id if tokenizer.pad_token_id is not None
+                       else tokenizer.eos_token_id)
+        self.response_ids = tokenizer(
+            RESPONSE_HEADER, add_special_tokens=False).input_ids
+        self.vocab = TokenVocab(tokenizer)
+        if self.adapter:
+            self._adapter_entry(
+                locate_adapter(self.adapter, allow_path=True), self.adapter)
+        else:
+            self._adapter_entry('', '')
+
+    def _adapter_entry(self, key, ref):
+        """
+        Returns the loaded adapter for a directory ('' for none), loading it
+        and evicting the least recently used one as needed. Rows already
+        decoding keep a reference to an evicted adapter until they finish.
+        """
+        entry = self._adapters.get(key)
+        if entry is None:
+            adapter = None
+            if key:
+                adapter = LoRAAdapter(resolve_adapter(key), self.device, self.dtype)
+                self.lora.register(adapter)
+                print(f"Loaded adapter {ref} ({adapter.nbytes() / 1e6:.1f} MB)",
+                      flush=True)
+            entry = {'ref': ref, 'adapter': adapter, 'prefixes': {}, 'requests': 0}
+            with self._adapters_lock:
+                self._adapters[key] = entry
+                while len(self._adapters) > self.max_adapters:
+                    _, old = self._adapters.popitem(last=False)
+                    print(f"Evicted adapter {old['ref'] or '(base)'}", flush=True)
+            self._prefix(entry, INVOICE_INSTRUCTION)
+        with self._adapters_lock:
+            self._adapters.move_to_end(key)
+        return entry
+
+    def _prefix(self, entry, instruction):
+        """Returns the KV cache (per-layer keys/values) of the prompt prefix."""
+        prefixes = entry['prefixes']
+        cache = prefixes.get(instruction)
+        if cache is None:
+            torch = timed_import('torch')
+            ids = self.tokenizer(prompt_prefix(instruction),
+                                 return_tensors='pt').input_ids
+            self.lora.route([entry['adapter']])
+            with torch.inference_mode():
+                out = self.model(ids.to(self.device), use_cache=True)
+            cache = _cache_to_layers(out.past_key_values)
+            if len(prefixes) >= _MAX_PREFIXES:
+                # Keep the invoice prefix; drop the oldest other one
+                oldest = next(k for k in prefixes if k != INVOICE_INSTRUCTION)
+                del prefixes[oldest]
+            prefixes[instruction] = cache
+        return cache
+
+    # --- Public API ---
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='llm-batch', daemon=True)
+                self._thread.start()
+
+    def submit(self, input_text, instruction=INVOICE_INSTRUCTION,
+               max_new_tokens=None, schema=None, adapter=None, stop_at_json=False):
+        """
+        Queues one generation; with a schema the output is constrained to
+        JSON of that shape, with stop_at_json unconstrained generation ends
+        as soon as a complete JSON object has been written. `adapter` is a
+        store reference ('' for the bare base model, None for the default
+        adapter); an unknown or invalid one raises ValueError here, as does
+        max_new_tokens outside 1..the engine's limit. Returns a Future of
+        {'text', 'tokens', 'ms', 'adapter', 'input_tokens', 'truncated'}.
+        """
+        if max_new_tokens is None:
+            max_new_tokens = self.max_new_tokens
+        elif not 1 <= max_new_tokens <= self.max_new_tokens:
+            raise ValueError(
+                f"max_new_tokens must be between 1 and {self.max_new_tokens}")
+        ref = self.adapter if adapter is None else adapter
+        # Only the configured default may be a directory; per-request
+        # adapters must be store references
+        key = locate_adapter(ref, allow_path=adapter is None) if ref else ''
+        self.start()
+        future = Future()
+        self._queue.put(_Request(
+            input_text, instruction, key, ref, schema,
+            max_new_tokens, future, stop_at_json))
+        return future
+
+    def generate(self, input_text, instruction=INVOICE_INSTRUCTION,
+                 max_new_tokens=None, schema=None, adapter=None, stop_at_json=False):
+        return self.submit(input_text, instruction, max_new_tokens, schema,
+                           adapter, stop_at_json).result()
+
+    def count_tokens(self, texts):
+        """
+        Token count of each string in `texts` as the model sees it, waiting
+        for the tokenizer to load if needed.
+        """
+        self.start()
+        self._loaded.wait()
+        if self.tokenizer is None:
+            raise self.error
+        ids = self.tokenizer(list(texts), add_special_tokens=False).input_ids
+        return [len(i) for i in ids]
+
+    def swap_adapter(self, ref):
+        """
+        Makes `ref` (a store reference; '' for the bare base model) the
+        default adapter without reloading the base. Requests already queued
+        keep the adapter they were submitted with.
+        """
+        if ref:
+            locate_adapter(ref)
+        self.adapter = ref
+        return self.stats()
+
+    def stats(self):
+        return {
+            'status': self.status,
+            'error': str(self.error) if self.error else None,
+            'base_model': self.base_model,
+            'adapter': self.adapter or None,
+            'adapters': self.adapter_stats(),
+            'max_adapters': self.max_adapters,
+            'device': self.device,
+            'quantize': self.quantize,
+            'max_batch_size': self.max_batch_size,
+            'queued': self._queue.qsize(),
+        }
+
+    def adapter_stats(self):
+        """Loaded adapters, most recently used first."""
+        with self._adapters_lock:
+            entries = list(self._adapters.values())
+        return [{
+            'adapter': entry['ref'] or None,
+            'mb': round(entry['adapter'].nbytes() / 1e6, 1) if entry['adapter'] else 0.0,
+            'requests': entry['requests'],
+        } for entry in reversed(entries)]
+
+    # --- Scheduler ---
+
+    def _run(self):
+        self.status = 'loading'
+        try:
+            self.load()
+        except Exception as e:
+            self.status = 'failed'
+            self.error = e
+            self._loaded.set()
+            print(f"LLM load failed: {e}", flush=True)
+            while True:
+                request = self._queue.get()
+                if request.future.set_running_or_notify_cancel():
+                    request.future.set_exception(e)
+        self.status = 'ready'
+        self._loaded.set()
+        print("LLM ready", flush=True)
+        batch = None
+        while True:
+            batch = self._admit(batch)
+            if batch is None:
+                continue
+            try:
+                batch = self._step(batch)
+            except Exception as e:
+                print(f"LLM batch failed: {e}", flush=True)
+                self._fail(batch['requests'], e)
+                batch = None
+
+    @staticmethod
+    def _fail(requests, error):
+        for request in requests:
+            if not request.future.done():
+                request.future.set_exception(error)
+
+    def _collect(self, free, block):
+        requests = []
+        deadline = None
+        while len(requests) < free:
+            try:
+                if not block:
+                    item = self._queue.get_nowait()
+                elif deadline is None:
+                    item = self._queue.get()
+                    deadline = time.monotonic() + self.window
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            requests.append(item)
+        return [r for r in requests if r.future.set_running_or_notify_cancel()]
+
+    def _admit(self, batch):
+        # Block for work only when nothing is being decoded
+        free = self.max_batch_size - (len(batch['requests']) if batch else 0)
+        if free <= 0:
+            return batch
+        requests = self._collect(free, block=batch is None)
+        # One prefill per adapter and instruction (they share a prefix
+        # cache); the groups then decode together in one batch.
+        groups = {}
+        for request in requests:
+            groups.setdefault((request.adapter, request.instruction),
+                              []).append(request)
+        for group in groups.values():
+            try:
+                new = self._prefill(group)
+                batch = new if batch is None else self._merge(batch, new)
+            except Exception as e:
+                print(f"LLM prefill failed: {e}", flush=True)
+                self._fail(group, e)
+        return batch
+
+    def _prefill(self, requests):
+        """
+        Runs the per-request part of the prompt on top of the cached prefix
+        shared by `requests`. Rows are laid out as
+        [prefix][padding][input + response header]; padding is masked out
+        and positions skip it.
+        """
+        torch = timed_import('torch')
+        entry = self._adapter_entry(requests[0].adapter, requests[0].adapter_ref)
+        entry['requests'] += len(requests)
+        adapter = entry['adapter']
+        prefix = self._prefix(entry, requests[0].instruction)
+        prefix_len = prefix[0][0].shape[2]
+        suffixes = []
+        for request in requests:
+            request.decoder = self._decoder(request)
+            ids = self.tokenizer(request.input_text,
+                                 add_special_tokens=False).input_ids
+            request.input_tokens = len(ids)
+            suffixes.append(ids[:self.max_input_tokens] + self.response_ids)
+        n = len(requests)
+        width = max(len(s) for s in suffixes)
+        input_ids = torch.full((n, width), self.pad_id, dtype=torch.long)
+        mask = torch.zeros((n, prefix_len + width), dtype=torch.long)
+        mask[:, :prefix_len] = 1
+        for i, ids in enumerate(suffixes):
+            input_ids[i, width - len(ids):] = torch.tensor(ids)
+            mask[i, prefix_len + width - len(ids):] = 1
+        positions = (mask.cumsum(1) - 1)[:, prefix_len:]
+        past = [(k.expand(n, -1, -1, -1).contiguous(),
+                 v.expand(n, -1, -1, -1).contiguous())
+                for k, v in prefix]
+        adapters = [adapter] * n
+        self.lora.route(adapters)
+        logits, past = self._forward(input_ids, mask, positions, past)
+        return {
+            'requests': requests,
+            'adapters': adapters,
+            'past': past,
+            'mask': mask,
+            'positions': positions[:, -1] + 1,
+            'logits': logits,
+        }
+
+    def _decoder(self, request):
+        if request.schema is None:
+            return GreedyDecoder(self.vocab, request.stop_at_json)
+        return SchemaDecoder(self.vocab, request.schema,
+                             Config.LLM_MAX_VALUE_TOKENS, Config.LLM_MAX_ITEMS)
+
+    def _forward(self, input_ids, mask, positions, past):
+        torch = timed_import('torch')
+        cache = past
+        cache_utils = timed_import('transformers.cache_utils')
+        if hasattr(cache_utils, 'DynamicCache'):
+            cache = cache_utils.DynamicCache()
+            for layer, (k, v) in enumerate(past):
+                cache.update(k, v, layer)
+        with torch.inference_mode():
+            out = self.model(
+                input_ids=input_ids.to(self.device),
+                attention_mask=mask.to(self.device),
+                position_ids=positions.to(self.device),
+                past_key_values=cache,
+                use_cache=True,
+            )
+        return out.logits[:, -1, :].float().cpu(), _cache_to_layers(out.past_key_values)
+
+    def _merge(self, batch, new):
+        # Align cache lengths by left-padding the shorter side with masked
+        # zeros, then stack the rows.
+        torch = timed_import('torch')
+        length = max(batch['mask'].shape[1], new['mask'].shape[1])
+
+        def pad(part):
+            missing = length - part['mask'].shape[1]
+            if missing == 0:
+                return part['past'], part['mask']
+            past = []
+            for k, v in part['past']:
+                zeros = k.new_zeros(k.shape[:2] + (missing,) + k.shape[3:])
+                past.append((torch.cat([zeros, k], 2),
+                             torch.cat([zeros.to(v.dtype), v], 2)))
+            mask = torch.cat([part['mask'].new_zeros(
+                (part['mask'].shape[0], missing)), part['mask']], 1)
+            return past, mask
+
+        past_a, mask_a = pad(batch)
+        past_b, mask_b = pad(new)
+        return {
+            'requests': batch['requests'] + new['requests'],
+            'adapters': batch['adapters'] + new['adapters'],
+            'past': [(torch.cat([ka, kb]), torch.cat([va, vb]))
+                     for (ka, va), (kb, vb) in zip(past_a, past_b)],
+            'mask': torch.cat([mask_a, mask_b]),
+            'positions': torch.cat([batch['positions'], new['positions']]),
+            'logits': torch.cat([batch['logits'], new['logits']]),
+        }
+
+    def _step(self, batch):
+        """
+        Lets the decoder of each row with nothing left to feed pick its next
+        tokens from the latest logits, resolves finished rows, then runs one
+        forward pass feeding every remaining row its next tokens.
+        """
+        torch = timed_import('torch')
+        keep = []
+        feeds = []
+        for i, request in enumerate(batch['requests']):
+            if not request.pending:
+                tokens, done = request.decoder.advance(batch['logits'][i])
+                # A burst of forced tokens must not overrun the budget
+                tokens = tokens[:request.max_new_tokens - len(request.tokens)]
+                request.tokens.extend(tokens)
+                if done or not tokens \
+                        or len(request.tokens) >= request.max_new_tokens:
+                    request.future.set_result(self._finish(request))
+                    continue
+                request.pending = tokens
+            keep.append(i)
+            feeds.append(request.pending[:_MAX_FEED])
+            request.pending = request.pending[_MAX_FEED:]
+        if not keep:
+            return None
+        if len(keep) < len(batch['requests']):
+            batch = self._select(batch, keep)
+
+        # Rows feed different numbers of tokens: right-align them and mask
+        # the padding on the left, as in prefill.
+        n = len(keep)
+        width = max(len(feed) for feed in feeds)
+        input_ids = torch.full((n, width), self.pad_id, dtype=torch.long)
+        new_mask = torch.zeros((n, width), dtype=torch.long)
+        positions = batch['positions'][:, None].repeat(1, width)
+        for row, feed in enumerate(feeds):
+            start = width - len(feed)
+            input_ids[row, start:] = torch.tensor(feed)
+            new_mask[row, start:] = 1
+            positions[row, start:] += torch.arange(len(feed))
+        mask = torch.cat([batch['mask'], new_mask], 1)
+        self.lora.route(batch['adapters'])
+        logits, past = self._forward(input_ids, mask, positions, batch['past'])
+        lengths = torch.tensor([len(feed) for feed in feeds])
+        batch.update(past=past, mask=mask, logits=logits,
+                     positions=batch['positions'] + lengths)
+        return batch
+
+    def _select(self, batch, keep):
+        torch = timed_import('torch')
+        rows = torch.tensor(keep)
+        mask = batch['mask'][rows]
+        # Drop cache columns that are padding for every remaining row
+        first = int((mask.sum(0) > 0).nonzero()[0])
+        device_rows = rows.to(self.device)
+        return {
+            'requests': [batch['requests'][i] for i in keep],
+            'adapters': [batch['adapters'][i] for i in keep],
+            'past': [(k[device_rows, :, first:], v[device_rows, :, first:])
+                     for k, v in batch['past']],
+            'mask': mask[:, first:],
+            'positions': batch['positions'][rows],
+            'logits': batch['logits'][rows],
+        }
+
+    def _finish(self, request):
+        return {
+            'text': self.tokenizer.decode(request.tokens, skip_special_tokens=True),
+            'tokens': len(request.tokens),
+            'ms': round((time.perf_counter() - request.started) * 1000, 1),
+            'adapter': request.adapter_ref or None,
+            'input_tokens': request.input_tokens,
+            'truncated': request.input_tokens > self.max_input_tokens,
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_llm_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = LLMEngine()
+    return _engine
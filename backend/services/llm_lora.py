@@ -0,0 +1,121 @@
+import json
+import os
+import re
+
+from utils.import_utils import timed_import
+
+# PEFT key: base_model.model.<module>.lora_A[.<adapter name>].weight
+_LORA_KEY = re.compile(
+    r'^(?:base_model\.model\.)?(?P<module>.+)\.lora_(?P<part>[AB])(?:\.[^.]+)?\.weight$')
+
+
+class LoRAAdapter:
+    """
+    LoRA weights of one PEFT adapter directory, read from its safetensors
+    file through a memory map (only the tensors are copied out, never the
+    whole file). The scaling factor is folded into B.
+    """
+
+    def __init__(self, path, device='cpu', dtype=None):
+        torch = timed_import('torch')
+        safetensors = timed_import('safetensors')
+        with open(os.path.join(path, 'adapter_config.json'), encoding='utf-8') as f:
+            config = json.load(f)
+        if config.get('peft_type', 'LORA') != 'LORA':
+            raise ValueError(f"{path}: only LoRA adapters are supported")
+        if config.get('modules_to_save'):
+            raise ValueError(
+                f"{path}: adapters with modules_to_save replace base weights "
+                "and cannot be swapped")
+        self.path = path
+        self.base_model = config.get('base_model_name_or_path')
+        alpha = config.get('lora_alpha', config['r'])
+        alpha_pattern = config.get('alpha_pattern') or {}
+        use_rslora = config.get('use_rslora', False)
+
+        parts = {}
+        with safetensors.safe_open(os.path.join(path, 'adapter_model.safetensors'),
+                                   framework='pt', device='cpu') as f:
+            for key in f.keys():
+                match = _LORA_KEY.match(key)
+                if match is None:
+                    raise ValueError(f"{path}: unsupported adapter tensor {key}")
+                parts.setdefault(match['module'], {})[match['part']] = f.get_tensor(key)
+
+        dtype = dtype or torch.float32
+        self.weights = {}  # module name -> (A (r, in), B * scale (out, r))
+        for module, ab in parts.items():
+            a, b = ab['A'], ab['B']
+            r = a.shape[0]
+            module_alpha = next((v for k, v in alpha_pattern.items()
+                                 if module.endswith(k)), alpha)
+            scale = module_alpha / (r ** 0.5 if use_rslora else r)
+            self.weights[module] = (
+                a.to(device=device, dtype=dtype),
+                (b.float() * scale).to(device=device, dtype=dtype))
+
+    def nbytes(self):
+        return sum(a.numel() * a.element_size() + b.numel() * b.element_size()
+                   for a, b in self.weights.values())
+
+
+class LoRARouter:
+    """
+    Applies LoRA adapters to a model without touching its weights: forward
+    hooks on the targeted linear layers add x @ A^T @ B^T to their output.
+    The base weights stay as loaded (and quantized), and each row of a
+    batch can use a different adapter (or none), so requests for several
+    adapters share one forward pass.
+    """
+
+    def __init__(self, model, device='cpu'):
+        self.modules = dict(model.named_modules())
+        self.device = device
+        # [(adapter, rows)] for the next forward pass; rows None = all rows
+        self._plan = []
+        self._hooked = set()
+
+    def _hook(self, name):
+        def hook(module, inputs, output):
+            x = inputs[0]
+            for adapter, rows in self._plan:
+                pair = adapter.weights.get(name)
+                if pair is None:
+                    continue
+                a, b = pair
+                if rows is None:
+                    output = output + ((x.to(a.dtype) @ a.t()) @ b.t()).to(output.dtype)
+                else:
+                    delta = (x[rows].to(a.dtype) @ a.t()) @ b.t()
+                    output = output.index_add(0, rows, delta.to(output.dtype))
+            return output
+        return hook
+
+    def register(self, adapter):
+        """Hooks the layers `adapter` targets; raises ValueError if it does not fit."""
+        for name, (a, b) in adapter.weights.items():
+            module = self.modules.get(name)
+            if module is None:
+                raise ValueError(f"Adapter targets unknown module {name}")
+            in_features = getattr(module, 'in_features', None)
+            out_features = getattr(module, 'out_features', None)
+            if (in_features, out_features) != (a.shape[1], b.shape[0]):
+                raise ValueError(
+                    f"Adapter shape for {name} does not match the base model")
+        for name in adapter.weights:
+            if name not in self._hooked:
+                self.modules[name].register_forward_hook(self._hook(name))
+                self._hooked.add(name)
+
+    def route(self, adapters):
+        """Sets the adapter (or None) of each batch row for the next forward pass."""
+        torch = timed_import('torch')
+        groups = {}
+        for row, adapter in enumerate(adapters):
+            if adapter is not None:
+                groups.setdefault(id(adapter), (adapter, []))[1].append(row)
+        if len(groups) == 1 and len(next(iter(groups.values()))[1]) == len(adapters):
+            self._plan = [(adapter, None) for adapter, _ in groups.values()]
+        else:
+            self._plan = [(adapter, torch.tensor(rows, device=self.device))
+                          for adapter, rows in groups.values()]
@@ -0,0 +1,295 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import uuid
+from datetime import datetime, timezone
+
+from config import Config
+
+KINDS = ('base', 'adapter')
+MANIFEST = 'manifest.json'
+# Pickled weights and training state are never copied into the store;
+# weights are served from safetensors only.
+_EXCLUDED_SUFFIXES = ('.bin', '.pt', '.pth', '.ckpt', '.pkl')
+# Names are hub-style ("org/model") and versions single path segments; each
+# segment starts with a letter or digit, so "." and ".." never match, and
+# has no "--", which stands for "/" in store directory names
+_SEGMENT = r'[A-Za-z0-9](?:[A-Za-z0-9._]|-(?!-))*'
+_NAME = re.compile(rf'^{_SEGMENT}(?:/{_SEGMENT})?$')
+_VERSION = re.compile(rf'^{_SEGMENT}$')
+_CHUNK = 1024 * 1024
+
+
+def parse_ref(ref):
+    """
+    'name' or 'name@version' -> (name, version or None). Raises ValueError
+    if either part is not a valid store name or version.
+    """
+    name, _, version = ref.partition('@')
+    if not _NAME.match(name) or (version and not _VERSION.match(version)):
+        raise ValueError(f"Invalid model store reference: {ref}")
+    return name, version or None
+
+
+def is_store_ref(ref):
+    try:
+        parse_ref(ref)
+    except ValueError:
+        return False
+    return True
+
+
+def _name_dir(kind, name):
+    if kind not in KINDS:
+        raise ValueError(f"Unknown artifact kind: {kind}")
+    if not _NAME.match(name):
+        raise ValueError(f"Invalid artifact name: {name}")
+    # Hub-style names ("org/model") are kept one level deep
+    return os.path.join(Config.LLM_STORE_DIR, kind, name.replace('/', '--'))
+
+
+def _read_manifest(path):
+    with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _versions(kind, name):
+    """Manifests of every stored version of an artifact, oldest first."""
+    root = _name_dir(kind, name)
+    if not os.path.isdir(root):
+        return []
+    manifests = []
+    for version in os.listdir(root):
+        path = os.path.join(root, version)
+        if not version.startswith('.') and os.path.isfile(os.path.join(path, MANIFEST)):
+            manifests.append(_read_manifest(path))
+    return sorted(manifests, key=lambda m: m['created'])
+
+
+def artifact_path(kind, ref):
+    """Directory of a stored artifact (latest version if none is given), or None."""
+    name, version = parse_ref(ref)
+    if version is None:
+        versions = _versions(kind, name)
+        if not versions:
+            return None
+        version = versions[-1]['version']
+    path = os.path.join(_name_dir(kind, name), version)
+    return path if os.path.isfile(os.path.join(path, MANIFEST)) else None
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def verify_artifact(path, hashes=True):
+    """
+    Checks the files of a stored artifact against its manifest. Sizes are
+    always compared; hashes only when `hashes` is set, since hashing a base
+    model reads every byte of it. Returns a list of problems (empty if OK).
+    """
+    problems = []
+    for filename, entry in _read_manifest(path)['files'].items():
+        file_path = os.path.join(path, filename)
+        if not os.path.isfile(file_path):
+            problems.append(f"{filename}: missing")
+        elif os.path.getsize(file_path) != entry['size']:
+            problems.append(f"{filename}: size mismatch")
+        elif hashes and _sha256(file_path) != entry['sha256']:
+            problems.append(f"{filename}: sha256 mismatch")
+    return problems
+
+
+def resolve_artifact(kind, ref, hashes=True):
+    """
+    Returns (path, manifest) of a stored artifact after verifying it.
+    Raises FileNotFoundError if it is not in the store and OSError if its
+    files do not match the manifest.
+    """
+    path = artifact_path(kind, ref)
+    if path is None:
+        raise FileNotFoundError(
+            f"{kind} '{ref}' is not in the model store ({Config.LLM_STORE_DIR})")
+    problems = verify_artifact(path, hashes)
+    if problems:
+        raise OSError(f"{kind} '{ref}' is corrupt: {'; '.join(problems)}")
+    return path, _read_manifest(path)
+
+
+def _artifact_files(source):
+    files = []
+    for root, dirs, names in os.walk(source):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for filename in sorted(names):
+            if filename.startswith('.') or filename.endswith(_EXCLUDED_SUFFIXES):
+                continue
+            files.append(os.path.relpath(os.path.join(root, filename), source))
+    return files
+
+
+def _next_version(kind, name):
+    numbers = [int(m['version'][1:]) for m in _versions(kind, name)
+               if re.fullmatch(r'v\d+', m['version'])]
+    return f"v{max(numbers, default=0) + 1}"
+
+
+def import_artifact(kind, name, source, version=None):
+    """
+    Copies a model directory (a base model snapshot, or a PEFT adapter such
+    as a fine-tuning checkpoint) into the store as a new version and writes
+    its manifest with the size and sha256 of every file. The version only
+    becomes visible once it is complete. Returns the manifest.
+    """
+    files = _artifact_files(source)
+    if not any(f.endswith('.safetensors') for f in files):
+        raise ValueError(f"{source} has no .safetensors weights")
+    if kind == 'adapter' and 'adapter_config.json' not in files:
+        raise ValueError(f"{source} has no adapter_config.json")
+    version = version or _next_version(kind, name)
+    if not _VERSION.match(version):
+        raise ValueError(f"Invalid version: {version}")
+    root = _name_dir(kind, name)
+    target = os.path.join(root, version)
+    if os.path.exists(target):
+        raise ValueError(f"{kind} '{name}@{version}' already exists")
+
+    staging = os.path.join(root, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(staging)
+    try:
+        entries = {}
+        for filename in files:
+            dst = os.path.join(staging, filename)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            h = hashlib.sha256()
+            with open(os.path.join(source, filename), 'rb') as fin, \
+                    open(dst, 'wb') as fout:
+                for chunk in iter(lambda: fin.read(_CHUNK), b''):
+                    h.update(chunk)
+                    fout.write(chunk)
+            entries[filename] = {'size': os.path.getsize(dst),
+                                 'sha256': h.hexdigest()}
+        manifest = {
+            'kind': kind,
+            'name': name,
+            'version': version,
+            'created': datetime.now(timezone.utc).isoformat(timespec='microseconds'),
+            'source': os.path.abspath(source),
+            'files': entries,
+        }
+        if kind == 'adapter':
+            with open(os.path.join(staging, 'adapter_config.json'),
+                      encoding='utf-8') as f:
+                manifest['base_model'] = json.load(f).get('base_model_name_or_path')
+        with open(os.path.join(staging, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    print(f"Stored {kind} {name}@{version} ({len(files)} files)", flush=True)
+    return manifest
+
+
+def list_artifacts(kind=None):
+    artifacts = []
+    for k in ([kind] if kind else KINDS):
+        root = os.path.join(Config.LLM_STORE_DIR, k)
+        if not os.path.isdir(root):
+            continue
+        for dirname in sorted(os.listdir(root)):
+            name = dirname.replace('--', '/')
+            if not _NAME.match(name):
+                continue
+            for manifest in _versions(k, name):
+                artifacts.append({
+                    'kind': k,
+                    'name': manifest['name'],
+                    'version': manifest['version'],
+                    'created': manifest['created'],
+                    'bytes': sum(f['size'] for f in manifest['files'].values()),
+                })
+    return artifacts
+
+
+def resolve_base_model(ref):
+    """
+    Local directory for a base model: its store entry if there is one, a
+    directory path as given, otherwise the hub id itself (refused offline).
+    """
+    path = artifact_path('base', ref) if is_store_ref(ref) else None
+    if path is not None:
+        return resolve_artifact('base', ref, hashes=Config.LLM_STORE_VERIFY)[0]
+    if os.path.isdir(ref) or not Config.LLM_OFFLINE:
+        return ref
+    raise FileNotFoundError(
+        f"Base model '{ref}' is not in the model store and LLM_OFFLINE is set")
+
+
+def locate_adapter(ref, allow_path=False):
+    """
+    Absolute adapter directory for a store reference (name[@version]),
+    without reading the files. Directory paths are only accepted with
+    allow_path, for trusted input (config, CLI), never for references from
+    a request. Raises ValueError if there is no such adapter.
+    """
+    if allow_path and os.path.isdir(ref):
+        return os.path.abspath(ref)
+    path = artifact_path('adapter', ref)
+    if path is None:
+        raise ValueError(f"Unknown adapter: {ref}")
+    return os.path.abspath(path)
+
+
+def resolve_adapter(ref):
+    """
+    locate_adapter() for trusted input (paths allowed), then a check of
+    stored adapters against their manifest.
+    """
+    path = locate_adapter(ref, allow_path=True)
+    if os.path.isfile(os.path.join(path, MANIFEST)):
+        # Adapters are small, so their hashes are checked on every load
+        problems = verify_artifact(path)
+        if problems:
+            raise OSError(f"adapter '{ref}' is corrupt: {'; '.join(problems)}")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local LLM artifact store")
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('import', help="copy a model directory into the store")
+    add.add_argument('kind', choices=KINDS)
+    add.add_argument('name')
+    add.add_argument('source')
+    add.add_argument('--version')
+    commands.add_parser('list', help="list stored artifacts")
+    check = commands.add_parser('verify', help="check files against the manifest")
+    check.add_argument('kind', choices=KINDS)
+    check.add_argument('ref')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        import_artifact(args.kind, args.name, args.source, args.version)
+    elif args.command == 'list':
+        for a in list_artifacts():
+            print(f"{a['kind']:<8} {a['name']}@{a['version']}  "
+                  f"{a['created']}  {a['bytes'] / 1e6:.1f} MB")
+    else:
+        path = artifact_path(args.kind, args.ref)
+        if path is None:
+            raise SystemExit(f"{args.kind} '{args.ref}' is not in the store")
+        problems = verify_artifact(path)
+        for problem in problems:
+            print(problem)
+        raise SystemExit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
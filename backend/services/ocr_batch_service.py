@@ -0,0 +1,276 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from config import Config
+from services.ocr_engine_registry import get_engine, has_engine
+from services.ocr_worker_pool import get_worker_pool
+from services.ocr_tiling_service import tiled_ocr, tiled_words_batch
+from services.img_preprocessing_service import downscale_max_side
+from utils.geometry_utils import offset_box, words_to_text
+from utils.layout_utils import OCRLayout
+
+# One scheduler (and worker thread) per engine
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+# Spreads word-level OCR of several images (e.g. tiles) over the engine's
+# concurrency slots when there is no worker pool
+_words_executor = ThreadPoolExecutor(
+    max_workers=Config.OCR_TILE_WORKERS, thread_name_prefix='ocr-words')
+
+
+def _run_inline(batch_fn, images):
+    future = Future()
+    try:
+        future.set_result(batch_fn(images))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+class MicroBatchScheduler:
+    """
+    Collects pages submitted for one engine within a short window and hands
+    them to dispatch_fn as one batch. dispatch_fn(images) returns a Future of
+    the per-page results; it runs inline or on the OCR worker pool.
+    """
+
+    def __init__(self, name, dispatch_fn, max_batch_size, window_ms):
+        self.name = name
+        self.dispatch_fn = dispatch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = window_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name=f'ocr-batch-{name}', daemon=True)
+        self._thread.start()
+
+    def submit(self, image):
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _fail(pending, error):
+        for _, f in pending:
+            f.set_exception(error)
+
+    @classmethod
+    def _resolve(cls, pending, batch_future):
+        error = batch_future.exception()
+        if error is not None:
+            cls._fail(pending, error)
+            return
+        results = batch_future.result()
+        if len(results) != len(pending):
+            cls._fail(pending, RuntimeError(
+                f"OCR batch returned {len(results)} results for "
+                f"{len(pending)} pages"))
+            return
+        for (_, f), result in zip(pending, results):
+            f.set_result(result)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            pending = [(img, f) for img, f in batch
+                       if f.set_running_or_notify_cancel()]
+            if not pending:
+                continue
+            try:
+                batch_future = self.dispatch_fn([img for img, _ in pending])
+            except Exception as e:
+                # e.g. the worker pool was shut down; keep serving later batches
+                self._fail(pending, e)
+                continue
+            batch_future.add_done_callback(
+                lambda bf, pending=pending: self._resolve(pending, bf))
+
+
+def _make_dispatch_fn(model):
+    pool = get_worker_pool()
+    if pool is not None:
+        return partial(pool.submit_batch, model)
+    return partial(_run_inline, get_engine(model).run_batch)
+
+
+def get_scheduler(model):
+    scheduler = _schedulers.get(model)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(model)
+            if scheduler is None:
+                scheduler = MicroBatchScheduler(
+                    model,
+                    _make_dispatch_fn(model),
+                    Config.OCR_MAX_BATCH_SIZE,
+                    Config.OCR_BATCH_WINDOW_MS,
+                )
+                _schedulers[model] = scheduler
+    return scheduler
+
+
+def submit_ocr(model, image):
+    """Queue one page for batched OCR. Returns a Future of (text, confidence)."""
+    return get_scheduler(model).submit(image)
+
+
+def _fit_to_engine(engine, image):
+    if isinstance(image, np.ndarray):
+        image, _ = downscale_max_side(image, engine.input_side_limit())
+    return image
+
+
+def _pool_map(pool, model, images, method='run_batch'):
+    """
+    Splits images into one contiguous slice per worker process and returns
+    the per-image results in order.
+    """
+    chunk = max(1, -(-len(images) // pool.processes))
+    futures = [pool.submit_batch(model, images[i:i + chunk], method)
+               for i in range(0, len(images), chunk)]
+    return [result for f in futures for result in f.result()]
+
+
+def run_words_batch(model, images):
+    """
+    Runs the engine's word-level OCR on several images, splitting them over
+    the worker pool when it is enabled. Without it, engines that do not
+    batch get one slice per concurrency slot on a thread pool. Returns one
+    word list per image.
+    """
+    engine = get_engine(model)
+    if not engine.reports_boxes:
+        raise ValueError(f"{model} does not report word boxes")
+    pool = get_worker_pool()
+    if pool is not None:
+        return _pool_map(pool, model, images, 'run_words_batch')
+    slots = min(engine.max_concurrency, len(images))
+    if engine.supports_batching or slots <= 1:
+        return engine.run_words_batch(images)
+    chunk = -(-len(images) // slots)
+    futures = [_words_executor.submit(engine.run_words_batch, images[i:i + chunk])
+               for i in range(0, len(images), chunk)]
+    return [words for f in futures for words in f.result()]
+
+
+def _wants_tiling(engine, image, tiling):
+    if tiling is None or not engine.reports_boxes:
+        return False
+    tile_size = tiling.get('tile_size') or engine.detection_side or 1024
+    return max(np.asarray(image).shape[:2]) > tile_size
+
+
+def _split_tiled(engine, images, tiling):
+    """
+    Returns (tiled, merge): which pages are split into tiles, and
+    merge(tiled_results, untiled_results) putting the results back in
+    page order.
+    """
+    tiled = [_wants_tiling(engine, image, tiling) for image in images]
+
+    def merge(tiled_results, untiled_results):
+        tiled_results, untiled_results = iter(tiled_results), iter(untiled_results)
+        return [next(tiled_results) if is_tiled else next(untiled_results)
+                for is_tiled in tiled]
+    return tiled, merge
+
+
+def batch_ocr(model, images, tiling=None):
+    engine = get_engine(model)
+    tiled, merge = _split_tiled(engine, images, tiling)
+    if any(tiled):
+        # The tiles of every tiled page share one engine call; the other
+        # pages still take the micro-batched untiled path
+        tiled_words = tiled_words_batch(
+            engine, [np.asarray(image) for image, t in zip(images, tiled) if t],
+            run_words_batch, tiling.get('tile_size'), tiling.get('overlap'))
+        untiled = [image for image, t in zip(images, tiled) if not t]
+        return merge([words_to_text(words) for words in tiled_words],
+                     batch_ocr(model, untiled) if untiled else [])
+    images = [_fit_to_engine(engine, image) for image in images]
+    if not engine.supports_batching:
+        pool = get_worker_pool()
+        if pool is not None:
+            return _pool_map(pool, model, images)
+        return engine.run_batch(images)
+    futures = [submit_ocr(model, image) for image in images]
+    return [f.result() for f in futures]
+
+
+def run_ocr(model, image, tiling=None):
+    """
+    Runs one page through the given engine and returns (text, confidence).
+    Engines that batch natively go through their scheduler so concurrent
+    requests share a forward pass; others are called directly (or on the
+    worker pool), bounded by the engine's concurrency limit. Pages larger
+    than the engine's useful resolution are downscaled first. With tiling
+    ({"tile_size": ..., "overlap": ...}), pages larger than a tile are split
+    into overlapping tiles whose words are merged back by position.
+    """
+    if not has_engine(model):
+        raise ValueError(f"Unknown model: {model}")
+    engine = get_engine(model)
+    if _wants_tiling(engine, image, tiling):
+        return tiled_ocr(engine, np.asarray(image), run_words_batch,
+                         tiling.get('tile_size'), tiling.get('overlap'))
+    image = _fit_to_engine(engine, image)
+    if engine.supports_batching:
+        return submit_ocr(model, image).result()
+    pool = get_worker_pool()
+    if pool is not None:
+        return pool.submit_batch(model, [image]).result()[0]
+    return engine.run(image)
+
+
+def batch_ocr_layout(model, images, tiling=None):
+    """
+    Structured counterpart of batch_ocr(): returns one OCRLayout per page
+    with its words, boxes (in the coordinates of the given image) and
+    confidences. Requires an engine that reports word boxes.
+    """
+    if not has_engine(model):
+        raise ValueError(f"Unknown model: {model}")
+    engine = get_engine(model)
+    images = [np.asarray(image) for image in images]
+    tiled, merge = _split_tiled(engine, images, tiling)
+    tiled_words = []
+    if any(tiled):
+        tiled_words = tiled_words_batch(
+            engine, [image for image, t in zip(images, tiled) if t],
+            run_words_batch, tiling.get('tile_size'), tiling.get('overlap'))
+    fitted = [downscale_max_side(image, engine.input_side_limit())
+              for image, is_tiled in zip(images, tiled) if not is_tiled]
+    # Untiled pages go to the engine in one call
+    untiled_words = run_words_batch(model, [f[0] for f in fitted]) if fitted else []
+    untiled_words = [
+        words if scale == 1.0 else
+        [(t, c, offset_box(b, 0, 0, 1 / scale)) for t, c, b in words]
+        for words, (_, scale) in zip(untiled_words, fitted)]
+    layouts = []
+    for image, words in zip(images, merge(tiled_words, untiled_words)):
+        height, width = image.shape[:2]
+        layouts.append(OCRLayout.from_words(words, width, height))
+    return layouts
+
+
+def run_ocr_layout(model, image, tiling=None):
+    return batch_ocr_layout(model, [image], tiling)[0]
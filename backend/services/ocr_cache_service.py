@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from importlib import metadata
+
+from config import Config
+from services.ocr_engine_registry import get_engine, has_engine
+
+
+@lru_cache(maxsize=None)
+def engine_fingerprint(model):
+    if not has_engine(model):
+        # Composite modes (ensemble) fingerprint their engines via params
+        return model
+    engine = get_engine(model)
+    package = engine.package or model
+    try:
+        version = metadata.version(package)
+    except metadata.PackageNotFoundError:
+        version = 'unknown'
+    # Pages are downscaled to this side before OCR, so it changes results
+    return (f"{model}|{package}=={version}|{engine.config}"
+            f"|max_side={engine.input_side_limit()}")
+
+
+def cache_params(pipeline, tiling=None, structured=False):
+    """Preprocessing, tiling and output options that go into the cache key."""
+    params = {}
+    if pipeline:
+        params['preprocess'] = pipeline
+    if tiling is not None:
+        params['tiling'] = tiling
+    if structured:
+        params['structured'] = True
+    return params or None
+
+
+def make_cache_key(image_bytes, model, params=None):
+    """
+    Content-addressed key: digest of the raw image bytes plus the engine,
+    its version/config and input side limit, and any preprocessing or
+    (resolved) tiling parameters.
+    """
+    h = hashlib.sha256()
+    h.update(hashlib.sha256(image_bytes).digest())
+    h.update(engine_fingerprint(model).encode('utf-8'))
+    if params:
+        h.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+
+class OCRResultCache:
+    """
+    In-memory LRU bounded by entry count and approximate size in bytes,
+    with an optional on-disk tier (one JSON file per key) behind it.
+    """
+
+    def __init__(self, max_entries, max_bytes, disk_dir=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + '.json')
+
+    def _insert(self, key, value, size):
+        # Caller must hold self._lock
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    raw = f.read()
+            except OSError:
+                raw = None
+            value = None
+            if raw is not None:
+                try:
+                    value = tuple(json.loads(raw))
+                except (TypeError, ValueError):
+                    # Truncated or corrupt entry: drop it and recompute
+                    print(f"Discarding corrupt OCR cache file {path}", flush=True)
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            if value is not None:
+                with self._lock:
+                    self._insert(key, value, len(raw))
+                    self.disk_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        raw = json.dumps(value)
+        with self._lock:
+            self._insert(key, tuple(value), len(raw))
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(raw)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                # Full or read-only disk: the result stays cached in memory
+                print(f"Could not write OCR cache file {path}: {e}", flush=True)
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'disk_tier': self.disk_dir is not None,
+            }
+
+
+ocr_cache = OCRResultCache(
+    Config.OCR_CACHE_MAX_ENTRIES,
+    Config.OCR_CACHE_MAX_BYTES,
+    Config.OCR_CACHE_DIR,
+)
+
+
+def cached_ocr(model, image_bytes, compute, params=None, cacheable=None):
+    """
+    Returns the cached (text, confidence) for these image bytes and engine,
+    or calls compute() and stores its result. If cacheable() returns False
+    after compute(), the result is returned without being stored.
+    """
+    if not Config.OCR_CACHE_ENABLED:
+        return compute()
+    key = make_cache_key(image_bytes, model, params)
+    result = ocr_cache.get(key)
+    if result is None:
+        result = compute()
+        if cacheable is None or cacheable():
+            ocr_cache.put(key, result)
+    return result
+
+
+def cached_batch_ocr(model, image_bytes_list, compute_batch, params=None):
+    """
+    Batch counterpart of cached_ocr(): only the cache misses are passed to
+    compute_batch(indices), which must return results in the same order.
+    """
+    if not Config.OCR_CACHE_ENABLED:
+        return compute_batch(list(range(len(image_bytes_list))))
+    keys = [make_cache_key(b, model, params) for b in image_bytes_list]
+    results = [ocr_cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        for i, result in zip(missing, compute_batch(missing)):
+            ocr_cache.put(keys[i], result)
+            results[i] = result
+    return results
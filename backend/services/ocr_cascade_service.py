@@ -0,0 +1,97 @@
+import numpy as np
+
+from config import Config
+from services.ocr_engine_registry import get_engine, has_engine
+from services.ocr_batch_service import run_words_batch
+from services.img_preprocessing_service import downscale_max_side
+from utils.geometry_utils import (
+    group_words_into_lines, line_box, offset_box
+)
+
+
+def resolve_cascade_engines(fast=None, heavy=None):
+    fast = fast or Config.OCR_CASCADE_FAST_ENGINE
+    heavy = heavy or Config.OCR_CASCADE_HEAVY_ENGINE
+    for name in (fast, heavy):
+        if not has_engine(name):
+            raise ValueError(f"Unknown model: {name}")
+        if not get_engine(name).reports_boxes:
+            raise ValueError(
+                f"{name} does not report word boxes and cannot be cascaded")
+    if fast == heavy:
+        raise ValueError("Cascade needs two different engines")
+    return fast, heavy
+
+
+def _line_confidence(line):
+    return float(np.mean([w[1] for w in line]))
+
+
+def _padded_crop(image, box, padding):
+    height, width = image.shape[:2]
+    margin = max(2.0, (box[3] - box[1]) * padding)
+    x0 = max(0, int(box[0] - margin))
+    y0 = max(0, int(box[1] - margin))
+    x1 = min(width, int(np.ceil(box[2] + margin)))
+    y1 = min(height, int(np.ceil(box[3] + margin)))
+    return x0, y0, image[y0:y1, x0:x1]
+
+
+def _clip_to_line(words, box):
+    """
+    Keeps the words whose centre lies in the line's box, clipped to it; the
+    crop's margin can pick up pieces of the lines above and below.
+    """
+    clipped = []
+    for text, confidence, b in words:
+        cx, cy = (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+        if box[0] <= cx <= box[2] and box[1] <= cy <= box[3]:
+            clipped.append((text, confidence, (
+                max(b[0], box[0]), max(b[1], box[1]),
+                min(b[2], box[2]), min(b[3], box[3]))))
+    return clipped
+
+
+def cascade_words(image, fast=None, heavy=None, threshold=None, padding=None):
+    """
+    OCRs a page with the fast engine, then re-OCRs only the lines it read
+    with a mean confidence below threshold: each such line is cropped with
+    a margin and all crops go to the heavy engine in one batch. The heavy
+    engine's words inside the line's box replace the line if their mean
+    confidence is higher; a page where the fast engine found no text at all
+    is escalated whole. Returns (words, details); boxes are in
+    the coordinates of `image`.
+    """
+    fast, heavy = resolve_cascade_engines(fast, heavy)
+    threshold = Config.OCR_CASCADE_THRESHOLD if threshold is None else threshold
+    padding = Config.OCR_CASCADE_PADDING if padding is None else padding
+    image = np.asarray(image)
+    limit = min(get_engine(fast).input_side_limit(),
+                get_engine(heavy).input_side_limit())
+    image, scale = downscale_max_side(image, limit)
+
+    lines = group_words_into_lines(run_words_batch(fast, [image])[0])
+    details = {'engines': [fast, heavy], 'lines': len(lines),
+               'escalated_lines': 0, 'replaced_lines': 0,
+               'escalated_page': False}
+    if not lines:
+        details['escalated_page'] = True
+        words = run_words_batch(heavy, [image])[0]
+    else:
+        low = [i for i, line in enumerate(lines)
+               if _line_confidence(line) < threshold]
+        if low:
+            boxes = [line_box(lines[i]) for i in low]
+            crops = [_padded_crop(image, box, padding) for box in boxes]
+            crop_words = run_words_batch(heavy, [crop for _, _, crop in crops])
+            for i, box, (x0, y0, _), words in zip(low, boxes, crops, crop_words):
+                words = _clip_to_line(
+                    [(t, c, offset_box(b, x0, y0)) for t, c, b in words], box)
+                if words and _line_confidence(words) > _line_confidence(lines[i]):
+                    lines[i] = words
+                    details['replaced_lines'] += 1
+            details['escalated_lines'] = len(low)
+        words = [w for line in lines for w in line]
+    if scale != 1.0:
+        words = [(t, c, offset_box(b, 0, 0, 1 / scale)) for t, c, b in words]
+    return words, details
@@ -0,0 +1,134 @@
+import threading
+
+from config import Config
+from utils.import_utils import timed_import
+
+_engines = {}
+_engines_lock = threading.Lock()
+_builtins_loaded = False
+
+
+class OCREngine:
+    """
+    Base class for OCR engines. Subclasses set the class attributes below,
+    implement process() and, if reports_boxes, words(); engines that batch
+    natively also override process_batch().
+
+    Words are (text, confidence, (x0, y0, x1, y1)) tuples in pixel
+    coordinates of the input image.
+    """
+
+    name = None
+    package = None          # distribution name, part of the cache key
+    config = ''             # construction settings, part of the cache key
+    modules = ()            # frameworks imported on first use
+    supports_batching = False
+    reports_confidence = False
+    reports_boxes = False
+    # Default cap on concurrent calls into one engine instance
+    max_concurrency = 1
+    # Side the engine resizes pages to for text detection. Pages much larger
+    # than this lose small text in detection, which tiling avoids.
+    detection_side = None
+    # Longest side worth sending at all (None: OCR_MAX_IMAGE_SIDE); larger
+    # pages are downscaled first.
+    max_input_side = None
+
+    def __init__(self, max_concurrency=None, threads=None):
+        if max_concurrency is not None:
+            self.max_concurrency = max_concurrency
+        self.threads = threads if threads is not None else Config.OCR_ENGINE_THREADS
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    # --- To implement ---
+
+    def load(self):
+        """Loads models. Called lazily by run_* and eagerly by warm-up."""
+
+    def process(self, image):
+        """Returns (text, confidence) for one page."""
+        raise NotImplementedError
+
+    def process_batch(self, images):
+        return [self.process(image) for image in images]
+
+    def words(self, image):
+        raise NotImplementedError(f"{self.name} does not report word boxes")
+
+    def words_batch(self, images):
+        return [self.words(image) for image in images]
+
+    # --- Called by the service layer ---
+
+    def import_modules(self):
+        for module_name in self.modules:
+            timed_import(module_name)
+
+    def run(self, image):
+        with self._slots:
+            return self.process(image)
+
+    def run_batch(self, images):
+        with self._slots:
+            return self.process_batch(images)
+
+    def run_words(self, image):
+        with self._slots:
+            return self.words(image)
+
+    def run_words_batch(self, images):
+        with self._slots:
+            return self.words_batch(images)
+
+    def input_side_limit(self):
+        return self.max_input_side or Config.OCR_MAX_IMAGE_SIDE
+
+    def capabilities(self):
+        return {
+            'batching': self.supports_batching,
+            'confidence': self.reports_confidence,
+            'boxes': self.reports_boxes,
+            'threads': self.threads,
+            'max_concurrency': self.max_concurrency,
+            'detection_side': self.detection_side,
+            'max_input_side': self.input_side_limit(),
+        }
+
+
+def register_engine(engine_cls, **kwargs):
+    """
+    Registers an engine class under engine_cls.name. Engines not listed in
+    OCR_ENABLED_ENGINES are skipped so their frameworks are never imported.
+    Per-engine concurrency can be overridden with OCR_ENGINE_CONCURRENCY.
+    """
+    name = engine_cls.name
+    if name not in Config.OCR_ENABLED_ENGINES:
+        return None
+    kwargs.setdefault(
+        'max_concurrency', Config.OCR_ENGINE_CONCURRENCY.get(name))
+    engine = engine_cls(**kwargs)
+    with _engines_lock:
+        _engines[name] = engine
+    return engine
+
+
+def _registry():
+    global _builtins_loaded
+    if not _builtins_loaded:
+        # Importing the module registers the built-in engines
+        import services.ocr_service  # noqa: F401
+        _builtins_loaded = True
+    return _engines
+
+
+def get_engine(name):
+    """Returns the registered engine or raises KeyError."""
+    return _registry()[name]
+
+
+def has_engine(name):
+    return name in _registry()
+
+
+def list_engines():
+    return {name: engine.capabilities() for name, engine in _registry().items()}
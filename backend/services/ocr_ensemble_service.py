@@ -0,0 +1,135 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from config import Config
+from services.ocr_engine_registry import get_engine, has_engine, list_engines
+from services.ocr_batch_service import run_words_batch
+from services.img_preprocessing_service import downscale_max_side
+from utils.geometry_utils import BoxGrid, box_iou, offset_box
+
+_executor = ThreadPoolExecutor(
+    max_workers=Config.OCR_ENSEMBLE_WORKERS, thread_name_prefix='ocr-ensemble')
+
+# Words from different engines whose boxes overlap at least this much are
+# treated as readings of the same word.
+_ALIGN_IOU = 0.3
+
+
+def default_ensemble_engines():
+    return [name for name, caps in list_engines().items() if caps['boxes']]
+
+
+def resolve_ensemble_engines(engines):
+    engines = engines or default_ensemble_engines()
+    for name in engines:
+        if not has_engine(name):
+            raise ValueError(f"Unknown model: {name}")
+        if not get_engine(name).reports_boxes:
+            raise ValueError(
+                f"{name} does not report word boxes and cannot be aligned")
+    if len(engines) < 2:
+        raise ValueError("Ensemble needs at least two engines")
+    return list(engines)
+
+
+def _engine_words(model, image):
+    return run_words_batch(model, [image])[0]
+
+
+def _mean_confidence(words):
+    return float(np.mean([w[1] for w in words])) if words else 0.0
+
+
+def fuse_words(words_by_engine):
+    """
+    Aligns words from several engines by box overlap and votes per word.
+    Each aligned group keeps the text with the highest summed confidence;
+    its fused confidence is that sum divided by the number of engines, so
+    agreement between engines raises it and disagreement lowers it.
+    """
+    n_engines = len(words_by_engine)
+    candidates = [(conf, text, box, engine)
+                  for engine, words in words_by_engine.items()
+                  for text, conf, box in words if text and text.strip()]
+    candidates.sort(key=lambda c: c[0], reverse=True)
+
+    groups = []  # each: {'box': box, 'engines': set, 'votes': {text: [score, box]}}
+    grid = BoxGrid()
+    for conf, text, box, engine in candidates:
+        best, best_iou = None, _ALIGN_IOU
+        for group in grid.near(box):
+            if engine in group['engines']:
+                continue
+            iou = box_iou(box, group['box'])
+            if iou >= best_iou:
+                best, best_iou = group, iou
+        if best is None:
+            best = {'box': box, 'engines': set(), 'votes': {}}
+            groups.append(best)
+            grid.add(best, box)
+        best['engines'].add(engine)
+        vote = best['votes'].setdefault(text.strip(), [0.0, box])
+        vote[0] += conf
+
+    fused = []
+    for group in groups:
+        text, (score, box) = max(group['votes'].items(), key=lambda v: v[1][0])
+        fused.append((text, min(1.0, score / n_engines), box))
+    return fused
+
+
+def ensemble_words(image, engines=None, early_exit_confidence=None):
+    """
+    Runs several engines concurrently on one decoded (and preprocessed) page
+    and fuses their words. If an engine finishes with a mean confidence at
+    or above early_exit_confidence before the others, its words are
+    returned straight away. That saves latency, not CPU: engines that have
+    not started yet are cancelled, running ones finish in the background.
+    An engine that raises is left out of the vote and reported under
+    details['failed']; only if every engine fails is the error raised.
+    Returns (words, details); boxes are in the coordinates of `image`.
+    """
+    engines = resolve_ensemble_engines(engines)
+    if early_exit_confidence is None:
+        early_exit_confidence = Config.OCR_ENSEMBLE_EARLY_EXIT
+    image = np.asarray(image)
+    # One common scale so boxes from all engines are comparable
+    limit = min(get_engine(name).input_side_limit() for name in engines)
+    image, scale = downscale_max_side(image, limit)
+
+    futures = {_executor.submit(_engine_words, name, image): name
+               for name in engines}
+    words_by_engine = {}
+    details = {'engines': {}, 'early_exit': None, 'failed': []}
+    words = None
+    error = None
+    for done, future in enumerate(as_completed(futures), 1):
+        name = futures[future]
+        try:
+            engine_words = future.result()
+        except Exception as e:
+            print(f"Ensemble engine {name} failed: {e}", flush=True)
+            details['engines'][name] = {'error': str(e)}
+            details['failed'].append(name)
+            error = e
+            continue
+        words_by_engine[name] = engine_words
+        confidence = _mean_confidence(engine_words)
+        details['engines'][name] = {
+            'confidence': confidence, 'words': len(engine_words)}
+        remaining = len(futures) - done
+        if remaining and early_exit_confidence and engine_words \
+                and confidence >= early_exit_confidence:
+            for other in futures:
+                other.cancel()
+            details['early_exit'] = name
+            words = engine_words
+            break
+    if not words_by_engine:
+        raise error
+    if words is None:
+        words = fuse_words(words_by_engine)
+    if scale != 1.0:
+        words = [(t, c, offset_box(b, 0, 0, 1 / scale)) for t, c, b in words]
+    return words, details
@@ -0,0 +1,110 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from services.ocr_service import prepare_image
+from services.ocr_batch_service import run_ocr, run_ocr_layout
+from services.ocr_cache_service import cached_ocr, cache_params
+
+_executor = ThreadPoolExecutor(
+    max_workers=Config.OCR_JOB_WORKERS, thread_name_prefix='ocr-job')
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+def _public_view(job):
+    view = {
+        'id': job['id'],
+        'model': job['model'],
+        'status': job['status'],
+        'created_at': job['created_at'],
+    }
+    if job['status'] == 'done':
+        view['result'] = job['result']
+    elif job['status'] == 'failed':
+        view['error'] = job['error']
+    return view
+
+
+def _expire_jobs(now):
+    # Caller must hold _jobs_lock
+    expired = [job_id for job_id, job in _jobs.items()
+               if job['finished_at'] is not None
+               and now - job['finished_at'] > Config.OCR_JOB_TTL_S]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+def _pending_count():
+    # Caller must hold _jobs_lock
+    return sum(1 for job in _jobs.values()
+               if job['status'] in ('queued', 'running'))
+
+
+def _run_job(job_id, image_bytes, pipeline, tiling, structured):
+    with _jobs_lock:
+        job = _jobs[job_id]
+        job['status'] = 'running'
+    try:
+        model = job['model']
+
+        def compute():
+            image = prepare_image(image_bytes, pipeline)[0]
+            if structured:
+                layout = run_ocr_layout(model, image, tiling)
+                return layout.text, layout.confidence(), layout.to_dict()
+            return run_ocr(model, image, tiling)
+
+        # Same values and cache keys as a synchronous /ocr request
+        cached = cached_ocr(model, image_bytes, compute,
+                            cache_params(pipeline, tiling, structured))
+        result = {'text': cached[0], 'confidence': cached[1]}
+        if structured:
+            result['layout'] = cached[2]
+    except Exception as e:
+        with _jobs_lock:
+            job.update(status='failed', error=str(e),
+                       finished_at=time.time())
+        return
+    with _jobs_lock:
+        job.update(status='done', result=result, finished_at=time.time())
+
+
+def submit_job(model, image_bytes, pipeline=None, tiling=None, structured=False):
+    """
+    Queues an OCR job and returns its public view. Raises JobQueueFullError
+    when OCR_JOB_MAX_PENDING jobs are already queued or running.
+    """
+    now = time.time()
+    with _jobs_lock:
+        _expire_jobs(now)
+        if _pending_count() >= Config.OCR_JOB_MAX_PENDING:
+            raise JobQueueFullError("OCR job queue is full, retry later")
+        job = {
+            'id': uuid.uuid4().hex,
+            'model': model,
+            'status': 'queued',
+            'created_at': now,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+        }
+        _jobs[job['id']] = job
+        view = _public_view(job)
+    _executor.submit(_run_job, job['id'], image_bytes, pipeline, tiling,
+                     structured)
+    return view
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        # Sweep here too, so results expire when no new jobs arrive
+        _expire_jobs(time.time())
+        job = _jobs.get(job_id)
+        return _public_view(job) if job is not None else None
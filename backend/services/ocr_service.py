@@ -1,13 +1,19 @@
 import base64
+import binascii
 import io
+import os
 from PIL import Image
 import numpy as np
 import cv2
-import pytesseract
-import easyocr
-from paddleocr import PaddleOCR
-from doctr.models import ocr_predictor
-from doctr.io import DocumentFile
+from config import Config
+from utils.import_utils import timed_import
+from services.ocr_engine_registry import OCREngine, register_engine
+from services.img_preprocessing_service import run_pipeline
+
+
+class ImageDecodeError(ValueError):
+    pass
+
 
 # Global OCR instances
 _paddle_ocr = None
@@ -15,21 +21,77 @@ _easy_ocr = None
 _doctr_ocr = None
 
 
+def decode_base64(base64_str):
+    """
+    Strictly decodes base64 (line breaks allowed); anything outside the
+    alphabet or badly padded raises ImageDecodeError instead of being
+    silently skipped.
+    """
+    if not isinstance(base64_str, str):
+        raise ImageDecodeError('Image data must be a base64 string')
+    try:
+        return base64.b64decode(''.join(base64_str.split()), validate=True)
+    except binascii.Error as e:
+        raise ImageDecodeError(f"Invalid base64 image data: {e}")
+
+
+def decode_image_bytes(image_data):
+    """
+    Decodes encoded image bytes straight into an RGB uint8 array with
+    cv2.imdecode, falling back to PIL for formats OpenCV cannot read.
+    """
+    buf = np.frombuffer(image_data, dtype=np.uint8)
+    bgr = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+    if bgr is not None:
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    try:
+        return np.asarray(Image.open(io.BytesIO(image_data)).convert('RGB'))
+    except Exception as e:
+        raise ImageDecodeError(f"Could not decode image: {e}")
+
+
+def prepare_image(image_data, pipeline=None):
+    """
+    Decodes image bytes once and runs a built preprocessing pipeline on the
+    array, so the engine receives the transformed page without another
+    decode. Returns (image, per-stage timings).
+    """
+    image = decode_image_bytes(image_data)
+    if not pipeline:
+        return image, []
+    return run_pipeline(image, pipeline, color_order='rgb')
+
+
+def to_rgb_array(image):
+    """
+    Accepts a PIL image, an RGB array or a single-channel array (output of a
+    preprocessing pipeline); returns an RGB uint8 array.
+    """
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert('RGB'))
+    image = np.asarray(image)
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    return image
+
+
 def decode_image(base64_str):
-    image_data = base64.b64decode(base64_str)
-    return Image.open(io.BytesIO(image_data)).convert('RGB')
+    return decode_image_bytes(decode_base64(base64_str))
 
 
 def get_paddle_ocr():
     global _paddle_ocr
     if _paddle_ocr is None:
-        _paddle_ocr = PaddleOCR(lang='en')
+        paddleocr = timed_import('paddleocr')
+        kwargs = {'cpu_threads': Config.OCR_ENGINE_THREADS} if Config.OCR_ENGINE_THREADS else {}
+        _paddle_ocr = paddleocr.PaddleOCR(lang='en', **kwargs)
     return _paddle_ocr
 
 
 def get_easy_ocr():
     global _easy_ocr
     if _easy_ocr is None:
+        easyocr = timed_import('easyocr')
         _easy_ocr = easyocr.Reader(['en'])
     return _easy_ocr
 
@@ -37,50 +99,270 @@ def get_easy_ocr():
 def get_doctr_ocr():
     global _doctr_ocr
     if _doctr_ocr is None:
-        _doctr_ocr = ocr_predictor(pretrained=True)
+        doctr_models = timed_import('doctr.models')
+        _doctr_ocr = doctr_models.ocr_predictor(pretrained=True)
     return _doctr_ocr
 
 
+def _set_torch_threads():
+    if Config.OCR_ENGINE_THREADS:
+        timed_import('torch').set_num_threads(Config.OCR_ENGINE_THREADS)
+
+
+def _join_words(words, sep):
+    texts = [w[0].strip() for w in words if w[0] and w[0].strip()]
+    confs = [w[1] for w in words if w[0] and w[0].strip()]
+    return sep.join(texts).strip(), float(np.mean(confs)) if confs else 0.0
+
+
+def _quad_to_box(points):
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return (float(min(xs)), float(min(ys)), float(max(xs)), float(max(ys)))
+
+
+def _tesseract_input(image):
+    if isinstance(image, np.ndarray) and image.ndim == 2:
+        # Already reduced to one channel by a request's preprocessing
+        # pipeline, which replaces the built-in binarization.
+        return image
+    img = cv2.cvtColor(to_rgb_array(image), cv2.COLOR_RGB2GRAY)
+    return cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 cv2.THRESH_BINARY, 11, 2)
+
+
+def tesseract_ocr_lines(image):
+    """
+    Runs tesseract once with image_to_data and returns its words grouped by
+    the lines tesseract found. Confidences are scaled from 0-100 to 0-1;
+    layout entries (conf -1) and empty words are dropped.
+    """
+    pytesseract = timed_import('pytesseract')
+    data = pytesseract.image_to_data(Image.fromarray(_tesseract_input(image)),
+                                     output_type=pytesseract.Output.DICT)
+    lines = {}
+    for i, text in enumerate(data['text']):
+        confidence = float(data['conf'][i])
+        if confidence < 0 or not text or not text.strip():
+            continue
+        x0, y0 = data['left'][i], data['top'][i]
+        box = (float(x0), float(y0),
+               float(x0 + data['width'][i]), float(y0 + data['height'][i]))
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append((text.strip(), confidence / 100, box))
+    return [lines[key] for key in sorted(lines)]
+
+
+def tesseract_ocr_words(image):
+    return [w for line in tesseract_ocr_lines(image) for w in line]
+
+
 def tesseract_ocr_process(image):
-    img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
-    img = cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                cv2.THRESH_BINARY, 11, 2)
-    text = pytesseract.image_to_string(Image.fromarray(img))
-    return text.strip(), 0.0
+    lines = tesseract_ocr_lines(image)
+    text = '\n'.join(' '.join(w[0] for w in line) for line in lines)
+    confs = [w[1] for line in lines for w in line]
+    return text, float(np.mean(confs)) if confs else 0.0
 
 
-def easy_ocr_process(image):
+def _easy_words(result):
+    return [(r[1], float(r[2]), _quad_to_box(r[0])) for r in result]
+
+
+def easy_ocr_words(image):
     ocr = get_easy_ocr()
-    result = ocr.readtext(np.array(image))
-    text = ' '.join([r[1] for r in result])
-    confs = [r[2] for r in result]
-    return text.strip(), float(np.mean(confs)) if confs else 0.0
+    return _easy_words(ocr.readtext(to_rgb_array(image)))
 
 
-def paddle_ocr_process(image):
+def easy_ocr_process(image):
+    return _join_words(easy_ocr_words(image), ' ')
+
+
+def paddle_ocr_words(image):
     ocr = get_paddle_ocr()
-    bgr = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    bgr = cv2.cvtColor(to_rgb_array(image), cv2.COLOR_RGB2BGR)
     result = ocr.ocr(bgr)
     if not result or not result[0]:
-        return '', 0.0
-    texts = []
-    confidences = []
-    for line in result[0]:
-        bbox, (text, confidence) = line
-        if text and text.strip():
-            texts.append(text.strip())
-            confidences.append(confidence)
-    if not texts:
-        return '', 0.0
-    combined_text = '\n'.join(texts)
-    avg_confidence = np.mean(confidences)
-    return combined_text, float(avg_confidence)
+        return []
+    return [(text, float(confidence), _quad_to_box(bbox))
+            for bbox, (text, confidence) in result[0]]
+
+
+def paddle_ocr_process(image):
+    return _join_words(paddle_ocr_words(image), '\n')
+
+
+def _doctr_page_words(page):
+    height, width = page.dimensions
+    words = []
+    for block in page.blocks:
+        for line in block.lines:
+            for w in line.words:
+                (x0, y0), (x1, y1) = w.geometry
+                words.append((w.value, float(w.confidence),
+                              (x0 * width, y0 * height, x1 * width, y1 * height)))
+    return words
+
+
+def doctr_ocr_words(image):
+    ocr = get_doctr_ocr()
+    # The predictor takes decoded pages directly; DocumentFile.from_images
+    # only reads paths and encoded bytes.
+    return _doctr_page_words(ocr([to_rgb_array(image)]).pages[0])
 
 
 def doctr_ocr_process(image):
+    return _join_words(doctr_ocr_words(image), ' ')
+
+
+# --- Batched variants ---
+
+
+def easy_ocr_words_batch(images):
+    ocr = get_easy_ocr()
+    arrays = [to_rgb_array(image) for image in images]
+    # readtext_batched needs equally sized pages; otherwise fall back to
+    # per-page calls, which still batch the recognizer over text crops.
+    if len(arrays) > 1 and len({a.shape for a in arrays}) == 1:
+        results = ocr.readtext_batched(arrays, batch_size=len(arrays))
+    else:
+        results = [ocr.readtext(a, batch_size=8) for a in arrays]
+    return [_easy_words(result) for result in results]
+
+
+def easy_ocr_process_batch(images):
+    return [_join_words(words, ' ') for words in easy_ocr_words_batch(images)]
+
+
+def doctr_ocr_words_batch(images):
     ocr = get_doctr_ocr()
-    doc = DocumentFile.from_images([np.array(image.convert("RGB"))])
-    result = ocr(doc)
-    lines = [
-        w.value for p in result.pages for b in p.blocks for l in b.lines for w in l.words]
-    return ' '.join(lines).strip(), 0.0
+    result = ocr([to_rgb_array(image) for image in images])
+    return [_doctr_page_words(page) for page in result.pages]
+
+
+def doctr_ocr_process_batch(images):
+    return [_join_words(words, ' ') for words in doctr_ocr_words_batch(images)]
+
+
+# --- Engine registrations ---
+
+
+class TesseractEngine(OCREngine):
+    name = 'tesseract'
+    package = 'pytesseract'
+    config = 'gray+adaptive_threshold(11,2);image_to_data'
+    modules = ('pytesseract',)
+    reports_confidence = True
+    reports_boxes = True
+    # Each call is a separate tesseract subprocess
+    max_concurrency = 4
+
+    def load(self):
+        if self.threads:
+            # Read by the tesseract binary's OpenMP runtime
+            os.environ.setdefault('OMP_THREAD_LIMIT', str(self.threads))
+
+    def process(self, image):
+        return tesseract_ocr_process(image)
+
+    def words(self, image):
+        return tesseract_ocr_words(image)
+
+
+class EasyOCREngine(OCREngine):
+    name = 'easy'
+    package = 'easyocr'
+    config = 'lang=en'
+    modules = ('easyocr',)
+    supports_batching = True
+    reports_confidence = True
+    reports_boxes = True
+    # Reader.readtext canvas_size default
+    detection_side = 2560
+
+    def load(self):
+        _set_torch_threads()
+        get_easy_ocr()
+
+    def process(self, image):
+        return easy_ocr_process(image)
+
+    def process_batch(self, images):
+        return easy_ocr_process_batch(images)
+
+    def words(self, image):
+        return easy_ocr_words(image)
+
+    def words_batch(self, images):
+        return easy_ocr_words_batch(images)
+
+
+class PaddleOCREngine(OCREngine):
+    name = 'paddle'
+    package = 'paddleocr'
+    config = 'lang=en'
+    modules = ('paddleocr',)
+    # PaddleOCR 2.7 detects one page per call; the recognizer already
+    # batches text crops internally (rec_batch_num).
+    supports_batching = False
+    reports_confidence = True
+    reports_boxes = True
+    # det_limit_side_len default
+    detection_side = 960
+
+    def load(self):
+        get_paddle_ocr()
+
+    def process(self, image):
+        return paddle_ocr_process(image)
+
+    def words(self, image):
+        return paddle_ocr_words(image)
+
+
+class DocTREngine(OCREngine):
+    name = 'doctr'
+    package = 'python-doctr'
+    config = 'pretrained=True;word-confidence'
+    modules = ('doctr.models',)
+    supports_batching = True
+    reports_confidence = True
+    reports_boxes = True
+    # Detection input size of the default predictor
+    detection_side = 1024
+
+    def load(self):
+        _set_torch_threads()
+        get_doctr_ocr()
+
+    def process(self, image):
+        return doctr_ocr_process(image)
+
+    def process_batch(self, images):
+        return doctr_ocr_process_batch(images)
+
+    def words(self, image):
+        return doctr_ocr_words(image)
+
+    def words_batch(self, images):
+        return doctr_ocr_words_batch(images)
+
+
+register_engine(TesseractEngine)
+register_engine(EasyOCREngine)
+register_engine(PaddleOCREngine)
+register_engine(DocTREngine)
+
+
+def make_warmup_image():
+    """Small synthetic page with a line of text for warm-up inference."""
+    img = np.full((64, 320, 3), 255, dtype=np.uint8)
+    cv2.putText(img, 'INVOICE 12345', (10, 44), cv2.FONT_HERSHEY_SIMPLEX,
+                1.2, (0, 0, 0), 2, cv2.LINE_AA)
+    return Image.fromarray(img)
+
+
+def warm_up_engine(engine):
+    """Imports and loads the engine, then runs one dummy inference."""
+    engine.import_modules()
+    engine.load()
+    engine.run_batch([make_warmup_image()])
@@ -0,0 +1,143 @@
+import numpy as np
+
+from config import Config
+from services.img_preprocessing_service import downscale_max_side
+from utils.geometry_utils import (
+    BoxGrid, box_overlap_ratio, offset_box, words_to_text
+)
+
+# Duplicate words in tile overlaps: boxes overlapping by more than this
+# (intersection over the smaller box) are treated as the same word.
+_DUPLICATE_OVERLAP = 0.5
+
+
+def _tile_origins(length, tile_size, step):
+    if length <= tile_size:
+        return [0]
+    origins = list(range(0, length - tile_size + 1, step))
+    if origins[-1] + tile_size < length:
+        origins.append(length - tile_size)
+    return origins
+
+
+def make_tiles(image, tile_size, overlap):
+    """
+    Splits an array into overlapping tile_size x tile_size tiles. Returns
+    [(x0, y0, tile)]; tiles at the border of small pages are padded with
+    white so every tile has the same shape and can be batched.
+    """
+    height, width = image.shape[:2]
+    step = max(1, tile_size - overlap)
+    tiles = []
+    for y0 in _tile_origins(height, tile_size, step):
+        for x0 in _tile_origins(width, tile_size, step):
+            tile = image[y0:y0 + tile_size, x0:x0 + tile_size]
+            if tile.shape[0] != tile_size or tile.shape[1] != tile_size:
+                padded = np.full((tile_size, tile_size) + image.shape[2:],
+                                 255, dtype=image.dtype)
+                padded[:tile.shape[0], :tile.shape[1]] = tile
+                tile = padded
+            tiles.append((x0, y0, tile))
+    return tiles
+
+
+def _centrality(box, x0, y0, tile_size, width, height):
+    # Distance from the word to the nearest tile edge that is not also an
+    # image edge; words close to such an edge may be cut in half.
+    distances = [float('inf')]
+    if x0 > 0:
+        distances.append(box[0] - x0)
+    if y0 > 0:
+        distances.append(box[1] - y0)
+    if x0 + tile_size < width:
+        distances.append(x0 + tile_size - box[2])
+    if y0 + tile_size < height:
+        distances.append(y0 + tile_size - box[3])
+    return min(distances)
+
+
+def merge_tile_words(tiles, tile_words, width, height, tile_size):
+    """
+    Maps per-tile words to page coordinates and removes duplicates from the
+    overlaps. Of two overlapping copies, the one further from a cut tile
+    edge wins (it is least likely truncated), then the more confident one.
+    """
+    candidates = []
+    for (x0, y0, _), words in zip(tiles, tile_words):
+        for text, confidence, box in words:
+            page_box = offset_box(box, x0, y0)
+            if page_box[0] >= width or page_box[1] >= height:
+                continue  # Detected in the white padding
+            centrality = _centrality(page_box, x0, y0, tile_size, width, height)
+            candidates.append((centrality, confidence, text, page_box))
+    candidates.sort(key=lambda c: (c[0], c[1]), reverse=True)
+
+    kept = []
+    grid = BoxGrid()
+    for _, confidence, text, box in candidates:
+        if any(box_overlap_ratio(box, other[2]) > _DUPLICATE_OVERLAP
+               for other in grid.near(box)):
+            continue
+        word = (text, confidence, box)
+        grid.add(word, box)
+        kept.append(word)
+    return kept
+
+
+def resolve_tiling(engine, tile_size=None, overlap=None):
+    """
+    The tile size and overlap tiling actually uses on this engine: the
+    engine's detection side by default, and OCR_TILE_OVERLAP capped at half
+    a tile. Raises ValueError for a non-positive tile size or a requested
+    overlap outside [0, tile_size // 2].
+    """
+    if tile_size is None:
+        tile_size = engine.detection_side or 1024
+    tile_size = int(tile_size)
+    if tile_size <= 0:
+        raise ValueError('tile_size must be positive')
+    if overlap is None:
+        overlap = min(Config.OCR_TILE_OVERLAP, tile_size // 2)
+    overlap = int(overlap)
+    if not 0 <= overlap <= tile_size // 2:
+        raise ValueError('overlap must be between 0 and half of tile_size')
+    return {'tile_size': tile_size, 'overlap': overlap}
+
+
+def tiled_words_batch(engine, images, run_words_batch, tile_size=None,
+                      overlap=None):
+    """
+    OCRs large pages tile by tile and returns each page's merged words in
+    its coordinates. The tiles of all pages go to run_words_batch(model,
+    tiles) in one call (one batch, or spread over the worker pool).
+    """
+    tiling = resolve_tiling(engine, tile_size, overlap)
+    tile_size, overlap = tiling['tile_size'], tiling['overlap']
+    pages = []
+    for image in images:
+        image, scale = downscale_max_side(image, engine.input_side_limit())
+        pages.append((image.shape[:2], scale, make_tiles(image, tile_size, overlap)))
+    tile_words = run_words_batch(
+        engine.name, [tile for _, _, tiles in pages for _, _, tile in tiles])
+    results = []
+    start = 0
+    for (height, width), scale, tiles in pages:
+        words = merge_tile_words(tiles, tile_words[start:start + len(tiles)],
+                                 width, height, tile_size)
+        start += len(tiles)
+        if scale != 1.0:
+            words = [(t, c, offset_box(b, 0, 0, 1 / scale)) for t, c, b in words]
+        results.append(words)
+    return results
+
+
+def tiled_words(engine, image, run_words_batch, tile_size=None, overlap=None):
+    """Merged words of one tiled page, see tiled_words_batch()."""
+    return tiled_words_batch(engine, [image], run_words_batch,
+                             tile_size, overlap)[0]
+
+
+def tiled_ocr(engine, image, run_words_batch, tile_size=None, overlap=None):
+    """Tiled counterpart of run_ocr(): returns (text, confidence)."""
+    words = tiled_words(engine, image, run_words_batch, tile_size, overlap)
+    return words_to_text(words)
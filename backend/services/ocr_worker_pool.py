@@ -0,0 +1,179 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import Config
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# --- Worker process side ---
+
+
+def _init_worker(preload, ready):
+    """
+    Loads and warms the preload engines, then reports
+    (pid, {model: {'seconds'} or {'error'}}) on the `ready` queue. Failures
+    are reported instead of raised, which would break the whole pool.
+    """
+    # Imported here so the API process only pays for it when running inline
+    from services.ocr_engine_registry import get_engine, has_engine
+    from services.ocr_service import warm_up_engine
+    status = {}
+    for model in preload:
+        started = time.perf_counter()
+        try:
+            if not has_engine(model):
+                raise ValueError(f"Unknown model: {model}")
+            warm_up_engine(get_engine(model))
+        except Exception as e:
+            status[model] = {'error': str(e)}
+            continue
+        status[model] = {'seconds': round(time.perf_counter() - started, 3)}
+    ready.put((os.getpid(), status))
+    print(f"OCR worker ready (preloaded: {', '.join(preload) or 'none'})",
+          flush=True)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _run_batch(model, images, method):
+    from services.ocr_engine_registry import get_engine
+    return getattr(get_engine(model), method)(images)
+
+
+# --- API process side ---
+
+
+class OCRWorkerPool:
+    """
+    Long-lived worker processes, each owning its own engine instances.
+    Pages are pickled over the executor's pipes. If a worker dies (e.g. an
+    engine segfaults) the pool is rebuilt and the batch retried once.
+    """
+
+    def __init__(self, processes, preload, max_retries=1):
+        self.processes = processes
+        self.preload = list(preload)
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        # spawn: engine libraries (torch, paddle) are not fork-safe
+        self._context = multiprocessing.get_context('spawn')
+        self._ready = self._context.Queue()
+        self._executor = self._create_executor()
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(self.preload, self._ready),
+        )
+
+    def wait_ready(self, timeout=None):
+        """
+        Blocks until every worker process has warmed its preload engines
+        and returns {pid: {model: {'seconds'} or {'error'}}}. Raises
+        TimeoutError if that takes longer than `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        executor = None
+        while True:
+            with self._lock:
+                if self._executor is not executor:
+                    # Started or restarted: only this pool's workers count
+                    executor, ready = self._executor, self._ready
+                    workers = {}
+                elif len(workers) >= self.processes:
+                    return workers
+            # Workers are started on demand: a round of no-op tasks makes
+            # the executor start the missing ones
+            for _ in range(self.processes - len(workers)):
+                executor.submit(_ping)
+            wait = 5.0
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    raise TimeoutError(
+                        f"{len(workers)}/{self.processes} OCR workers ready")
+            try:
+                pid, status = ready.get(timeout=wait)
+            except queue.Empty:
+                continue
+            workers[pid] = status
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._executor is not broken:
+                return  # Already replaced by another caller
+            print("OCR worker pool broken, restarting workers", flush=True)
+            broken.shutdown(wait=False, cancel_futures=True)
+            # A fresh queue, so ready reports from the dead workers are dropped
+            self._ready = self._context.Queue()
+            self._executor = self._create_executor()
+
+    def submit_batch(self, model, images, method='run_batch'):
+        """
+        Returns a Future of the per-page results for this batch. method is
+        the engine method to call: 'run_batch' for (text, confidence) or
+        'run_words_batch' for word lists.
+        """
+        outer = Future()
+        outer.set_running_or_notify_cancel()
+        self._attempt(outer, (model, images, method), self.max_retries)
+        return outer
+
+    def _attempt(self, outer, task, retries_left):
+        executor = self._executor
+        try:
+            inner = executor.submit(_run_batch, *task)
+        except BrokenProcessPool as e:
+            self._retry_or_fail(outer, task, retries_left, executor, e)
+            return
+
+        def _done(f):
+            error = f.exception()
+            if isinstance(error, BrokenProcessPool):
+                self._retry_or_fail(outer, task, retries_left, executor, error)
+            elif error is not None:
+                outer.set_exception(error)
+            else:
+                outer.set_result(f.result())
+
+        inner.add_done_callback(_done)
+
+    def _retry_or_fail(self, outer, task, retries_left, executor, error):
+        self._restart(executor)
+        if retries_left > 0:
+            self._attempt(outer, task, retries_left - 1)
+        else:
+            outer.set_exception(error)
+
+    def shutdown(self):
+        with self._lock:
+            self._executor.shutdown(wait=True)
+
+
+def get_worker_pool():
+    """Returns the shared pool, or None when OCR runs in-process."""
+    global _pool
+    if Config.OCR_WORKER_PROCESSES <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Engines warmed at startup must be warm in every worker;
+                # disabled engines are dropped from the default preload list
+                preload = [m for m in Config.OCR_WORKER_PRELOAD
+                           if m in Config.OCR_ENABLED_ENGINES]
+                preload = list(dict.fromkeys(
+                    preload + Config.OCR_PRELOAD_ENGINES))
+                _pool = OCRWorkerPool(Config.OCR_WORKER_PROCESSES, preload)
+    return _pool
@@ -0,0 +1,115 @@
+import threading
+import time
+
+from config import Config
+from services.ocr_service import warm_up_engine
+from services.ocr_engine_registry import get_engine, has_engine
+from services.ocr_worker_pool import get_worker_pool
+from utils.import_utils import print_import_report
+
+_state = {
+    'status': 'starting',
+    'engines': {},
+}
+_state_lock = threading.Lock()
+
+
+def _set_engine(model, info):
+    with _state_lock:
+        _state['engines'][model] = info
+
+
+def _warm_up_pool(pool, engines):
+    """
+    Waits for every worker to report its preload warm-up (the pool
+    initializer warms engines, see ocr_worker_pool._init_worker). An engine
+    is ready once all workers have warmed it. A worker stuck in warm-up
+    fails every engine after OCR_WORKER_READY_TIMEOUT_S.
+    """
+    try:
+        workers = pool.wait_ready(timeout=Config.OCR_WORKER_READY_TIMEOUT_S)
+    except TimeoutError as e:
+        error = f"Worker warm-up timed out: {e}"
+        print(error, flush=True)
+        for model in engines:
+            _set_engine(model, {'status': 'failed', 'error': error})
+        return True
+    failed = False
+    for model in engines:
+        statuses = [status.get(model) for status in workers.values()]
+        errors = [s['error'] for s in statuses if s and 'error' in s]
+        if errors or None in statuses:
+            failed = True
+            error = errors[0] if errors else "not preloaded by every worker"
+            print(f"Warm-up failed for {model}: {error}", flush=True)
+            _set_engine(model, {'status': 'failed', 'error': error})
+            continue
+        seconds = max(s['seconds'] for s in statuses)
+        print(f"Warmed up {model} in {len(workers)} workers "
+              f"(slowest {seconds:.2f}s)", flush=True)
+        _set_engine(model, {'status': 'ready', 'seconds': seconds,
+                            'workers': len(workers)})
+    return failed
+
+
+def _warm_up_inline(engines):
+    failed = False
+    for model in engines:
+        _set_engine(model, {'status': 'warming'})
+        started = time.perf_counter()
+        try:
+            if not has_engine(model):
+                raise ValueError(f"Unknown model: {model}")
+            warm_up_engine(get_engine(model))
+        except Exception as e:
+            failed = True
+            print(f"Warm-up failed for {model}: {e}", flush=True)
+            _set_engine(model, {'status': 'failed', 'error': str(e)})
+            continue
+        elapsed = time.perf_counter() - started
+        print(f"Warmed up {model} in {elapsed:.2f}s", flush=True)
+        _set_engine(model, {'status': 'ready', 'seconds': round(elapsed, 3)})
+    return failed
+
+
+def _warm_up(engines, pool):
+    if pool is not None:
+        for model in engines:
+            _set_engine(model, {'status': 'warming'})
+        failed = _warm_up_pool(pool, engines)
+    else:
+        failed = _warm_up_inline(engines)
+    with _state_lock:
+        _state['status'] = 'failed' if failed else 'ready'
+    print_import_report("Engine import cost")
+
+
+def start_warmup(engines, background=True):
+    """
+    Preloads and warms the given engines. In the background the API can
+    answer /healthz immediately while /readyz stays 503 until this finishes.
+    With a worker pool, readiness waits for every worker to warm its whole
+    preload list, even when `engines` is empty.
+    """
+    engines = list(engines)
+    pool = get_worker_pool()
+    if pool is not None:
+        # The pool's preload list already includes `engines`
+        engines = pool.preload
+    elif not engines:
+        with _state_lock:
+            _state['status'] = 'ready'
+        return
+    if background:
+        threading.Thread(target=_warm_up, args=(engines, pool),
+                         name='ocr-warmup', daemon=True).start()
+    else:
+        _warm_up(engines, pool)
+
+
+def get_readiness():
+    with _state_lock:
+        return {
+            'status': _state['status'],
+            'engines': {m: dict(info) for m, info in _state['engines'].items()},
+        }
@@ -0,0 +1,39 @@
+import os
+import sys
+
+# Tests import the backend modules the way app.py does (services.x, utils.x)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def tiny_llm(tmp_path_factory):
+    """
+    Directory with a randomly initialized two-layer Llama and a character
+    level tokenizer, small enough to run the LLM engine on CPU in tests.
+    """
+    torch = pytest.importorskip('torch')
+    transformers = pytest.importorskip('transformers')
+    tokenizers = pytest.importorskip('tokenizers')
+    from tokenizers.processors import TemplateProcessing
+
+    vocab = {'<unk>': 0, '<s>': 1, '</s>': 2}
+    for ch in [chr(i) for i in range(32, 127)] + ['\n']:
+        vocab[ch] = len(vocab)
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token='<unk>'))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.Split('', 'isolated')
+    tokenizer.decoder = tokenizers.decoders.Fuse()
+    tokenizer.post_processor = TemplateProcessing(single='<s> $A', special_tokens=[('<s>', 1)])
+    path = str(tmp_path_factory.mktemp('tiny-llm'))
+    transformers.PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, bos_token='<s>', eos_token='</s>',
+        unk_token='<unk>').save_pretrained(path)
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=len(vocab), hidden_size=64, intermediate_size=128,
+        num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=2,
+        max_position_embeddings=4096, bos_token_id=1, eos_token_id=2,
+        initializer_range=0.4)
+    transformers.LlamaForCausalLM(config).save_pretrained(path)
+    return path
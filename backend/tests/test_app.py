@@ -0,0 +1,14 @@
+import importlib
+
+import pytest
+
+
+def test_import_does_not_start_services(monkeypatch):
+    # OCR pool workers are spawned processes that import app.py again
+    pytest.importorskip('requests')
+    warmup = importlib.import_module('services.warmup_service')
+    started = []
+    monkeypatch.setattr(warmup, 'start_warmup', lambda *a, **k: started.append(a))
+    app = importlib.import_module('app')
+    importlib.reload(app)
+    assert started == []
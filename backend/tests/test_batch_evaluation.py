@@ -0,0 +1,77 @@
+import csv
+import json
+
+import pytest
+
+from services.batch_evaluation_service import (
+    METRICS, evaluate_dataset, load_evaluation_records
+)
+from services.evaluation_service import PreparedRecord, evaluate_prepared
+
+TRUTH = {'invoice': {'invoice_number': 'INV-1', 'seller_name': 'ACME'},
+         'items': [{'description': 'bolt', 'quantity': '2'},
+                   {'description': 'nut', 'quantity': '10'}]}
+PREDICTIONS = [
+    json.dumps(TRUTH),
+    'Sure, here it is: {"invoice": {"invoice_number": "INV-1", "seller_name": "Acme"}, '
+    '"items": [{"description": "nut", "quantity": "10"}',
+    json.dumps({'invoice': {'invoice_number': 'INV-7'}, 'items': [], 'extra': 'x'}),
+    'no json at all',
+    json.dumps({'a': []}),
+]
+ROWS = [{'ground_truth': json.dumps(TRUTH if i != 4 else {'a': []}), 'prediction': p}
+        for i, p in enumerate(PREDICTIONS)]
+
+
+@pytest.fixture(params=['jsonl', 'csv'])
+def dataset(request, tmp_path):
+    path = tmp_path / f"predictions.{request.param}"
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if request.param == 'jsonl':
+            f.writelines(json.dumps(row) + '\n' for row in ROWS)
+        else:
+            writer = csv.DictWriter(f, fieldnames=['ground_truth', 'prediction'])
+            writer.writeheader()
+            writer.writerows(ROWS)
+    return str(path)
+
+
+def _expected(records):
+    expected = []
+    for truth, pred in records:
+        metrics = evaluate_prepared(PreparedRecord(pred), PreparedRecord(truth))
+        metrics['exact_match'] = float(metrics['exact_match'])
+        expected.append(metrics)
+    return expected
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_batch_metrics_match_evaluate_prepared(dataset, workers):
+    records = load_evaluation_records(dataset)
+    assert len(records) == len(ROWS) and records[3][1] is None
+    report = evaluate_dataset(records, workers=workers, chunk_size=2, per_record=True)
+    expected = _expected(records)
+    for got, want in zip(report['per_record'], expected):
+        assert set(got) == set(METRICS)
+        for metric in METRICS:
+            assert got[metric] == pytest.approx(want[metric]), metric
+    assert report['records'] == len(ROWS)
+    assert report['parse_failures'] == 1
+    assert report['metrics']['exact_match']['mean'] == pytest.approx(2 / len(ROWS))
+
+
+def test_field_report(dataset):
+    report = evaluate_dataset(load_evaluation_records(dataset), workers=1)
+    seller = report['fields']['invoice.seller_name']
+    assert seller['count'] == 4
+    assert seller['accuracy'] == pytest.approx(1 / 4)
+    assert seller['missing'] == pytest.approx(2 / 4)
+    assert report['fields']['extra']['extra'] == 1
+    assert report['fields']['items[].quantity']['count'] == 8
+
+
+def test_missing_column_is_an_error(tmp_path):
+    path = tmp_path / 'bad.jsonl'
+    path.write_text(json.dumps({'ground_truth': '{}'}) + '\n')
+    with pytest.raises(ValueError):
+        load_evaluation_records(str(path))
@@ -0,0 +1,115 @@
+"""
+The NLTK-free tokenizer, BLEU and F1 must match NLTK itself; skipped when
+NLTK (not needed by the service) is not installed. Token parity needs
+NLTK's Punkt English model (punkt_tab) and is skipped without it.
+"""
+import json
+import random
+
+import pytest
+
+from services.evaluation_service import PreparedRecord, _bleu, _f1
+from utils.metrics_utils import PUNKT_ABBREVIATIONS, sent_tokenize, word_tokenize
+
+nltk = pytest.importorskip('nltk')
+bleu_score = pytest.importorskip('nltk.translate.bleu_score')
+punkt = pytest.importorskip('nltk.tokenize.punkt')
+
+
+def _has_punkt_model():
+    try:
+        nltk.data.find('tokenizers/punkt_tab/english/')
+    except LookupError:
+        return False
+    return True
+
+
+requires_punkt_model = pytest.mark.skipif(
+    not _has_punkt_model(), reason="NLTK's punkt_tab English model is not installed")
+
+
+SENTENCES = [
+    'He said "it\'s done" -- and left.',
+    "They can't go; we'll see (maybe) at 5:30, or 6.",
+    "“Quoted” text, ‘single’ quotes and «chevrons» — and more...",
+    "Total: $1,234.56 @ 19% tax & fees; ref #A-12!",
+    "I'm gonna wanna gimme 'tis cannot d'ye",
+    "Ends with a period inside quotes.\"",
+    "Paid in full. Thank you",
+    "Net 30 days. Late fees apply! Call (555) 0100. Thanks.",
+    "Shipped to J. Bach, ACME Corp. on 3.5. and re-sent. \"Done.\" Next",
+    "Item 4. Bolts, 5 pcs. see below...",
+]
+
+
+def _invoice(rng):
+    return {
+        'invoice': {'invoice_number': f"INV-{rng.randint(1000, 9999)}",
+                    'seller_name': rng.choice(['ACME Corp.', "O'Brien & Sons",
+                                               'Müller GmbH', 'N/A']),
+                    'invoice_date': rng.choice(['2024-03-01', '01.03.2024'])},
+        'items': [{'description': rng.choice(['bolt (M8)', 'nut, hex', "8' pipe",
+                                              'gear -- large', 'Widget...']),
+                   'quantity': str(rng.randint(1, 50)),
+                   'total_price': f"{rng.uniform(1, 500):.2f}"}
+                  for _ in range(rng.randint(0, 6))],
+        'subtotal': {'tax': '19.00', 'total': rng.choice(['119.00', ''])},
+        'notes': rng.choice(['Paid in full. Thank you', 'Net 30 days. Late fees apply!',
+                             'Deliver Monday. Call first.', '']),
+    }
+
+
+def _perturb(rng, obj):
+    obj = json.loads(json.dumps(obj))
+    if obj['items'] and rng.random() < 0.5:
+        obj['items'].pop(rng.randrange(len(obj['items'])))
+    if rng.random() < 0.5:
+        obj['invoice']['seller_name'] = obj['invoice']['seller_name'].upper()
+    if rng.random() < 0.2:
+        obj['items'] = obj['items'][:1]
+    if rng.random() < 0.3:
+        obj['notes'] = obj['notes'].replace('. ', ' ')
+    return obj
+
+
+@pytest.fixture(scope='module')
+def pairs():
+    rng = random.Random(0)
+    pairs = []
+    for _ in range(200):
+        truth = _invoice(rng)
+        pairs.append((truth, _perturb(rng, truth)))
+    return pairs
+
+
+@requires_punkt_model
+def test_tokens_match_nltk(pairs):
+    texts = SENTENCES + [json.dumps(obj) for pair in pairs for obj in pair]
+    for text in texts:
+        assert word_tokenize(text) == nltk.word_tokenize(text), text
+
+
+def test_sentence_splitting_follows_the_punkt_algorithm(pairs):
+    # Not a parity check: NLTK's Punkt run with the port's own abbreviation
+    # list instead of the English model, so only the algorithm is compared
+    params = punkt.PunktParameters()
+    params.abbrev_types = set(PUNKT_ABBREVIATIONS)
+    sentences = punkt.PunktSentenceTokenizer(params)
+    texts = SENTENCES + [json.dumps(obj) for pair in pairs for obj in pair]
+    for text in texts:
+        assert sent_tokenize(text) == sentences.tokenize(text), text
+
+
+def test_bleu_and_f1_match_nltk_on_the_same_tokens(pairs):
+    smoothie = bleu_score.SmoothingFunction().method4
+    for truth, pred in pairs:
+        p, t = PreparedRecord(pred), PreparedRecord(truth)
+        p_tokens, t_tokens = p.tokens, t.tokens
+        bleu = bleu_score.sentence_bleu([t_tokens], p_tokens, smoothing_function=smoothie)
+        common = set(p_tokens).intersection(t_tokens)
+        f1 = 0.0
+        if p_tokens and t_tokens and common:
+            precision, recall = len(common) / len(p_tokens), len(common) / len(t_tokens)
+            f1 = 2 * precision * recall / (precision + recall)
+        assert _bleu(p, t) == pytest.approx(bleu, abs=1e-12)
+        assert _f1(p, t) == pytest.approx(f1, abs=1e-12)
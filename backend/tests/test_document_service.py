@@ -0,0 +1,92 @@
+import io
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from services import document_service
+from services.document_service import iter_document_pages, ocr_pages
+
+
+def _tiff(count, size=(40, 30)):
+    # Page i is filled with red = 10 * i so results can be traced to pages
+    frames = [Image.new('RGB', size, (10 * i, 0, 0)) for i in range(count)]
+    buf = io.BytesIO()
+    frames[0].save(buf, format='TIFF', save_all=True, append_images=frames[1:])
+    return buf.getvalue()
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    state = {'running': 0, 'peak': 0, 'fail': set(), 'delay': 0.0}
+    lock = threading.Lock()
+
+    def run_ocr(model, image, tiling=None):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        try:
+            time.sleep(state['delay'])
+            page = int(image[0, 0, 0]) // 10
+            if page in state['fail']:
+                raise RuntimeError(f"engine failed on page {page}")
+            return f"page {page}", 0.9
+        finally:
+            with lock:
+                state['running'] -= 1
+    monkeypatch.setattr(document_service, 'run_ocr', run_ocr)
+    return state
+
+
+def test_tiff_pages_are_yielded_in_order():
+    pages = list(iter_document_pages(_tiff(3)))
+    assert [index for index, _ in pages] == [0, 1, 2]
+    assert [int(image[0, 0, 0]) for _, image in pages] == [0, 10, 20]
+    assert pages[0][1].shape == (30, 40, 3)
+
+
+def test_every_page_is_ocred_once(fake_ocr):
+    results = list(ocr_pages(iter_document_pages(_tiff(7)), 'tesseract'))
+    assert sorted(r['page'] for r in results) == list(range(7))
+    assert all(r['text'] == f"page {r['page']}" for r in results)
+
+
+def test_pages_in_flight_are_bounded(fake_ocr):
+    fake_ocr['delay'] = 0.02
+    rendered = []
+
+    def pages():
+        for index, image in iter_document_pages(_tiff(8)):
+            rendered.append(index)
+            yield index, image
+    done = 0
+    for _ in ocr_pages(pages(), 'tesseract', max_in_flight=2):
+        done += 1
+        # Only pages that finished or are among the two in flight are rendered
+        assert len(rendered) <= done + 2
+    assert done == 8
+    assert fake_ocr['peak'] <= 2
+
+
+def test_failed_page_is_reported_and_the_rest_complete(fake_ocr):
+    fake_ocr['fail'] = {1}
+    results = {r['page']: r for r in ocr_pages(iter_document_pages(_tiff(3)), 'tesseract')}
+    assert results[1] == {'page': 1, 'error': 'engine failed on page 1'}
+    assert results[0]['text'] == 'page 0' and results[2]['text'] == 'page 2'
+
+
+@pytest.mark.parametrize('data', [b'II*\x00' + b'\x00' * 20, _tiff(2)[:40],
+                                  b'%PDF-1.7 garbage', b'not an image'],
+                         ids=['tiff-header', 'tiff-cut', 'pdf', 'image'])
+def test_corrupt_document_fails_on_open(data):
+    # Without pypdfium2 a PDF fails with a ValueError as well
+    with pytest.raises(ValueError):
+        iter_document_pages(data)
+
+
+def test_truncated_tiff_page_raises_value_error():
+    data = _tiff(3)
+    pages = iter_document_pages(data[:len(data) - 50])
+    with pytest.raises(ValueError):
+        list(pages)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from services.evaluation_service import (
+    PreparedRecord, evaluate_prepared, field_level_accuracy
+)
+from utils import metrics_utils
+from utils.metrics_utils import compare_fields
+
+INVOICE = {'invoice': {'invoice_number': 'INV-1', 'seller_name': 'ACME'},
+           'items': [{'description': 'bolt', 'quantity': '2'},
+                     {'description': 'nut', 'quantity': '10'}]}
+
+
+def test_reordered_items_are_aligned():
+    pred = {**INVOICE, 'items': INVOICE['items'][::-1]}
+    assert field_level_accuracy(pred, INVOICE) == 1
+
+
+def test_missing_item_only_counts_against_itself():
+    pred = {**INVOICE, 'items': INVOICE['items'][1:]}
+    comparison = compare_fields(pred, INVOICE)
+    missing = [path for path, exact, _, is_missing in comparison['leaves'] if is_missing]
+    assert missing == ['items[].description', 'items[].quantity']
+    assert field_level_accuracy(pred, INVOICE) == pytest.approx(4 / 6)
+
+
+@pytest.mark.parametrize('pred, truth, expected', [
+    ({'a': []}, {'a': []}, 1),
+    ({}, {}, 1),
+    ({'a': {}}, {'a': {}}, 1),
+    ({'a': [1]}, {'a': []}, 0),
+    ({'b': 'x'}, {'a': []}, 0),
+])
+def test_truth_without_leaves(pred, truth, expected):
+    assert field_level_accuracy(pred, truth) == expected
+    metrics = evaluate_prepared(PreparedRecord(pred), PreparedRecord(truth))
+    assert metrics['field_level_accuracy'] == expected
+
+
+def test_greedy_alignment_without_scipy(monkeypatch):
+    def no_scipy(name):
+        raise ImportError(name)
+    monkeypatch.setattr(metrics_utils, 'timed_import', no_scipy)
+    similarity = np.array([[0.9, 0.8], [0.0, 0.1]])
+    assert sorted(metrics_utils._align(similarity)) == [(0, 0), (1, 1)]
+    pred = {**INVOICE, 'items': INVOICE['items'][::-1]}
+    assert field_level_accuracy(pred, INVOICE) == 1
+
+
+def test_hungarian_alignment_maximizes_the_total():
+    pytest.importorskip('scipy')
+    similarity = np.array([[0.9, 0.8], [0.7, 0.0]])
+    # Greedy would take (0, 0) and leave row 1 unmatched
+    assert sorted(metrics_utils._align(similarity)) == [(0, 1), (1, 0)]
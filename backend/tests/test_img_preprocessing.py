@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from services.img_preprocessing_service import build_pipeline, run_pipeline
+
+
+def test_params_are_coerced_and_noops_dropped():
+    pipeline = build_pipeline([{'name': 'resize', 'scale_percent': '200'},
+                               {'name': 'gaussian_blur', 'ksize': '1'},
+                               {'name': 'adaptive_threshold', 'block_size': 15.0}])
+    assert pipeline == [{'name': 'resize', 'scale_percent': 200.0},
+                        {'name': 'adaptive_threshold', 'block_size': 15, 'c': 2.0}]
+    assert build_pipeline('resize:scale_percent=100') == []
+
+
+@pytest.mark.parametrize('stage', [
+    {'name': 'resize', 'scale_percent': 0},
+    {'name': 'resize', 'scale_percent': -50},
+    {'name': 'resize', 'scale_percent': 'big'},
+    {'name': 'resize', 'scale_percent': float('nan')},
+    {'name': 'gaussian_blur', 'ksize': 2.5},
+    {'name': 'median_blur', 'ksize': [3]},
+    {'name': 'adaptive_threshold', 'block_size': 1},
+    {'name': 'adaptive_threshold', 'c': True},
+    {'name': 'resize', 'scale': 2},
+    {'name': ['resize']},
+    5,
+])
+def test_bad_stages_raise_value_error(stage):
+    with pytest.raises(ValueError):
+        build_pipeline([stage])
+
+
+def test_small_scale_keeps_at_least_one_pixel():
+    image = np.full((20, 30, 3), 255, dtype=np.uint8)
+    resized, timings = run_pipeline(image, build_pipeline([{'name': 'resize',
+                                                            'scale_percent': 1}]))
+    assert resized.shape[:2] == (1, 1)
+    assert [t['stage'] for t in timings] == ['resize']
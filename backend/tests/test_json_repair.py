@@ -0,0 +1,84 @@
+import json
+import random
+
+import pytest
+
+from utils.json_repair import JSONRepairer, parse_json, repair_json
+
+
+def _random_value(rng, depth=0):
+    roll = rng.random()
+    if depth < 3 and roll < 0.3:
+        return {f"k{i} é": _random_value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+    if depth < 3 and roll < 0.5:
+        return [_random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return rng.choice([1, -2.5, 1e20, True, None, "s\"q\\\n\t ü {x}", "", "a, b", "\\u00e9"])
+
+
+def _documents(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        doc = {'root': _random_value(rng)}
+        yield rng, doc, json.dumps(doc, indent=rng.choice([None, 2]),
+                                   ensure_ascii=rng.random() < 0.5)
+
+
+def _feed_in_pieces(text, sizes):
+    repairer = JSONRepairer()
+    i = 0
+    for size in sizes:
+        repairer.feed(text[i:i + size])
+        i += size
+    repairer.feed(text[i:])
+    return repairer
+
+
+def test_valid_json_round_trips_with_surrounding_text():
+    for _, doc, text in _documents(500):
+        assert json.loads(repair_json(f"Here you go:\n```json\n{text}\n```\nDone.")) == doc
+
+
+def test_streamed_input_matches_whole_input():
+    for rng, doc, text in _documents(500, seed=1):
+        sizes = [rng.randint(1, 4) for _ in range(len(text))]
+        repairer = _feed_in_pieces(text + ' trailing {"x": 1}', sizes)
+        assert repairer.done
+        assert repairer.close() == repair_json(text)
+        assert json.loads(repairer.close()) == doc
+
+
+def test_object_is_done_at_its_closing_brace():
+    repairer = JSONRepairer()
+    assert not repairer.feed('Sure! {"a": [1, {"b": "}"}')
+    assert repairer.feed('], "c": 2} and more text')
+    assert json.loads(repairer.close()) == {'a': [1, {'b': '}'}], 'c': 2}
+
+
+def test_truncated_output_is_closed():
+    for rng, _, text in _documents(500, seed=2):
+        cut = text[:rng.randint(1, len(text))]
+        streamed = _feed_in_pieces(cut, [rng.randint(1, 4) for _ in range(len(cut))])
+        repaired = repair_json(cut)
+        assert streamed.close() == repaired
+        assert isinstance(json.loads(repaired), dict)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("{'name': 'ACME', 'total': 12.5,}", {'name': 'ACME', 'total': 12.5}),
+    ('{name: ACME Corp, paid: True, note: None}',
+     {'name': 'ACME Corp', 'paid': True, 'note': None}),
+    ('{"a": 1 "b": 2}', {'a': 1, 'b': 2}),
+    ('{"a": "line\nbreak", "b": "\\$5"}', {'a': 'line\nbreak', 'b': '$5'}),
+    ('{"items": [{"q": 1}, {"q": 2', {'items': [{'q': 1}, {'q': 2}]}),
+    ('{"a": "\\u00', {'a': '\\u00'}),
+    ('{"a": ', {'a': None}),
+])
+def test_common_llm_mistakes(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+def test_no_object():
+    with pytest.raises(ValueError):
+        repair_json('no json here')
+    assert parse_json('no json here') is None
+    assert parse_json('[1, 2]') is None
@@ -0,0 +1,39 @@
+import json
+
+import numpy as np
+
+from utils.layout_utils import OCRLayout
+
+# Out of reading order on purpose; blank words are dropped
+WORDS = [('Total', 0.5, (10, 50, 50, 62)), ('Invoice', 0.9, (10, 10, 70, 22)),
+         ('  ', 0.1, (0, 0, 1, 1)), ('$5.00', 0.75, (60, 51, 100, 63)),
+         ('42', 0.8, (80, 11, 100, 23))]
+
+
+def test_words_are_laid_out_in_reading_order():
+    layout = OCRLayout.from_words(WORDS, 200, 100)
+    assert layout.text == 'Invoice 42\nTotal $5.00'
+    assert [layout.word_text(i) for i in range(len(layout))] == ['Invoice', '42', 'Total', '$5.00']
+    assert layout.line_ids.tolist() == [0, 0, 1, 1]
+    assert layout.line_count == 2
+    assert layout.line_spans().tolist() == [[0, 10], [11, 22]]
+    assert layout.line_boxes().tolist() == [[10, 10, 100, 23], [10, 50, 100, 63]]
+    assert np.allclose(layout.line_confidences(), [0.85, 0.625])
+    assert layout.confidence() == np.float32([0.9, 0.8, 0.5, 0.75]).mean(dtype=np.float64)
+
+
+def test_to_dict_round_trip():
+    layout = OCRLayout.from_words(WORDS, 200, 100)
+    data = json.loads(json.dumps(layout.to_dict()))
+    restored = OCRLayout.from_dict(data)
+    assert restored.text == layout.text
+    assert (restored.width, restored.height) == (200, 100)
+    assert list(restored.words()) == list(layout.words())
+    assert restored.to_dict() == data
+
+
+def test_empty_layout():
+    layout = OCRLayout.from_words([], 10, 10)
+    assert len(layout) == 0 and layout.line_count == 0 and layout.confidence() == 0.0
+    restored = OCRLayout.from_dict(layout.to_dict())
+    assert restored.text == '' and restored.line_boxes().shape == (0, 4)
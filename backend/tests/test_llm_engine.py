@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services import llm_engine
+from services.llm_engine import LLMEngine
+from utils.prompt_utils import INVOICE_INSTRUCTION
+
+TEXTS = ['Invoice 12 ACME', 'Total: $5.00', 'Seller Foo\nBill to Bar', 'x']
+
+
+def _engine(path, max_new_tokens=24, **kwargs):
+    return LLMEngine(base_model=path, adapter='', device='cpu', quantize='none',
+                     max_new_tokens=max_new_tokens, **kwargs)
+
+
+@pytest.mark.parametrize('max_new_tokens', [0, -5, 25, 10 ** 6])
+def test_max_new_tokens_out_of_range_is_rejected(max_new_tokens):
+    with pytest.raises(ValueError):
+        LLMEngine(max_new_tokens=24).submit('x', max_new_tokens=max_new_tokens)
+
+
+def test_batched_generation_matches_unbatched(tiny_llm):
+    single = _engine(tiny_llm, max_batch_size=1)
+    expected = [single.generate(text, max_new_tokens=n)['text']
+                for text, n in zip(TEXTS, [24, 10, 17, 24])]
+    batched = _engine(tiny_llm, max_batch_size=4, window_ms=200)
+    batched.start()
+    # Requests of different lengths join and leave one running batch
+    with ThreadPoolExecutor(len(TEXTS)) as executor:
+        results = list(executor.map(
+            lambda args: batched.generate(args[0], max_new_tokens=args[1]),
+            zip(TEXTS, [24, 10, 17, 24])))
+    assert [r['text'] for r in results] == expected
+    assert [r['tokens'] for r in results][1] <= 10
+
+
+def test_prefix_caches_are_capped_per_adapter(tiny_llm):
+    engine = _engine(tiny_llm, max_new_tokens=2)
+    for i in range(llm_engine._MAX_PREFIXES + 3):
+        engine.generate('x', instruction=f"Instruction {i}")
+    prefixes = engine._adapters['']['prefixes']
+    assert len(prefixes) == llm_engine._MAX_PREFIXES
+    assert INVOICE_INSTRUCTION in prefixes
+    assert f"Instruction {llm_engine._MAX_PREFIXES + 2}" in prefixes
+
+
+def test_forced_schema_tokens_stay_within_the_budget(tiny_llm):
+    from utils.prompt_utils import INVOICE_SCHEMA
+    engine = _engine(tiny_llm)
+    # The schema decoder starts with a burst of forced structural text
+    for n in (1, 3, 7):
+        assert engine.generate('Invoice 1', max_new_tokens=n,
+                               schema=INVOICE_SCHEMA)['tokens'] == n
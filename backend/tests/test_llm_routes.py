@@ -0,0 +1,42 @@
+import pytest
+from flask import Flask
+
+from config import Config
+
+pytest.importorskip('requests')  # imported by services.llm_service
+from routes import llm_routes  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(llm_routes.llm_bp)
+    return app.test_client()
+
+
+@pytest.mark.parametrize('adapter', ['/etc', '../model_store/adapter/x/v1', 'x@..'])
+def test_request_adapter_must_be_a_store_ref(client, adapter):
+    response = client.post('/llmops', json={'text': 'Invoice 1', 'adapter': adapter})
+    assert response.status_code == 400
+
+
+def test_adapter_swap_is_disabled_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(Config, 'LLM_ADMIN_TOKEN', '')
+    assert client.post('/llmops/adapter', json={'adapter': ''}).status_code == 403
+
+
+def test_adapter_swap_needs_the_token(client, monkeypatch):
+    monkeypatch.setattr(Config, 'LLM_ADMIN_TOKEN', 'secret')
+    response = client.post('/llmops/adapter', json={'adapter': 'x'},
+                           headers={'Authorization': 'Bearer wrong'})
+    assert response.status_code == 401
+    response = client.post('/llmops/adapter', json={'adapter': '/tmp'},
+                           headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('max_new_tokens', [0, -1, 'many', Config.LLM_MAX_NEW_TOKENS + 1, 10 ** 9])
+def test_max_new_tokens_is_range_checked(client, max_new_tokens):
+    response = client.post('/llmops', json={'text': 'Invoice 1',
+                                            'max_new_tokens': max_new_tokens})
+    assert response.status_code == 400
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from utils.metrics_utils import edit_distance, normalized_edit_distance, word_tokenize
+
+
+def _reference_distance(a, b):
+    """Textbook O(len(a) * len(b)) Levenshtein DP."""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _random_pairs(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        alphabet = rng.choice(['ab', 'abcd', 'abcdefghij0123', 'aäб€😀 '])
+        a = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 150)))
+        if rng.random() < 0.5:
+            # Mostly shared text, as in predictions close to the truth
+            b = list(a)
+            for _ in range(rng.randint(0, 10)):
+                position = rng.randint(0, len(b))
+                b[position:position + rng.randint(0, 2)] = rng.choice(alphabet) * rng.randint(0, 2)
+            b = ''.join(b)
+        else:
+            b = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 150)))
+        yield a, b
+
+
+@pytest.mark.parametrize('a, b', [('', ''), ('', 'abc'), ('kitten', 'sitting'),
+                                  ('flaw', 'lawn'), ('a' * 70, 'a' * 69 + 'b'),
+                                  ('x' * 200, 'y' * 130)])
+def test_known_distances(a, b):
+    assert edit_distance(a, b) == _reference_distance(a, b)
+
+
+def test_matches_reference_dp():
+    for a, b in _random_pairs(400):
+        assert edit_distance(a, b) == _reference_distance(a, b), (a, b)
+
+
+def test_cutoff_is_exact_below_and_flags_above():
+    for a, b in _random_pairs(400, seed=1):
+        expected = _reference_distance(a, b)
+        for max_distance in (0, 1, 5, 20, 60):
+            result = edit_distance(a, b, max_distance)
+            if expected <= max_distance:
+                assert result == expected, (a, b, max_distance)
+            else:
+                assert result == max_distance + 1, (a, b, max_distance)
+
+
+def test_normalized_distance():
+    assert normalized_edit_distance('', '') == 0.0
+    assert normalized_edit_distance('abcd', 'abcf') == 0.25
+    assert normalized_edit_distance('abc', 'xyz') == 1.0
+    assert normalized_edit_distance('a' * 100, 'b' * 100, cutoff=0.1) > 0.1
+    assert normalized_edit_distance('a' * 100, 'a' * 95 + 'b' * 5, cutoff=0.1) == 0.05
+
+
+def test_cutoff_on_long_documents():
+    rng = random.Random(2)
+    a = ''.join(rng.choice('abcdefgh') for _ in range(800))
+    b = a[:300] + ''.join(rng.choice('abcdefgh') for _ in range(200)) + a[500:]
+    expected = _reference_distance(a, b)
+    assert edit_distance(a, b) == expected
+    assert edit_distance(a, b, expected) == expected
+    assert edit_distance(a, b, expected - 1) == expected
+
+
+def test_sentence_end_inside_text_is_split_off():
+    assert word_tokenize('{"notes": "Paid in full. Thank you"}') == [
+        '{', '``', 'notes', "''", ':', '``', 'Paid', 'in', 'full', '.',
+        'Thank', 'you', "''", '}']
+    # Abbreviations, initials and ellipses do not end a sentence
+    assert word_tokenize('ACME Corp. and J. Bach... ok') == [
+        'ACME', 'Corp.', 'and', 'J.', 'Bach', '...', 'ok']
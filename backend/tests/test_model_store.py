@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+from config import Config
+from services import model_store_service as store
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'LLM_STORE_DIR', str(tmp_path / 'store'))
+    return tmp_path
+
+
+def _adapter_dir(path):
+    os.makedirs(path)
+    with open(os.path.join(path, 'adapter_config.json'), 'w') as f:
+        json.dump({'peft_type': 'LORA', 'r': 4, 'base_model_name_or_path': 'tiny'}, f)
+    with open(os.path.join(path, 'adapter_model.safetensors'), 'wb') as f:
+        f.write(b'weights')
+    return path
+
+
+@pytest.mark.parametrize('ref', [
+    '../etc', 'a/../../b', '..', 'name@..', 'name@../v1', '/abs/path',
+    'a/b/c', '.hidden', 'name@v1@v2', '', 'a--b', 'org/a--b', 'name@v--1',
+])
+def test_invalid_refs_are_rejected(ref):
+    assert not store.is_store_ref(ref)
+    with pytest.raises(ValueError):
+        store.artifact_path('adapter', ref)
+
+
+def test_import_rejects_path_like_names_and_versions(store_dir):
+    source = _adapter_dir(str(store_dir / 'checkpoint'))
+    with pytest.raises(ValueError):
+        store.import_artifact('adapter', '../outside', source)
+    with pytest.raises(ValueError):
+        store.import_artifact('adapter', 'name', source, version='..')
+
+
+def test_valid_refs():
+    assert store.parse_ref('org/model@v2') == ('org/model', 'v2')
+    assert store.parse_ref('invoices') == ('invoices', None)
+    assert store.parse_ref('org-x/model-v1-') == ('org-x/model-v1-', None)
+
+
+def test_directories_only_with_allow_path(store_dir):
+    source = _adapter_dir(str(store_dir / 'checkpoint'))
+    with pytest.raises(ValueError):
+        store.locate_adapter(source)
+    assert store.locate_adapter(source, allow_path=True) == os.path.abspath(source)
+
+
+def test_store_refs_resolve_to_verified_versions(store_dir):
+    source = _adapter_dir(str(store_dir / 'checkpoint'))
+    store.import_artifact('adapter', 'vendor/a', source)
+    store.import_artifact('adapter', 'vendor/a', source)
+    latest = store.locate_adapter('vendor/a')
+    assert latest.endswith(os.path.join('vendor--a', 'v2'))
+    assert store.locate_adapter('vendor/a@v1').endswith('v1')
+    assert store.resolve_adapter('vendor/a@v1') == store.locate_adapter('vendor/a@v1')
+    with open(os.path.join(latest, 'adapter_model.safetensors'), 'wb') as f:
+        f.write(b'WEIGHTS')
+    with pytest.raises(OSError):
+        store.resolve_adapter('vendor/a')
+    with pytest.raises(ValueError):
+        store.locate_adapter('vendor/b')
@@ -0,0 +1,137 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from services import ocr_batch_service
+from services.ocr_engine_registry import get_engine
+
+
+class _RecordingPool:
+    processes = 3
+
+    def __init__(self):
+        self.batches = []
+
+    def submit_batch(self, model, images, method='run_batch'):
+        self.batches.append((method, list(images)))
+        future = Future()
+        future.set_result([(f"page {image}", 1.0) for image in images])
+        return future
+
+
+def test_non_batching_engine_pages_are_spread_over_workers(monkeypatch):
+    pool = _RecordingPool()
+    monkeypatch.setattr(ocr_batch_service, 'get_worker_pool', lambda: pool)
+    model = 'tesseract'
+    assert not get_engine(model).supports_batching
+    results = ocr_batch_service.batch_ocr(model, list(range(7)))
+    assert results == [(f"page {i}", 1.0) for i in range(7)]
+    assert [images for _, images in pool.batches] == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def _recording_dispatch(batches, fail=False):
+    def dispatch(images):
+        batches.append(list(images))
+        future = Future()
+        if fail:
+            future.set_exception(RuntimeError('engine crashed'))
+        else:
+            future.set_result([(f"page {image}", 0.5) for image in images])
+        return future
+    return dispatch
+
+
+def test_scheduler_groups_pages_up_to_the_batch_size():
+    batches = []
+    scheduler = ocr_batch_service.MicroBatchScheduler(
+        'test', _recording_dispatch(batches), max_batch_size=3, window_ms=200)
+    futures = [scheduler.submit(i) for i in range(5)]
+    assert [f.result(timeout=5) for f in futures] == [(f"page {i}", 0.5) for i in range(5)]
+    assert batches == [[0, 1, 2], [3, 4]]
+
+
+def test_scheduler_fails_every_page_of_a_failed_batch():
+    scheduler = ocr_batch_service.MicroBatchScheduler(
+        'test-fail', _recording_dispatch([], fail=True), max_batch_size=4, window_ms=50)
+    futures = [scheduler.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+
+
+def test_scheduler_skips_cancelled_pages():
+    batches = []
+    scheduler = ocr_batch_service.MicroBatchScheduler(
+        'test-cancel', _recording_dispatch(batches), max_batch_size=4, window_ms=200)
+    futures = [scheduler.submit(i) for i in range(3)]
+    assert futures[1].cancel()
+    assert futures[2].result(timeout=5) == ('page 2', 0.5)
+    assert batches == [[0, 2]]
+
+
+def test_scheduler_survives_a_dispatch_that_raises():
+    calls = []
+
+    def dispatch(images):
+        calls.append(list(images))
+        if len(calls) == 1:
+            raise RuntimeError('cannot schedule new futures after shutdown')
+        return _recording_dispatch([])(images)
+    scheduler = ocr_batch_service.MicroBatchScheduler(
+        'test-raise', dispatch, max_batch_size=4, window_ms=20)
+    with pytest.raises(RuntimeError):
+        scheduler.submit(0).result(timeout=5)
+    assert scheduler.submit(1).result(timeout=5) == ('page 1', 0.5)
+
+
+def test_scheduler_fails_pages_missing_from_a_short_result():
+    def dispatch(images):
+        future = Future()
+        future.set_result([('only one', 0.5)])
+        return future
+    scheduler = ocr_batch_service.MicroBatchScheduler(
+        'test-short', dispatch, max_batch_size=4, window_ms=200)
+    futures = [scheduler.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+
+
+def test_tiles_of_non_batching_engines_run_in_parallel(monkeypatch):
+    monkeypatch.setattr(ocr_batch_service, 'get_worker_pool', lambda: None)
+    engine = get_engine('tesseract')
+    barrier = threading.Barrier(engine.max_concurrency, timeout=5)
+
+    def words(image):
+        # Blocks until max_concurrency tiles are being OCRed at once
+        barrier.wait()
+        return [(f"tile {image}", 0.9, (0, 0, 1, 1))]
+    monkeypatch.setattr(engine, 'words', words)
+    tiles = list(range(engine.max_concurrency * 2))
+    results = ocr_batch_service.run_words_batch('tesseract', tiles)
+    assert results == [[(f"tile {i}", 0.9, (0, 0, 1, 1))] for i in tiles]
+
+
+def test_tiles_of_all_pages_share_one_engine_call(monkeypatch):
+    import numpy as np
+    calls = []
+
+    def run_words_batch(model, images):
+        calls.append(len(images))
+        return [[('word', 0.9, (0, 0, 10, 10))] for _ in images]
+
+    def submit_ocr(model, image):
+        future = Future()
+        future.set_result(('small page', 0.8))
+        return future
+    monkeypatch.setattr(ocr_batch_service, 'run_words_batch', run_words_batch)
+    monkeypatch.setattr(ocr_batch_service, 'submit_ocr', submit_ocr)
+    monkeypatch.setattr(ocr_batch_service, 'get_worker_pool', lambda: None)
+    large = np.zeros((300, 300, 3), dtype=np.uint8)
+    small = np.zeros((50, 50, 3), dtype=np.uint8)
+    results = ocr_batch_service.batch_ocr(
+        'doctr', [large, small, large], {'tile_size': 100, 'overlap': 0})
+    assert calls == [18]  # 9 tiles per large page, in one call
+    assert results[1] == ('small page', 0.8)
+    assert results[0] == results[2] and results[0][0].startswith('word')
@@ -0,0 +1,38 @@
+import os
+
+from services.ocr_cache_service import OCRResultCache
+
+
+def test_disk_tier_round_trip(tmp_path):
+    cache = OCRResultCache(10, 1 << 20, str(tmp_path))
+    cache.put('ab' * 32, ('text', 0.9))
+    fresh = OCRResultCache(10, 1 << 20, str(tmp_path))
+    assert fresh.get('ab' * 32) == ('text', 0.9)
+    assert fresh.stats()['disk_hits'] == 1
+
+
+def test_corrupt_disk_entry_is_a_miss_and_removed(tmp_path):
+    key = 'cd' * 32
+    cache = OCRResultCache(10, 1 << 20, str(tmp_path))
+    path = tmp_path / key[:2] / (key + '.json')
+    path.parent.mkdir()
+    path.write_text('["trunc')
+    assert cache.get(key) is None
+    assert cache.stats()['misses'] == 1
+    assert not path.exists()
+    cache.put(key, ('text', 0.5))
+    assert OCRResultCache(10, 1 << 20, str(tmp_path)).get(key) == ('text', 0.5)
+
+
+def test_disk_write_failure_keeps_result_in_memory(tmp_path, monkeypatch, capsys):
+    cache = OCRResultCache(10, 1 << 20, str(tmp_path))
+
+    def _fail(src, dst):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(os, 'replace', _fail)
+    cache.put('ef' * 32, ('text', 0.7))
+    assert cache.get('ef' * 32) == ('text', 0.7)
+    assert 'Could not write OCR cache file' in capsys.readouterr().out
+    assert not list(tmp_path.rglob('*.tmp'))
+    assert not list(tmp_path.rglob('*.json'))
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from services import ocr_cascade_service
+from services.ocr_cascade_service import cascade_words
+
+# Two lines read by the fast engine: a confident one and a doubtful one
+FAST_WORDS = [('Invoice', 0.95, (10, 10, 70, 30)), ('42', 0.9, (80, 10, 100, 30)),
+              ('T0tal', 0.3, (10, 60, 60, 80)), ('$5', 0.5, (70, 60, 95, 80))]
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    calls = []
+
+    def run_words_batch(model, images):
+        calls.append((model, [image.shape for image in images]))
+        if model == 'tesseract':
+            return [list(FAST_WORDS) if images[0].shape[0] > 50 else []]
+        # The heavy engine reads each crop as one word at its origin
+        return [[('Total $5', 0.99, (2, 2, 60, 18))] for _ in images]
+    monkeypatch.setattr(ocr_cascade_service, 'run_words_batch', run_words_batch)
+    return calls
+
+
+def test_only_lines_below_the_threshold_are_escalated(engines):
+    image = np.zeros((120, 200, 3), dtype=np.uint8)
+    words, details = cascade_words(image, 'tesseract', 'doctr', threshold=0.8, padding=0.2)
+    assert details['escalated_lines'] == 1 and not details['escalated_page']
+    assert [model for model, _ in engines] == ['tesseract', 'doctr']
+    # One crop around the low line only (with its margin)
+    (height, width, _), = engines[1][1]
+    assert height < 40 and width < 120
+    assert [text for text, _, _ in words] == ['Invoice', '42', 'Total $5']
+    # Mapped back to page coordinates and clipped to the line's box
+    assert words[2][2] == (10, 60, 66, 74)
+    assert details['replaced_lines'] == 1
+
+
+def test_heavy_reading_is_kept_only_inside_the_line_and_if_more_confident(monkeypatch):
+    heavy_words = [[('Total', 0.99, (4, 0, 50, 3)),   # a piece of the line above
+                    ('T0tal', 0.2, (4, 6, 50, 22))],  # less sure than tesseract
+                   [('rest', 0.99, (4, 6, 50, 22))]]
+
+    def run_words_batch(model, images):
+        if model == 'tesseract':
+            return [[('Invoice', 0.3, (10, 10, 70, 30)),
+                     ('T0tal', 0.5, (10, 60, 60, 80))]]
+        return heavy_words
+    monkeypatch.setattr(ocr_cascade_service, 'run_words_batch', run_words_batch)
+    image = np.zeros((120, 200, 3), dtype=np.uint8)
+    words, details = cascade_words(image, 'tesseract', 'doctr', threshold=0.8, padding=0.2)
+    assert details['escalated_lines'] == 2 and details['replaced_lines'] == 1
+    assert [(text, confidence) for text, confidence, _ in words] == [
+        ('Invoice', 0.3), ('rest', 0.99)]
+
+
+def test_confident_page_is_not_escalated(engines):
+    image = np.zeros((120, 200, 3), dtype=np.uint8)
+    words, details = cascade_words(image, 'tesseract', 'doctr', threshold=0.2)
+    assert details['escalated_lines'] == 0
+    assert [model for model, _ in engines] == ['tesseract']
+    assert words == FAST_WORDS
+
+
+def test_page_without_text_is_escalated_whole(engines):
+    image = np.zeros((40, 200, 3), dtype=np.uint8)
+    words, details = cascade_words(image, 'tesseract', 'doctr', threshold=0.8)
+    assert details['escalated_page']
+    assert engines[1] == ('doctr', [(40, 200, 3)])
+    assert [text for text, _, _ in words] == ['Total $5']
+
+
+def test_cascade_needs_two_different_engines():
+    with pytest.raises(ValueError):
+        ocr_cascade_service.resolve_cascade_engines('doctr', 'doctr')
@@ -0,0 +1,78 @@
+import threading
+
+import numpy as np
+import pytest
+
+from services import ocr_ensemble_service
+from services.ocr_ensemble_service import ensemble_words, fuse_words
+
+
+def test_majority_reading_wins_each_aligned_word():
+    words = fuse_words({
+        'a': [('Invoice', 0.9, (0, 0, 50, 10)), ('42', 0.6, (60, 0, 80, 10))],
+        'b': [('lnvoice', 0.95, (1, 0, 51, 10)), ('42', 0.7, (61, 1, 80, 11))],
+        'c': [('Invoice', 0.8, (0, 1, 49, 11))],
+    })
+    by_text = {text: (confidence, box) for text, confidence, box in words}
+    assert sorted(by_text) == ['42', 'Invoice']
+    assert by_text['Invoice'][0] == pytest.approx((0.9 + 0.8) / 3)
+    assert by_text['42'][0] == pytest.approx((0.6 + 0.7) / 3)
+
+
+def test_words_without_overlap_stay_separate():
+    words = fuse_words({'a': [('left', 0.9, (0, 0, 10, 10)), ('', 0.9, (0, 0, 5, 5))],
+                        'b': [('right', 0.9, (100, 0, 110, 10))]})
+    assert sorted((text, confidence) for text, confidence, _ in words) == [
+        ('left', 0.45), ('right', 0.45)]
+
+
+def test_confident_engine_exits_early(monkeypatch):
+    readings = {'doctr': [('Total', 0.99, (0, 0, 10, 10))],
+                'easy': [('Tota1', 0.4, (0, 0, 10, 10))]}
+    slow = threading.Event()
+
+    def engine_words(model, image):
+        if model == 'easy':
+            slow.wait(5)
+        return readings[model]
+    monkeypatch.setattr(ocr_ensemble_service, '_engine_words', engine_words)
+    image = np.zeros((20, 20, 3), dtype=np.uint8)
+    try:
+        words, details = ensemble_words(image, ['doctr', 'easy'],
+                                        early_exit_confidence=0.9)
+    finally:
+        slow.set()
+    assert details['early_exit'] == 'doctr'
+    assert words == readings['doctr']
+    words, details = ensemble_words(image, ['doctr', 'easy'], early_exit_confidence=0)
+    assert details['early_exit'] is None
+    assert words == [('Total', pytest.approx(0.99 / 2), (0, 0, 10, 10))]
+
+
+def test_ensemble_needs_two_engines_with_boxes():
+    with pytest.raises(ValueError):
+        ocr_ensemble_service.resolve_ensemble_engines(['doctr'])
+    with pytest.raises(ValueError):
+        ocr_ensemble_service.resolve_ensemble_engines(['doctr', 'nope'])
+
+
+def test_failing_engine_is_dropped_and_reported(monkeypatch):
+    readings = {'doctr': [('Total', 0.8, (0, 0, 10, 10))],
+                'easy': [('Total', 0.6, (0, 0, 10, 10))]}
+    failing = {'paddle'}
+
+    def engine_words(model, image):
+        if model in failing:
+            raise RuntimeError('model crashed')
+        return readings[model]
+    monkeypatch.setattr(ocr_ensemble_service, '_engine_words', engine_words)
+    monkeypatch.setattr(ocr_ensemble_service, 'resolve_ensemble_engines', list)
+    image = np.zeros((20, 20, 3), dtype=np.uint8)
+    words, details = ensemble_words(image, ['doctr', 'paddle', 'easy'],
+                                    early_exit_confidence=0)
+    assert details['failed'] == ['paddle']
+    assert details['engines']['paddle'] == {'error': 'model crashed'}
+    assert words == [('Total', pytest.approx(0.7), (0, 0, 10, 10))]
+    failing.add('easy')
+    with pytest.raises(RuntimeError):
+        ensemble_words(image, ['paddle', 'easy'], early_exit_confidence=0)
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from config import Config
+from services import ocr_cache_service, ocr_job_service
+
+
+def _wait_for(job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = ocr_job_service.get_job(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    # Runs jobs without decoding images or touching the OCR cache
+    release = threading.Event()
+    release.set()
+
+    def run_ocr(model, image, tiling=None):
+        release.wait(5)
+        if image == b'bad':
+            raise ValueError('Could not decode image')
+        return (f"{model}:{image.decode()}", 0.75)
+    monkeypatch.setattr(ocr_job_service, 'prepare_image', lambda data, pipeline: (data, []))
+    monkeypatch.setattr(ocr_job_service, 'run_ocr', run_ocr)
+    monkeypatch.setattr(ocr_job_service, 'cached_ocr',
+                        lambda model, data, compute, params=None: compute())
+    return release
+
+
+def test_job_runs_and_reports_its_result(fake_ocr):
+    job = ocr_job_service.submit_job('tesseract', b'page')
+    assert job['status'] == 'queued' and 'result' not in job
+    done = _wait_for(job['id'])
+    assert done['status'] == 'done'
+    assert done['result'] == {'text': 'tesseract:page', 'confidence': 0.75}
+
+
+def test_failed_job_reports_the_error(fake_ocr):
+    failed = _wait_for(ocr_job_service.submit_job('tesseract', b'bad')['id'])
+    assert failed['status'] == 'failed'
+    assert failed['error'] == 'Could not decode image'
+
+
+def test_queue_limit_and_expiry(fake_ocr, monkeypatch):
+    monkeypatch.setattr(Config, 'OCR_JOB_MAX_PENDING', 2)
+    fake_ocr.clear()
+    jobs = [ocr_job_service.submit_job('tesseract', b'page') for _ in range(2)]
+    with pytest.raises(ocr_job_service.JobQueueFullError):
+        ocr_job_service.submit_job('tesseract', b'page')
+    fake_ocr.set()
+    for job in jobs:
+        _wait_for(job['id'])
+    monkeypatch.setattr(Config, 'OCR_JOB_TTL_S', 0)
+    time.sleep(0.01)
+    # Polling alone sweeps expired jobs
+    assert ocr_job_service.get_job('unknown') is None
+    assert all(job['id'] not in ocr_job_service._jobs for job in jobs)
+    assert ocr_job_service.get_job('unknown') is None
+
+
+def test_job_uses_the_same_cache_params_as_sync_requests(fake_ocr, monkeypatch):
+    seen = []
+
+    def cached_ocr(model, data, compute, params=None):
+        seen.append(params)
+        return compute()
+    monkeypatch.setattr(ocr_job_service, 'cached_ocr', cached_ocr)
+    pipeline = [{'name': 'grayscale'}]
+    tiling = {'tile_size': 1024, 'overlap': 96}
+    _wait_for(ocr_job_service.submit_job('tesseract', b'page', pipeline, tiling)['id'])
+    assert seen == [ocr_cache_service.cache_params(pipeline, tiling)]
+
+
+def test_structured_job_returns_the_layout(fake_ocr, monkeypatch):
+    class _Layout:
+        text = 'layout text'
+
+        def confidence(self):
+            return 0.5
+
+        def to_dict(self):
+            return {'words': ['layout', 'text']}
+    monkeypatch.setattr(ocr_job_service, 'run_ocr_layout',
+                        lambda model, image, tiling=None: _Layout())
+    job = ocr_job_service.submit_job('doctr', b'page', structured=True)
+    assert _wait_for(job['id'])['result'] == {
+        'text': 'layout text', 'confidence': 0.5,
+        'layout': {'words': ['layout', 'text']}}
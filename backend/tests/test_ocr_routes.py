@@ -0,0 +1,145 @@
+import base64
+import json
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from config import Config
+
+pytest.importorskip('requests')  # imported by services.llm_service via routes
+from routes import ocr_routes  # noqa: E402
+from services import ocr_cache_service  # noqa: E402
+
+IMAGE = base64.b64encode(b'not decoded before the options are checked').decode()
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(ocr_routes.ocr_bp)
+    return app.test_client()
+
+
+@pytest.fixture
+def cache_params(monkeypatch):
+    # Records the cache parameters instead of running OCR
+    calls = []
+
+    def cached_ocr(model, image_bytes, compute, params=None, cacheable=None):
+        calls.append(ocr_cache_service.make_cache_key(image_bytes, model, params))
+        return ('', 0.0)
+    monkeypatch.setattr(ocr_routes, 'cached_ocr', cached_ocr)
+    return calls
+
+
+@pytest.mark.parametrize('tiling', [{'tile_size': 0}, {'tile_size': -1},
+                                    {'overlap': -1}, {'tile_size': 64, 'overlap': 33},
+                                    {'tile_size': 'big'}])
+def test_bad_tiling_is_rejected(client, tiling):
+    response = client.post('/ocr', json={'image': IMAGE, 'model': 'doctr',
+                                         'tiling': tiling})
+    assert response.status_code == 400
+
+
+def test_default_tiling_shares_the_explicit_cache_key(client, cache_params, monkeypatch):
+    monkeypatch.setattr(Config, 'OCR_TILE_OVERLAP', 96)
+    for tiling in [True, {}, {'tile_size': 1024, 'overlap': 96}, {'overlap': 32}]:
+        assert client.post('/ocr', json={'image': IMAGE, 'model': 'doctr',
+                                         'tiling': tiling}).status_code == 200
+    assert cache_params[0] == cache_params[1] == cache_params[2] != cache_params[3]
+
+
+def test_cache_key_depends_on_the_downscale_limit(client, cache_params, monkeypatch):
+    ocr_cache_service.engine_fingerprint.cache_clear()
+    client.post('/ocr', json={'image': IMAGE, 'model': 'tesseract'})
+    monkeypatch.setattr(Config, 'OCR_MAX_IMAGE_SIDE', 1000)
+    ocr_cache_service.engine_fingerprint.cache_clear()
+    client.post('/ocr', json={'image': IMAGE, 'model': 'tesseract'})
+    ocr_cache_service.engine_fingerprint.cache_clear()
+    assert cache_params[0] != cache_params[1]
+
+
+@pytest.mark.parametrize('image', ['aGVsbG8', 'aGVs*bG8=', 'data:image/png;base64,aGVsbG8=', 5])
+def test_invalid_base64_is_rejected(client, cache_params, image):
+    response = client.post('/ocr', json={'image': image, 'model': 'tesseract'})
+    assert response.status_code == 400
+    assert cache_params == []
+    response = client.post('/ocr/batch', json={'images': [IMAGE, image],
+                                               'model': 'tesseract'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('path', ['/ocr', '/ocr/batch'])
+@pytest.mark.parametrize('body', [[IMAGE], 'image', 5])
+def test_json_body_must_be_an_object(client, cache_params, path, body):
+    response = client.post(path, json=body)
+    assert response.status_code == 400
+    assert cache_params == []
+
+
+@pytest.mark.parametrize('model', ['ensemble', 'cascade'])
+def test_jobs_reject_composite_models(client, model, monkeypatch):
+    monkeypatch.setattr(ocr_routes, 'submit_job', None)
+    response = client.post('/ocr/jobs', json={'image': IMAGE, 'model': model})
+    assert response.status_code == 400
+    assert 'only served by POST /ocr' in response.get_json()['error']
+
+
+def test_bad_preprocessing_params_are_rejected(client, cache_params):
+    for stage in [{'name': 'resize', 'scale_percent': '200x'},
+                  {'name': 'resize', 'scale_percent': 0}]:
+        response = client.post('/ocr', json={'image': IMAGE, 'model': 'tesseract',
+                                              'preprocess': [stage]})
+        assert response.status_code == 400
+    assert cache_params == []
+
+
+def _document(client, data, **query):
+    return client.post('/ocr/document', data=data, query_string={'model': 'tesseract', **query},
+                       content_type='application/octet-stream')
+
+
+@pytest.mark.parametrize('dpi', ['-72', '10', '10000', 'high'])
+def test_document_dpi_is_bounded(client, dpi):
+    assert _document(client, b'%PDF-1.7', dpi=dpi).status_code == 400
+
+
+def test_corrupt_document_is_rejected_before_streaming(client):
+    response = _document(client, b'II*\x00' + b'\x00' * 20)
+    assert response.status_code == 400
+    assert 'TIFF' in response.get_json()['error']
+
+
+def test_document_stream_ends_with_an_error_event(client, monkeypatch):
+    def pages(*args, **kwargs):
+        raise OSError('image file is truncated')
+        yield
+    monkeypatch.setattr(ocr_routes, 'ocr_pages', pages)
+    monkeypatch.setattr(ocr_routes, 'iter_document_pages', lambda data, dpi: iter([]))
+    response = _document(client, b'not used')
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines == [{'error': 'image file is truncated'}]
+
+
+def test_degraded_ensemble_result_is_not_cached(client, monkeypatch):
+    cache = ocr_cache_service.OCRResultCache(10, 1 << 20)
+    monkeypatch.setattr(ocr_cache_service, 'ocr_cache', cache)
+    monkeypatch.setattr(Config, 'OCR_CACHE_ENABLED', True)
+    monkeypatch.setattr(ocr_routes, 'resolve_ensemble_engines', list)
+    monkeypatch.setattr(ocr_routes, 'prepare_image',
+                        lambda data, pipeline: (np.zeros((20, 20, 3), np.uint8), []))
+    runs = []
+
+    def ensemble_words(image, engines, threshold):
+        failed = ['easy'] if not runs else []
+        runs.append(failed)
+        return ([('Total', 0.9, (0, 0, 10, 10))],
+                {'engines': {}, 'early_exit': None, 'failed': failed})
+    monkeypatch.setattr(ocr_routes, 'ensemble_words', ensemble_words)
+    body = {'image': IMAGE, 'model': 'ensemble', 'engines': ['doctr', 'easy']}
+    for _ in range(3):
+        assert client.post('/ocr', json=body).status_code == 200
+    assert runs == [['easy'], []]
+    assert cache.stats()['entries'] == 1
@@ -0,0 +1,13 @@
+import pytest
+
+from services.ocr_service import ImageDecodeError, decode_base64
+
+
+def test_decode_base64_accepts_wrapped_lines():
+    assert decode_base64('aGVs\nbG8=') == b'hello'
+
+
+@pytest.mark.parametrize('data', ['aGVsbG8', 'aGVs*bG8=', 'data:image/png;base64,aGVsbG8=', None])
+def test_decode_base64_rejects_invalid_data(data):
+    with pytest.raises(ImageDecodeError):
+        decode_base64(data)
@@ -0,0 +1,30 @@
+from utils.ocr_text_utils import compact_ocr_text, split_into_chunks
+
+
+def test_keeps_dates_and_quantities_that_look_like_page_numbers():
+    text = 'Invoice Date\n10/2024\nQty\n1 of 2\nTotal\n12 / 31\nPage 2'
+    assert compact_ocr_text(text) == \
+        'Invoice Date\n10/2024\nQty\n1 of 2\nTotal\n12 / 31'
+
+
+def test_drops_page_lines_borders_and_repeated_headers():
+    page1 = 'ACME Corp\nInvoice 12\n========\nBolt ...... 2.00\nNut 1.00\nPage 1 of 2'
+    page2 = 'ACME Corp\nInvoice 12\nGear 5.00\nTotal 8.00\npage 2 of 2'
+    assert compact_ocr_text(page1 + '\f' + page2) == \
+        'ACME Corp\nInvoice 12\nBolt 2.00\nNut 1.00\nGear 5.00\nTotal 8.00'
+
+
+def test_repeated_item_rows_are_kept():
+    text = 'Bolt 2.00\nBolt 2.00\nBolt 2.00\nBolt 2.00\nBolt 2.00\nBolt 2.00\nBolt 2.00'
+    assert compact_ocr_text(text) == text
+
+
+def test_chunks_respect_the_budget_and_keep_lines_whole():
+    text = '\n'.join(f"row {i} with some words" for i in range(20))
+
+    def count(lines):
+        return [len(line.split()) for line in lines]
+
+    chunks = split_into_chunks(text, count, 12)
+    assert '\n'.join(chunks) == text
+    assert all(sum(count(c.split('\n'))) + c.count('\n') <= 12 for c in chunks)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from config import Config
+from services.ocr_engine_registry import get_engine
+from services.ocr_tiling_service import make_tiles, merge_tile_words, resolve_tiling
+
+
+def test_tiles_cover_the_page_and_pad_the_border():
+    image = np.zeros((250, 400), dtype=np.uint8)
+    tiles = make_tiles(image, 200, 50)
+    assert [(x0, y0) for x0, y0, _ in tiles] == [(0, 0), (150, 0), (200, 0),
+                                                (0, 50), (150, 50), (200, 50)]
+    assert all(tile.shape == (200, 200) for _, _, tile in tiles)
+    small = make_tiles(np.zeros((50, 60), dtype=np.uint8), 100, 10)
+    assert len(small) == 1 and small[0][2][60:, :].min() == 255
+
+
+def test_overlap_duplicates_keep_the_copy_away_from_the_cut():
+    tiles = [(0, 0, None), (150, 0, None)]
+    # "word" straddles x=200, the right edge of the first tile
+    tile_words = [[('left', 0.9, (10, 10, 40, 20)), ('wor', 0.99, (170, 10, 199, 20))],
+                  [('word', 0.8, (20, 10, 60, 20)), ('right', 0.9, (200, 10, 240, 20))]]
+    words = merge_tile_words(tiles, tile_words, 400, 200, 200)
+    assert sorted(text for text, _, _ in words) == ['left', 'right', 'word']
+    assert ('word', 0.8, (170, 10, 210, 20)) in words
+
+
+def test_words_in_the_padding_are_dropped():
+    words = merge_tile_words([(0, 0, None)], [[('ghost', 0.9, (120, 5, 150, 15))]],
+                             100, 100, 200)
+    assert words == []
+
+
+def test_resolve_tiling_defaults(monkeypatch):
+    monkeypatch.setattr(Config, 'OCR_TILE_OVERLAP', 96)
+    engine = get_engine('doctr')
+    assert resolve_tiling(engine) == {'tile_size': 1024, 'overlap': 96}
+    assert resolve_tiling(engine, 100) == {'tile_size': 100, 'overlap': 50}
+    assert resolve_tiling(engine, 100, 50) == {'tile_size': 100, 'overlap': 50}
+    assert resolve_tiling(get_engine('tesseract'), overlap=0) == {'tile_size': 1024,
+                                                                  'overlap': 0}
+
+
+@pytest.mark.parametrize('tile_size, overlap', [(0, 0), (-5, 0), (100, -1), (100, 51), (100, 100)])
+def test_resolve_tiling_rejects_bad_values(tile_size, overlap):
+    with pytest.raises(ValueError):
+        resolve_tiling(get_engine('doctr'), tile_size, overlap)
@@ -0,0 +1,119 @@
+import threading
+import time
+
+from services import warmup_service
+from services.ocr_worker_pool import OCRWorkerPool
+
+
+class _FakePool:
+    def __init__(self, workers):
+        self.workers = workers
+
+    def wait_ready(self, timeout=None):
+        return self.workers
+
+
+def test_engine_ready_only_when_every_worker_warmed_it():
+    pool = _FakePool({
+        1: {'easy': {'seconds': 1.5}, 'paddle': {'seconds': 2.0}},
+        2: {'easy': {'seconds': 2.5}, 'paddle': {'error': 'boom'}},
+        3: {'easy': {'seconds': 0.5}},
+    })
+    failed = warmup_service._warm_up_pool(pool, ['easy', 'paddle'])
+    engines = warmup_service.get_readiness()['engines']
+    assert failed
+    assert engines['easy'] == {'status': 'ready', 'seconds': 2.5, 'workers': 3}
+    assert engines['paddle'] == {'status': 'failed', 'error': 'boom'}
+
+
+def test_missing_engine_on_one_worker_is_a_failure():
+    pool = _FakePool({1: {'easy': {'seconds': 1.0}}, 2: {}})
+    assert warmup_service._warm_up_pool(pool, ['easy'])
+    assert warmup_service.get_readiness()['engines']['easy']['status'] == 'failed'
+
+
+def test_every_worker_process_reports_ready():
+    pool = OCRWorkerPool(2, ['no-such-engine'])
+    try:
+        workers = pool.wait_ready(timeout=60)
+    finally:
+        pool.shutdown()
+    assert len(workers) == 2
+    assert all(status == {'no-such-engine': {'error': 'Unknown model: no-such-engine'}}
+               for status in workers.values())
+
+
+def test_pool_readiness_without_listed_engines(monkeypatch):
+    released = threading.Event()
+
+    class _SlowPool(_FakePool):
+        preload = ['easy']
+
+        def wait_ready(self, timeout=None):
+            released.wait(5)
+            return self.workers
+
+    pool = _SlowPool({1: {'easy': {'seconds': 1.0}}})
+    monkeypatch.setattr(warmup_service, 'get_worker_pool', lambda: pool)
+    monkeypatch.setitem(warmup_service._state, 'status', 'starting')
+    warmup_service.start_warmup([])
+    assert warmup_service.get_readiness()['status'] == 'starting'
+    released.set()
+    for _ in range(100):
+        if warmup_service.get_readiness()['status'] != 'starting':
+            break
+        time.sleep(0.05)
+    readiness = warmup_service.get_readiness()
+    assert readiness['status'] == 'ready'
+    assert readiness['engines']['easy']['status'] == 'ready'
+
+
+def test_ready_immediately_without_pool_or_engines(monkeypatch):
+    monkeypatch.setattr(warmup_service, 'get_worker_pool', lambda: None)
+    monkeypatch.setitem(warmup_service._state, 'status', 'starting')
+    warmup_service.start_warmup([])
+    assert warmup_service.get_readiness()['status'] == 'ready'
+
+
+def test_stuck_worker_warm_up_times_out(monkeypatch):
+    class _StuckPool(_FakePool):
+        def wait_ready(self, timeout=None):
+            assert timeout == 0.5
+            raise TimeoutError("1/2 OCR workers ready")
+
+    monkeypatch.setattr(warmup_service.Config, 'OCR_WORKER_READY_TIMEOUT_S', 0.5)
+    assert warmup_service._warm_up_pool(_StuckPool({}), ['easy'])
+    engines = warmup_service.get_readiness()['engines']
+    assert engines['easy'] == {
+        'status': 'failed', 'error': 'Worker warm-up timed out: 1/2 OCR workers ready'}
+
+
+def test_restart_drops_ready_reports_of_dead_workers():
+    pool = OCRWorkerPool(1, [])
+    try:
+        pool.wait_ready(timeout=60)
+        # A late report from a worker of the old pool
+        pool._ready.put((-1, {}))
+        pool._restart(pool._executor)
+        workers = pool.wait_ready(timeout=60)
+    finally:
+        pool.shutdown()
+    assert list(workers) != [-1]
+    assert len(workers) == 1
+
+
+def test_tesseract_only_pool_reports_ready(monkeypatch):
+    from config import Config
+    from services import ocr_worker_pool
+    monkeypatch.setattr(Config, 'OCR_ENABLED_ENGINES', ['tesseract'])
+    monkeypatch.setattr(Config, 'OCR_WORKER_PROCESSES', 1)
+    monkeypatch.setattr(Config, 'OCR_PRELOAD_ENGINES', [])
+    monkeypatch.setattr(ocr_worker_pool, '_pool', None)
+    monkeypatch.setitem(warmup_service._state, 'status', 'starting')
+    pool = ocr_worker_pool.get_worker_pool()
+    try:
+        assert pool.preload == []
+        warmup_service.start_warmup([], background=False)
+    finally:
+        pool.shutdown()
+    assert warmup_service.get_readiness()['status'] == 'ready'
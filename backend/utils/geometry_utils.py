@@ -0,0 +1,103 @@
+import numpy as np
+
+# Words are (text, confidence, (x0, y0, x1, y1)) tuples, as returned by
+# OCREngine.words().
+
+
+def box_area(box):
+    return max(0.0, box[2] - box[0]) * max(0.0, box[3] - box[1])
+
+
+def box_intersection(a, b):
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0.0
+
+
+def box_iou(a, b):
+    inter = box_intersection(a, b)
+    if inter == 0:
+        return 0.0
+    return inter / (box_area(a) + box_area(b) - inter)
+
+
+def box_overlap_ratio(a, b):
+    """Intersection over the smaller box; 1.0 when one contains the other."""
+    inter = box_intersection(a, b)
+    if inter == 0:
+        return 0.0
+    smaller = min(box_area(a), box_area(b))
+    return inter / smaller if smaller > 0 else 0.0
+
+
+def offset_box(box, dx, dy, scale=1.0):
+    return ((box[0] + dx) * scale, (box[1] + dy) * scale,
+            (box[2] + dx) * scale, (box[3] + dy) * scale)
+
+
+def group_words_into_lines(words):
+    """
+    Groups words into reading-order lines: a word joins the current line
+    when its vertical centre lies within half the line's median word height.
+    Returns a list of lines, each a list of words sorted left to right.
+    """
+    if not words:
+        return []
+    ordered = sorted(words, key=lambda w: ((w[2][1] + w[2][3]) / 2, w[2][0]))
+    lines = []
+    current = [ordered[0]]
+    for word in ordered[1:]:
+        heights = [w[2][3] - w[2][1] for w in current]
+        centre = np.mean([(w[2][1] + w[2][3]) / 2 for w in current])
+        word_centre = (word[2][1] + word[2][3]) / 2
+        if abs(word_centre - centre) <= max(1.0, float(np.median(heights))) / 2:
+            current.append(word)
+        else:
+            lines.append(sorted(current, key=lambda w: w[2][0]))
+            current = [word]
+    lines.append(sorted(current, key=lambda w: w[2][0]))
+    return lines
+
+
+def line_box(line):
+    return (min(w[2][0] for w in line), min(w[2][1] for w in line),
+            max(w[2][2] for w in line), max(w[2][3] for w in line))
+
+
+def words_to_text(words):
+    """Joins words into text: spaces within a line, newlines between lines."""
+    lines = group_words_into_lines(words)
+    text = '\n'.join(' '.join(w[0] for w in line) for line in lines)
+    confs = [w[1] for w in words]
+    return text.strip(), float(np.mean(confs)) if confs else 0.0
+
+
+class BoxGrid:
+    """
+    Buckets boxes into a coarse grid so overlap queries only look at boxes
+    in nearby cells instead of scanning everything kept so far.
+    """
+
+    def __init__(self, cell=256):
+        self.cell = cell
+        self._cells = {}
+
+    def _keys(self, box):
+        c = self.cell
+        for gx in range(int(box[0]) // c, int(box[2]) // c + 1):
+            for gy in range(int(box[1]) // c, int(box[3]) // c + 1):
+                yield gx, gy
+
+    def add(self, item, box):
+        for key in self._keys(box):
+            self._cells.setdefault(key, []).append(item)
+
+    def near(self, box):
+        found = []
+        seen = set()
+        for key in self._keys(box):
+            for item in self._cells.get(key, ()):
+                if id(item) not in seen:
+                    seen.add(id(item))
+                    found.append(item)
+        return found
@@ -0,0 +1,43 @@
+import importlib
+import sys
+import threading
+import time
+
+# module name -> seconds spent importing it through timed_import()
+IMPORT_TIMINGS = {}
+_import_lock = threading.Lock()
+
+
+def timed_import(module_name):
+    """
+    Imports a module on first use and records how long the import took.
+    Later calls return the cached module at dictionary-lookup cost.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None and module_name in IMPORT_TIMINGS:
+        return module
+    with _import_lock:
+        if module_name in IMPORT_TIMINGS:
+            return sys.modules[module_name]
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        IMPORT_TIMINGS[module_name] = time.perf_counter() - started
+    return module
+
+
+def import_report():
+    """Recorded imports, slowest first."""
+    return [
+        {'module': name, 'seconds': round(seconds, 3)}
+        for name, seconds in sorted(
+            IMPORT_TIMINGS.items(), key=lambda item: item[1], reverse=True)
+    ]
+
+
+def print_import_report(title="Import cost"):
+    report = import_report()
+    if not report:
+        return
+    print(f"{title}:", flush=True)
+    for entry in report:
+        print(f"  {entry['module']:<24} {entry['seconds']:.3f}s", flush=True)
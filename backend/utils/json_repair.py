@@ -0,0 +1,238 @@
+import json
+import re
+
+# Runs copied as they are: string bodies up to a quote, escape or control
+# character, whitespace, and bare (unquoted) keys and values
+_STRING_BODY = {
+    '"': re.compile(r'[^"\\\x00-\x1f]+'),
+    "'": re.compile(r'[^\'"\\\x00-\x1f]+'),
+}
+_SPACE = re.compile(r'\s+')
+_BARE_KEY = re.compile(r'[^:,{}\[\]"\'\n]+')
+_BARE_VALUE = re.compile(r'[^,}\]\n"]+')
+_BARE_START = re.compile(r'[\w\-+.$]')
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+_LITERALS = {'true': 'true', 'false': 'false', 'null': 'null',
+             'True': 'true', 'False': 'false', 'None': 'null'}
+_ESCAPES = set('"\\/bfnrtu')
+# \u not followed by four hex digits (preceded by an even run of backslashes)
+_BAD_UNICODE = re.compile(r'(?<!\\)((?:\\\\)*)\\u(?![0-9a-fA-F]{4})')
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+class JSONRepairer:
+    """
+    Incremental extractor and repairer for the first JSON object in LLM
+    output. Text is fed as it arrives (whole, or token by token during
+    generation) and scanned once: anything before the first '{' is
+    skipped, and the object is rewritten as valid JSON as it goes, quoting
+    bare keys and values, converting single-quoted strings, escaping raw
+    control characters and inserting missing or dropping extra commas.
+    `done` is set the moment the object's closing brace arrives; close()
+    returns the JSON text, closing whatever is still open.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.done = False
+        self._out = []
+        # [bracket, expected] per open container; objects expect 'key',
+        # 'colon', 'value' or 'comma', arrays 'value' or 'comma'
+        self._stack = []
+        self._comma = False
+        # Open string: [quote, pieces, is_key]; open bare word: [pieces, is_key]
+        self._string = None
+        self._bare = None
+        self._escape = False
+
+    def feed(self, text):
+        """Consumes more text; returns True once the object is complete."""
+        i, n = 0, len(text)
+        while i < n and not self.done:
+            if not self.started:
+                i = text.find('{', i)
+                if i == -1:
+                    break
+                self.started = True
+                self._open('{')
+                i += 1
+            elif self._string is not None:
+                i = self._string_chars(text, i)
+            elif self._bare is not None:
+                pattern = _BARE_KEY if self._bare[1] else _BARE_VALUE
+                match = pattern.match(text, i)
+                if match:
+                    self._bare[0].append(match.group())
+                    i = match.end()
+                if i < n:
+                    # The next character ends the word; it is handled as
+                    # structure on the next iteration
+                    self._end_bare()
+            else:
+                match = _SPACE.match(text, i)
+                if match:
+                    i = match.end()
+                    continue
+                self._structural(text[i])
+                i += 1
+        return self.done
+
+    def close(self):
+        """The repaired JSON text. Raises ValueError if no object was started."""
+        if not self.started:
+            raise ValueError("No opening brace '{' found in the input.")
+        if self._string is not None:
+            self._escape = False
+            self._end_string()
+        if self._bare is not None:
+            self._end_bare()
+        while self._stack:
+            self._close(self._stack[-1][0])
+        return ''.join(self._out)
+
+    # --- Scanning ---
+
+    def _string_chars(self, text, i):
+        quote, pieces, _ = self._string
+        ch = text[i]
+        if self._escape:
+            self._escape = False
+            if quote == "'" and ch == "'":
+                pieces.append("'")
+            elif ch in _ESCAPES:
+                pieces.append('\\' + ch)
+            else:
+                # Invalid escape such as \$: keep the character only
+                pieces.append(json.dumps(ch)[1:-1])
+            return i + 1
+        match = _STRING_BODY[quote].match(text, i)
+        if match:
+            pieces.append(match.group())
+            return match.end()
+        if ch == quote:
+            self._end_string()
+        elif ch == '\\':
+            self._escape = True
+        elif ch == '"':
+            pieces.append('\\"')
+        else:
+            pieces.append(json.dumps(ch)[1:-1])  # control character
+        return i + 1
+
+    def _structural(self, ch):
+        bracket, expected = self._stack[-1]
+        if ch in '"\'':
+            is_key = self._begin_item()
+            if is_key is not None:
+                self._string = [ch, [], is_key]
+        elif ch in '{[':
+            # A container cannot be a key
+            if not (bracket == '{' and expected in ('key', 'comma')):
+                self._begin_item()
+                self._open(ch)
+        elif ch in '}]':
+            self._close(ch)
+        elif ch == ':':
+            if expected == 'colon':
+                self._out.append(':')
+                self._stack[-1][1] = 'value'
+        elif ch == ',':
+            if expected == 'value' and bracket == '{':
+                self._out.append('null')  # "key": ,
+                expected = 'comma'
+            if expected == 'comma':
+                self._comma = True
+                self._stack[-1][1] = 'key' if bracket == '{' else 'value'
+        elif _BARE_START.match(ch):
+            is_key = self._begin_item()
+            if is_key is not None:
+                self._bare = [[ch], is_key]
+        # Anything else (code fences, stray punctuation) is dropped
+
+    def _begin_item(self):
+        """
+        Writes the separator a new key or value needs; returns whether it
+        is a key.
+        """
+        entry = self._stack[-1]
+        bracket, expected = entry
+        if expected == 'colon':
+            self._out.append(':')  # "key" "value"
+            entry[1] = 'value'
+            return False
+        if expected == 'value' and bracket == '{':
+            return False
+        if expected == 'comma' or self._comma:
+            self._out.append(',')
+        self._comma = False
+        return bracket == '{'
+
+    def _open(self, bracket):
+        if self._stack:
+            self._stack[-1][1] = 'comma'  # the container is its parent's value
+        self._out.append(bracket)
+        self._stack.append([bracket, 'key' if bracket == '{' else 'value'])
+        self._comma = False
+
+    def _close(self, closer):
+        closer = _CLOSERS.get(closer, closer)
+        if not any(_CLOSERS[bracket] == closer for bracket, _ in self._stack):
+            return
+        # Closing an outer container closes the ones inside it
+        while True:
+            bracket, expected = self._stack.pop()
+            if expected == 'colon':
+                self._out.append(':null')
+            elif expected == 'value' and bracket == '{':
+                self._out.append('null')
+            self._out.append(_CLOSERS[bracket])
+            if _CLOSERS[bracket] == closer:
+                break
+        self._comma = False
+        self.done = not self._stack
+
+    def _end_value(self, is_key):
+        self._stack[-1][1] = 'colon' if is_key else 'comma'
+
+    def _end_string(self):
+        _, pieces, is_key = self._string
+        self._string = None
+        body = ''.join(pieces)
+        if '\\u' in body:
+            body = _BAD_UNICODE.sub(r'\1\\\\u', body)
+        self._out.append('"' + body + '"')
+        self._end_value(is_key)
+
+    def _end_bare(self):
+        pieces, is_key = self._bare
+        self._bare = None
+        word = ''.join(pieces).strip().strip('`')
+        if is_key or not (word in _LITERALS or _NUMBER.fullmatch(word)):
+            self._out.append(json.dumps(word))
+        else:
+            self._out.append(_LITERALS.get(word, word))
+        self._end_value(is_key)
+
+
+def repair_json(text):
+    """
+    The first JSON object in `text` as valid JSON text, repaired and closed
+    if it was cut off. Raises ValueError if there is no '{'.
+    """
+    repairer = JSONRepairer()
+    repairer.feed(text)
+    return repairer.close()
+
+
+def parse_json(text):
+    """The first JSON object in `text`, or None if there is none."""
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            return value
+    except ValueError:
+        pass
+    try:
+        return json.loads(repair_json(text))
+    except ValueError:
+        return None
@@ -0,0 +1,137 @@
+import numpy as np
+
+from utils.geometry_utils import group_words_into_lines
+
+
+class OCRLayout:
+    """
+    Words of one page stored column-wise instead of one object per word:
+
+    - text: the page text; words are separated by spaces, lines by newlines
+    - spans: int32 (n, 2) start/end offsets of each word in text
+    - boxes: float32 (n, 4) x0, y0, x1, y1 in page pixels
+    - confidences: float32 (n,)
+    - line_ids: int32 (n,) line of each word; words are in reading order,
+      so each line is a contiguous run
+    """
+
+    def __init__(self, text, spans, boxes, confidences, line_ids,
+                 width=None, height=None):
+        self.text = text
+        self.spans = np.asarray(spans, dtype=np.int32).reshape(-1, 2)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32)
+        self.line_ids = np.asarray(line_ids, dtype=np.int32)
+        self.width = width
+        self.height = height
+
+    @classmethod
+    def from_words(cls, words, width=None, height=None):
+        """Builds the columns from (text, confidence, box) word tuples."""
+        lines = group_words_into_lines(
+            [w for w in words if w[0] and w[0].strip()])
+        n = sum(len(line) for line in lines)
+        spans = np.empty((n, 2), dtype=np.int32)
+        boxes = np.empty((n, 4), dtype=np.float32)
+        confidences = np.empty(n, dtype=np.float32)
+        line_ids = np.empty(n, dtype=np.int32)
+        parts = []
+        offset = 0
+        i = 0
+        for line_id, line in enumerate(lines):
+            if line_id:
+                parts.append('\n')
+                offset += 1
+            for j, (text, confidence, box) in enumerate(line):
+                if j:
+                    parts.append(' ')
+                    offset += 1
+                text = text.strip()
+                parts.append(text)
+                spans[i] = (offset, offset + len(text))
+                boxes[i] = box
+                confidences[i] = confidence
+                line_ids[i] = line_id
+                offset += len(text)
+                i += 1
+        return cls(''.join(parts), spans, boxes, confidences, line_ids,
+                   width, height)
+
+    def __len__(self):
+        return len(self.line_ids)
+
+    @property
+    def line_count(self):
+        return int(self.line_ids[-1]) + 1 if len(self) else 0
+
+    def _line_starts(self):
+        # Index of the first word of each line
+        return np.flatnonzero(np.diff(self.line_ids, prepend=-1))
+
+    def confidence(self):
+        if not len(self):
+            return 0.0
+        return float(self.confidences.mean(dtype=np.float64))
+
+    def word_text(self, i):
+        start, end = self.spans[i]
+        return self.text[start:end]
+
+    def words(self):
+        """Yields (text, confidence, box) tuples, e.g. for geometry_utils."""
+        for i in range(len(self)):
+            yield (self.word_text(i), float(self.confidences[i]),
+                   tuple(float(v) for v in self.boxes[i]))
+
+    def line_spans(self):
+        if not len(self):
+            return np.empty((0, 2), dtype=np.int32)
+        starts = self._line_starts()
+        ends = np.append(starts[1:], len(self)) - 1
+        return np.stack([self.spans[starts, 0], self.spans[ends, 1]], axis=1)
+
+    def line_boxes(self):
+        if not len(self):
+            return np.empty((0, 4), dtype=np.float32)
+        starts = self._line_starts()
+        return np.concatenate([
+            np.minimum.reduceat(self.boxes[:, :2], starts),
+            np.maximum.reduceat(self.boxes[:, 2:], starts),
+        ], axis=1)
+
+    def line_confidences(self):
+        if not len(self):
+            return np.empty(0, dtype=np.float32)
+        starts = self._line_starts()
+        sums = np.add.reduceat(self.confidences, starts)
+        return sums / np.diff(np.append(starts, len(self)))
+
+    def to_dict(self, precision=1):
+        """JSON form; columns stay flat lists rather than per-word objects."""
+        def rounded(values, digits):
+            # Round in float64 so float32 values serialize without noise
+            return np.round(values.astype(np.float64), digits).ravel().tolist()
+
+        return {
+            'width': self.width,
+            'height': self.height,
+            'text': self.text,
+            'words': {
+                'spans': self.spans.ravel().tolist(),
+                'boxes': rounded(self.boxes, precision),
+                'confidences': rounded(self.confidences, 4),
+                'line_ids': self.line_ids.tolist(),
+            },
+            'lines': {
+                'spans': self.line_spans().ravel().tolist(),
+                'boxes': rounded(self.line_boxes(), precision),
+                'confidences': rounded(self.line_confidences(), 4),
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        words = data['words']
+        return cls(data['text'], words['spans'], words['boxes'],
+                   words['confidences'], words['line_ids'],
+                   data.get('width'), data.get('height'))
@@ -1,3 +1,476 @@
+import json
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+from utils.import_utils import timed_import
+
+
 def calculate_accuracy(pred, target):
     # Accuracy calculation logic here
     return 1.0 if pred == target else 0.0
+
+
+# Full lower-bound checks (O(m) each) per string when a cutoff is given,
+# and the fewest columns between two of them
+_CUTOFF_CHECKS = 16
+_CUTOFF_MIN_INTERVAL = 64
+
+
+def _bits(value, m):
+    """The low m bits of an int as a uint8 array, least significant first."""
+    raw = np.frombuffer(value.to_bytes((m + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder='little')[:m]
+
+
+def _lower_bound(pv, mv, m, j, n):
+    """
+    Lower bound on the final distance from column j of the DP matrix (rows
+    0..m, n columns in total), rebuilt from its vertical deltas: a path to
+    the last cell goes through some row i of this column and still needs
+    at least |remaining rows - remaining columns| edits.
+    """
+    deltas = _bits(pv, m).astype(np.int32) - _bits(mv, m)
+    column = j + np.concatenate(([0], np.cumsum(deltas)))
+    rows = np.arange(m + 1)
+    return int((column + np.abs((m - rows) - (n - j))).min())
+
+
+def edit_distance(a, b, max_distance=None):
+    """
+    Levenshtein distance (insertions, deletions, substitutions) between two
+    strings with Myers' bit-parallel algorithm: each character of the longer
+    string updates one column of the DP matrix for the whole shorter string
+    at once, using Python ints as bit vectors.
+
+    With max_distance, stops once the distance is known to exceed it and
+    returns max_distance + 1: cheaply after every character, and from the
+    whole DP column at a few points along the way.
+    """
+    # Common prefix and suffix do not change the distance
+    start = 0
+    limit = min(len(a), len(b))
+    while start < limit and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < limit - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+    m = len(b)
+    if m == 0:
+        return len(a)
+
+    # Bit i of peq[c] is set where b[i] == c
+    peq = {}
+    for i, ch in enumerate(b):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv = mask, 0  # vertical +1 / -1 deltas of the current column
+    score = m
+    n = remaining = len(a)
+    interval = max(_CUTOFF_MIN_INTERVAL, n // _CUTOFF_CHECKS)
+    for ch in a:
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        remaining -= 1
+        if max_distance is None:
+            continue
+        # The score drops by at most one per remaining character
+        if score - remaining > max_distance:
+            return max_distance + 1
+        if remaining % interval == 0 and remaining \
+                and _lower_bound(pv, mv, m, n - remaining, n) > max_distance:
+            return max_distance + 1
+    return score
+
+
+def normalized_edit_distance(a, b, cutoff=None):
+    """
+    edit_distance() divided by the longer length: 0.0 for equal strings,
+    1.0 for nothing in common. With a cutoff (0..1), returns a value above
+    the cutoff as soon as the distance is known to exceed it.
+    """
+    length = max(len(a), len(b))
+    if length == 0:
+        return 0.0
+    max_distance = None if cutoff is None else int(cutoff * length)
+    return min(1.0, edit_distance(a, b, max_distance) / length)
+
+
+# --- Field-level comparison of nested JSON ---
+
+_BLANK_STRINGS = {'', 'N/A', 'NAN', 'NONE', 'NULL'}
+
+
+def _leaf_value(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return None if value.upper() in _BLANK_STRINGS else value
+    return value
+
+
+def _leaf_paths(value, path):
+    """Paths of every leaf under value (for predicted data with no counterpart)."""
+    if isinstance(value, dict):
+        return [p for key, child in value.items()
+                for p in _leaf_paths(child, f"{path}.{key}" if path else key)]
+    if isinstance(value, list):
+        return [p for child in value for p in _leaf_paths(child, path + '[]')]
+    return [] if _leaf_value(value) is None else [path]
+
+
+def _align(similarity):
+    """
+    Pairs rows with columns of a similarity matrix to maximize the total:
+    Hungarian matching when scipy is installed, otherwise greedily from
+    the most similar pair down.
+    """
+    try:
+        optimize = timed_import('scipy.optimize')
+    except ImportError:
+        optimize = None
+    if optimize is not None:
+        rows, cols = optimize.linear_sum_assignment(similarity, maximize=True)
+        pairs = zip(rows.tolist(), cols.tolist())
+    else:
+        order = np.dstack(np.unravel_index(
+            np.argsort(-similarity, axis=None, kind='stable'), similarity.shape))[0]
+        used_rows, used_cols, pairs = set(), set(), []
+        for i, j in order.tolist():
+            if i not in used_rows and j not in used_cols:
+                used_rows.add(i)
+                used_cols.add(j)
+                pairs.append((i, j))
+    return [(i, j) for i, j in pairs if similarity[i, j] > 0]
+
+
+def _compare(pred, truth, path):
+    """
+    Returns (similarity, leaves, extra) for pred against truth: one
+    (path, exact, similarity, missing) per leaf of truth, and the paths of
+    predicted leaves truth does not have.
+    """
+    if isinstance(truth, dict):
+        pred_dict = pred if isinstance(pred, dict) else {}
+        leaves, extra = [], []
+        for key, value in truth.items():
+            child = f"{path}.{key}" if path else key
+            _, child_leaves, child_extra = _compare(pred_dict.get(key), value, child)
+            leaves += child_leaves
+            extra += child_extra
+        for key, value in pred_dict.items():
+            if key not in truth:
+                extra += _leaf_paths(value, f"{path}.{key}" if path else key)
+    elif isinstance(truth, list):
+        leaves, extra = _compare_lists(
+            pred if isinstance(pred, list) else [], truth, path + '[]')
+    else:
+        truth_value = _leaf_value(truth)
+        pred_value = None if isinstance(pred, (dict, list)) else _leaf_value(pred)
+        extra = _leaf_paths(pred, path) if isinstance(pred, (dict, list)) else []
+        if truth_value is None and pred_value is None:
+            leaves = [(path, True, 1.0, False)]
+        elif truth_value is None or pred_value is None:
+            leaves = [(path, False, 0.0, pred_value is None)]
+        else:
+            a = pred_value if isinstance(pred_value, str) else json.dumps(pred_value)
+            b = truth_value if isinstance(truth_value, str) else json.dumps(truth_value)
+            leaves = [(path, a == b, 1.0 - normalized_edit_distance(a, b), False)]
+    # Extra predicted leaves count against the similarity used for alignment
+    total = len(leaves) + len(extra)
+    similarity = sum(leaf[2] for leaf in leaves) / total if total else 1.0
+    return similarity, leaves, extra
+
+
+def _compare_lists(pred, truth, path):
+    if not truth or not pred:
+        leaves = [leaf for item in truth for leaf in _compare(None, item, path)[1]]
+        return leaves, [p for item in pred for p in _leaf_paths(item, path)]
+    # Every pair is compared once; the matched pairs' results are reused
+    results = [[_compare(p, t, path) for p in pred] for t in truth]
+    similarity = np.array([[r[0] for r in row] for row in results])
+    leaves, extra = [], []
+    matched_truth, matched_pred = set(), set()
+    for i, j in _align(similarity):
+        _, pair_leaves, pair_extra = results[i][j]
+        leaves += pair_leaves
+        extra += pair_extra
+        matched_truth.add(i)
+        matched_pred.add(j)
+    for i, item in enumerate(truth):
+        if i not in matched_truth:
+            leaves += _compare(None, item, path)[1]
+    for j, item in enumerate(pred):
+        if j not in matched_pred:
+            extra += _leaf_paths(item, path)
+    return leaves, extra
+
+
+def compare_fields(predicted, ground_truth):
+    """
+    Compares nested JSON field by field in one traversal. Arrays (e.g.
+    invoice items) are aligned item to item by best overall similarity
+    rather than by position, so a missing or reordered item only affects
+    itself. Paths name array elements with [], e.g. "items[].quantity".
+
+    Returns {'leaves': [(path, exact, similarity, missing)] for every leaf
+    of ground_truth, 'extra': [paths of predicted leaves not in it]};
+    similarity is 1 - normalized edit distance, and blank values ("",
+    "N/A", null) count as missing.
+    """
+    _, leaves, extra = _compare(predicted, ground_truth, '')
+    return {'leaves': leaves, 'extra': extra}
+
+
+# --- Word tokenization and BLEU ---
+# Ports of nltk.word_tokenize (Punkt sentence splitting, then
+# NLTKWordTokenizer on each sentence) and of sentence_bleu with method4
+# smoothing, so the text metrics need neither NLTK nor its downloaded data.
+
+_STARTING_QUOTES = [
+    (re.compile('([«“‘„]|[`]+)'), r' \1 '),
+    (re.compile(r'^"'), r'``'),
+    (re.compile(r'(``)'), r' \1 '),
+    (re.compile(r'([ \(\[{<])("|\'{2})'), r'\1 `` '),
+    (re.compile(r"(?i)(?<!\w)(')(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)"), r'\1 '),
+]
+_PUNCTUATION = [
+    (re.compile('([^\\.])(\\.)([\\]\\)}>"\'' '»”’ ' r']*)\s*$'), r'\1 \2 \3 '),
+    (re.compile(r'([:,])([^\d])'), r' \1 \2'),
+    (re.compile(r'([:,])$'), r' \1 '),
+    (re.compile(r'\.{2,}'), r' \g<0> '),
+    (re.compile(r'[;@#$%&]'), r' \g<0> '),
+    (re.compile(r'[\u2012-\u2015]'), r' \g<0> '),
+    (re.compile(r'([^\.])(\.)([\]\)}>"\']*)\s*$'), r'\1 \2\3 '),
+    (re.compile(r'[?!]'), r' \g<0> '),
+    (re.compile(r"([^'])' "), r"\1 ' "),
+    (re.compile(r'[*]'), r' \g<0> '),
+    (re.compile(r'[\]\[\(\)\{\}\<\>]'), r' \g<0> '),
+    (re.compile(r'--'), r' -- '),
+]
+_ENDING_QUOTES = [
+    (re.compile('([»”’])'), r' \1 '),
+    (re.compile(r"''"), " '' "),
+    (re.compile(r'"'), " '' "),
+    (re.compile(r'\s+'), ' '),
+    (re.compile(r"([^' ])('[sS]|'[mM]|'[dD]|') "), r'\1 \2 '),
+    (re.compile(r"([^' ])('ll|'LL|'re|'RE|'ve|'VE|n't|N'T) "), r'\1 \2 '),
+]
+_CONTRACTIONS = [(re.compile(pattern), r' \1 \2 ') for pattern in (
+    r"(?i)\b(can)(?#X)(not)\b",
+    r"(?i)\b(d)(?#X)('ye)\b",
+    r"(?i)\b(gim)(?#X)(me)\b",
+    r"(?i)\b(gon)(?#X)(na)\b",
+    r"(?i)\b(got)(?#X)(ta)\b",
+    r"(?i)\b(lem)(?#X)(me)\b",
+    r"(?i)\b(more)(?#X)('n)\b",
+    r"(?i)\b(wan)(?#X)(na)(?=\s)",
+    r"(?i) ('t)(?#X)(is)\b",
+    r"(?i) ('t)(?#X)(was)\b",
+)]
+
+
+# Punkt (PunktSentenceTokenizer) without its trained English model: the
+# model's abbreviation list is approximated by the common ones below, and
+# its learned collocations, sentence starters and word casing are empty.
+PUNKT_ABBREVIATIONS = frozenset([
+    'co', 'corp', 'inc', 'ltd', 'mr', 'mrs', 'ms', 'dr', 'jr', 'st', 'vs',
+    'e.g', 'i.e', 'u.s',
+])
+_PUNKT_NON_WORD = r"""(?:[)";}\]*:@'({\[‘’“”«»?!])"""
+_PUNKT_MULTI_CHAR = r'(?:\-{2,}|\.{2,}|(?:\.\s){2,}\.)'
+_PUNKT_WORD = re.compile(r"""(
+    %(MultiChar)s
+    |
+    (?=[^\(\"\`{\[:;&\#\*@\)}\]\-,])\S+?
+    (?=\s|$|%(NonWord)s|%(MultiChar)s|,(?=$|\s|%(NonWord)s|%(MultiChar)s))
+    |
+    \S
+)""" % {'NonWord': _PUNKT_NON_WORD, 'MultiChar': _PUNKT_MULTI_CHAR}, re.VERBOSE)
+_PUNKT_PERIOD_CONTEXT = re.compile(r"""
+    [.?!]
+    (?=(?P<after_tok>%s|\s+(?P<next_tok>\S+)))""" % _PUNKT_NON_WORD, re.VERBOSE)
+_PUNKT_REALIGNMENT = re.compile(
+    r'["\')\]}‘’“”«»]+?(?:\s+|(?=--)|$)', re.MULTILINE)
+_PUNKT_NUMBER = re.compile(r'^-?[\.,]?\d[\d,\.-]*\.?$')
+_PUNKT_INITIAL = re.compile(r'[^\W\d]\.$')
+
+
+def _punkt_sentbreaks(tokens):
+    """Punkt's sentence-break flag for each word token."""
+    breaks = []
+    for i, tok in enumerate(tokens):
+        if tok in ('.', '?', '!'):
+            breaks.append(True)
+            continue
+        # Ellipses are never breaks
+        if not tok.endswith('.') or tok.endswith('..'):
+            breaks.append(False)
+            continue
+        word = tok[:-1].lower()
+        if word in PUNKT_ABBREVIATIONS or word.split('-')[-1] in PUNKT_ABBREVIATIONS:
+            breaks.append(False)
+            continue
+        # Initials and numbers followed by punctuation or a lower-case
+        # word, and initials followed by a capitalized one, are abbreviations
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        initial = _PUNKT_INITIAL.match(tok)
+        if following and (initial or _PUNKT_NUMBER.match(tok.lower())):
+            if following in tuple(';:,.!?') or following[0].islower() \
+                    or (initial and following[0].isupper()):
+                breaks.append(False)
+                continue
+        breaks.append(True)
+    return breaks
+
+
+def _punkt_contains_sentbreak(context):
+    tokens = [tok for line in context.split('\n')
+              for tok in _PUNKT_WORD.findall(line)]
+    # A break only counts if some token follows it
+    return any(_punkt_sentbreaks(tokens)[:-1])
+
+
+def _punkt_end_contexts(text):
+    """Candidate sentence ends and the word around each, as Punkt finds them."""
+    previous_slice = slice(0, 0)
+    previous_match = None
+    for match in _PUNKT_PERIOD_CONTEXT.finditer(text):
+        before_text = text[previous_slice.stop:match.start()]
+        last_space = max(before_text.rfind(c) for c in ' \t\n\r\x0b\x0c')
+        if last_space > 0:
+            start = previous_slice.stop + last_space + 1
+        else:
+            start = previous_slice.start
+        word_slice = slice(start, match.start())
+        if previous_match and previous_slice.stop <= word_slice.start:
+            yield previous_match, (text[previous_slice] + previous_match.group()
+                                   + previous_match.group('after_tok'))
+        previous_match = match
+        previous_slice = word_slice
+    if previous_match:
+        yield previous_match, (text[previous_slice] + previous_match.group()
+                               + previous_match.group('after_tok'))
+
+
+def sent_tokenize(text):
+    """Sentences of text, as Punkt splits them (see PUNKT_ABBREVIATIONS)."""
+    slices = []
+    last_break = 0
+    for match, context in _punkt_end_contexts(text):
+        if _punkt_contains_sentbreak(context):
+            slices.append(slice(last_break, match.end()))
+            last_break = (match.start('next_tok') if match.group('next_tok')
+                          else match.end())
+    slices.append(slice(last_break, len(text.rstrip())))
+
+    # Closing quotes and brackets after a break belong to the sentence before
+    sentences = []
+    realign = 0
+    for i, sentence in enumerate(slices):
+        sentence = slice(sentence.start + realign, sentence.stop)
+        realign = 0
+        if i + 1 < len(slices):
+            m = _PUNKT_REALIGNMENT.match(text[slices[i + 1]])
+            if m:
+                sentence = slice(sentence.start,
+                                 slices[i + 1].start + len(m.group(0).rstrip()))
+                realign = m.end()
+                sentences.append(text[sentence])
+                continue
+        if text[sentence]:
+            sentences.append(text[sentence])
+    return sentences
+
+
+def _tokenize_sentence(text):
+    for pattern, replacement in _STARTING_QUOTES + _PUNCTUATION:
+        text = pattern.sub(replacement, text)
+    text = ' ' + text + ' '
+    for pattern, replacement in _ENDING_QUOTES + _CONTRACTIONS:
+        text = pattern.sub(replacement, text)
+    return text.split()
+
+
+def word_tokenize(text):
+    """
+    Penn Treebank-style word tokens, as nltk.word_tokenize(text): the text
+    is split into sentences first, so a period ending a sentence inside the
+    text ("Paid in full. Thank you") is a token of its own.
+    """
+    return [token for sentence in sent_tokenize(text)
+            for token in _tokenize_sentence(sentence)]
+
+
+def ngram_counts(tokens, max_n=4):
+    """[Counter of the n-grams of tokens for n = 1..max_n], for bleu_from_counts."""
+    return [Counter(zip(*(tokens[i:] for i in range(n))))
+            for n in range(1, max_n + 1)]
+
+
+def bleu_from_counts(references, hypothesis, weights=(0.25, 0.25, 0.25, 0.25),
+                     smoothing_k=5):
+    """
+    Sentence BLEU with NLTK's method4 smoothing, from precomputed counts:
+    `references` is a list of (ngram_counts, length) and `hypothesis` one
+    (ngram_counts, length), so the counts of a reference scored against
+    many hypotheses are computed once. Equal to
+    nltk sentence_bleu(..., smoothing_function=SmoothingFunction().method4).
+    """
+    hyp_counts, hyp_len = hypothesis
+    precisions = []
+    for n in range(len(weights)):
+        counts = hyp_counts[n]
+        clipped = sum(min(count, max(ref[n][ngram] for ref, _ in references))
+                      for ngram, count in counts.items())
+        precisions.append((clipped, max(1, sum(counts.values()))))
+    if precisions[0][0] == 0:
+        return 0
+    ref_len = min((length for _, length in references),
+                  key=lambda length: (abs(length - hyp_len), length))
+    if hyp_len > ref_len:
+        penalty = 1
+    else:
+        penalty = math.exp(1 - ref_len / hyp_len)
+
+    logs = []
+    smoothed = 1
+    for weight, (numerator, denominator) in zip(weights, precisions):
+        if numerator == 0:
+            if hyp_len <= 1:
+                continue
+            # method4: shrinks with each missing order, scaled by length
+            precision = (1 / (2 ** smoothed * smoothing_k / math.log(hyp_len))
+                         / denominator)
+            smoothed += 1
+        else:
+            precision = numerator / denominator
+        logs.append(weight * math.log(precision))
+    return penalty * math.exp(math.fsum(logs))
+
+
+def sentence_bleu(references, hypothesis, weights=(0.25, 0.25, 0.25, 0.25)):
+    """BLEU of a token list against reference token lists (method4 smoothing)."""
+    max_n = len(weights)
+    return bleu_from_counts(
+        [(ngram_counts(ref, max_n), len(ref)) for ref in references],
+        (ngram_counts(hypothesis, max_n), len(hypothesis)), weights)
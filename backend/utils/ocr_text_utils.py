@@ -0,0 +1,90 @@
+import re
+
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b\x0e-\x1f\x7f\u200b-\u200f\ufeff]')
+_SPACES = re.compile(r'[^\S\n\f]+')
+# Dot leaders, rules and borders: 3+ of the same punctuation character
+_PUNCT_RUNS = re.compile(r'([^\w\s])\1{2,}')
+# Only lines that say "page": a bare "1 of 2" or "10/2024" is a quantity or
+# a date as often as a page number
+_PAGE_MARKER = re.compile(r'^page\s*\d+(?:\s*(?:/|of)\s*\d+)?$', re.IGNORECASE)
+_PAGE_PHRASE = re.compile(r'page\s*\d+(?:\s*(?:/|of)\s*\d+)?')
+# Lines at the top and bottom of a page checked for repeated headers/footers
+_EDGE_LINES = 3
+
+
+def _is_noise(line):
+    # No letters or digits at all (borders, stray marks), or a "Page N" line
+    return not any(ch.isalnum() for ch in line) or bool(_PAGE_MARKER.match(line))
+
+
+def compact_ocr_text(text):
+    """
+    Shrinks OCR text before it goes into an LLM prompt without dropping
+    content: normalizes whitespace, removes control characters, leaders,
+    border lines and "Page N" lines, and drops header/footer lines already
+    seen at the top or bottom of an earlier page. Pages are separated by
+    form feeds ('\\f'); the result keeps one line per OCR line.
+    """
+    text = _CONTROL_CHARS.sub('', text.replace('\r\n', '\n').replace('\r', '\n'))
+    # Header and footer lines seen on earlier pages
+    seen = {'top': set(), 'bottom': set()}
+    kept_pages = []
+    for page in text.split('\f'):
+        lines = []
+        for line in page.split('\n'):
+            line = _SPACES.sub(' ', _PUNCT_RUNS.sub(' ', line)).strip()
+            if line and not _is_noise(line):
+                lines.append(line)
+        page_lines = []
+        page_seen = {'top': set(), 'bottom': set()}
+        for i, line in enumerate(lines):
+            edge = ('top' if i < _EDGE_LINES
+                    else 'bottom' if i >= len(lines) - _EDGE_LINES else None)
+            if edge:
+                # Page numbers inside headers differ from page to page
+                key = _PAGE_PHRASE.sub('', line.lower()).strip()
+                if key in seen[edge]:
+                    continue
+                page_seen[edge].add(key)
+            page_lines.append(line)
+        for edge in seen:
+            seen[edge] |= page_seen[edge]
+        if page_lines:
+            kept_pages.append('\n'.join(page_lines))
+    return '\n'.join(kept_pages)
+
+
+def split_into_chunks(text, count_tokens, max_tokens):
+    """
+    Splits text at line boundaries into chunks of at most max_tokens, so a
+    table row is never cut in half; only a single line longer than the
+    budget is split between words. count_tokens(list of str) returns the
+    token count of each string.
+    """
+    lines = text.split('\n')
+    counts = count_tokens(lines)
+    pieces = []
+    for line, count in zip(lines, counts):
+        if count <= max_tokens:
+            pieces.append((line, count))
+            continue
+        # Space-joined OCR output (EasyOCR, docTR) is a single line
+        words = line.split(' ')
+        per_word = count / max(1, len(words))
+        step = max(1, int(max_tokens / per_word))
+        for start in range(0, len(words), step):
+            part = words[start:start + step]
+            pieces.append((' '.join(part), int(len(part) * per_word) + 1))
+
+    chunks = []
+    current, size = [], 0
+    for line, count in pieces:
+        # +1 for the newline joining it to the previous line
+        if current and size + count + 1 > max_tokens:
+            chunks.append('\n'.join(current))
+            current, size = [], 0
+        current.append(line)
+        size += count + 1
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
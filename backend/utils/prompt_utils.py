@@ -1,3 +1,69 @@
-def build_prompt(data):
-    # Prompt building logic here
-    return f"Prompt: {data}"
+import json
+
+# Alpaca-style prompt the extraction adapter was fine-tuned on. Serving and
+# training must render it identically, so both use the helpers below.
+
+# Structure the extraction model must produce; "<string>" marks a string
+# value and a one-element list an array of such items. Drives both the
+# instruction text and constrained decoding.
+INVOICE_SCHEMA = {
+    "invoice": {
+        "client_name": "<string>",
+        "client_address": "<string>",
+        "seller_name": "<string>",
+        "seller_address": "<string>",
+        "invoice_number": "<string>",
+        "invoice_date": "<string>",
+        "due_date": "<string>",
+    },
+    "items": [
+        {
+            "description": "<string>",
+            "quantity": "<string>",
+            "total_price": "<string>",
+        }
+    ],
+    "subtotal": {
+        "tax": "<string>",
+        "discount": "<string>",
+        "total": "<string>",
+    },
+    "payment_instructions": {
+        "due_date": "<string>",
+        "bank_name": "<string>",
+        "account_number": "<string>",
+        "payment_method": "<string>",
+    },
+}
+
+INVOICE_INSTRUCTION = (
+    "You must output a strictly valid JSON object with no extra text, "
+    "markdown formatting, or comments. Your JSON object must have exactly "
+    "the following keys and nested structure:\n"
+    + json.dumps(INVOICE_SCHEMA, indent=2) + "\n"
+    """- All property names and string values must be enclosed in double quotes.
+- If a string value contains a double quote, escape it with a backslash (\").
+- Numeric values that are not strictly numeric must be in quotes.
+- Include commas between every key-value pair and array element.
+- Do not include trailing commas.
+- Output solely the JSON object as specified."""
+)
+
+RESPONSE_HEADER = "\n\n### Response:\n"
+
+
+def prompt_prefix(instruction=INVOICE_INSTRUCTION):
+    """Part of the prompt before the input; identical for every request."""
+    return ("Below is an instruction that describes a task, paired with an "
+            "input that provides further context. Write a response that "
+            "appropriately completes the request.\n\n"
+            f"### Instruction:\n{instruction}\n\n### Input:\n")
+
+
+def build_prompt(input_text, instruction=INVOICE_INSTRUCTION):
+    return prompt_prefix(instruction) + input_text + RESPONSE_HEADER
+
+
+def format_training_example(input_text, output_text,
+                            instruction=INVOICE_INSTRUCTION):
+    return build_prompt(input_text, instruction) + output_text
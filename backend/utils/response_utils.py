@@ -0,0 +1,50 @@
+import json
+import uuid
+
+from flask import Response, stream_with_context
+
+_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+def _chunked(pieces, chunk_size):
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_json(payload, status=200, chunk_size=64 * 1024):
+    """
+    Streams payload as a JSON response, encoding it incrementally instead of
+    building the whole body in memory first.
+    """
+    pieces = _encoder.iterencode(payload)
+    return Response(stream_with_context(_chunked(pieces, chunk_size)),
+                    status=status, mimetype='application/json')
+
+
+def multipart_response(parts, subtype='mixed'):
+    """
+    Builds a multipart response from (name, content_type, data) tuples so
+    binary parts can be returned without base64.
+    """
+    boundary = uuid.uuid4().hex
+    chunks = []
+    for name, content_type, data in parts:
+        chunks.append(
+            f'--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Disposition: attachment; name="{name}"\r\n'
+            f'Content-Length: {len(data)}\r\n\r\n'.encode('ascii'))
+        chunks.append(data)
+        chunks.append(b'\r\n')
+    chunks.append(f'--{boundary}--\r\n'.encode('ascii'))
+    return Response(b''.join(chunks),
+                    content_type=f'multipart/{subtype}; boundary={boundary}')